@@ -0,0 +1,324 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from Benchmark.Fakes import (
+    FakeGenaiClient,
+    FakeGspreadClient,
+    FakeModelSettings,
+    FakeWorksheet,
+    write_secrets,
+)
+from Common.Common_Functions import CommonFunctions as common
+from Common.Config_Loader import config
+from Common.Metrics import metrics
+from Common.Shared_Resources import shared
+from Common.Sheet_Functions import SheetClass
+from Common import Constant as c
+from Module.Context_Window import ContextWindow
+from Module.SyncWithMeChatBot import SyncWithMeChatBot
+
+
+MODEL = "gemini-2.5-flash"
+
+
+# -------------------------------------------------------
+# Helpers
+# -------------------------------------------------------
+def summarize(samples_ms):
+    """Latency statistics (milliseconds) for a list of samples."""
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return {"n": 0}
+
+    def percentile(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "min_ms": round(ordered[0], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def measure(fn, repeat, warmup=1):
+    """Runs fn() `warmup + repeat` times and returns stats for the last `repeat` runs."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def make_history(turns, answer_words=80):
+    answer = " ".join(f"answer{i % 30}" for i in range(answer_words))
+    return [
+        {"user": f"Question number {i} about topic {i % 7}?", "assistant": answer}
+        for i in range(turns)
+    ]
+
+
+def stage_breakdown():
+    """Average milliseconds per stage recorded in the metrics registry."""
+    prefix = c.METRIC_STAGE_DURATION + '{stage="'
+    return {
+        name[len(prefix):-2]: hist["avg"]
+        for name, hist in metrics.snapshot()["histograms"].items()
+        if name.startswith(prefix)
+    }
+
+
+class SheetHarness:
+    """Builds a real SheetClass on top of a FakeWorksheet with the given settings."""
+
+    def __init__(self, secrets_dir, rows=0, rtt=0.0, **sheet_settings):
+        write_secrets(secrets_dir, sheet_settings)
+        config.check_for_changes()
+
+        self.worksheet = FakeWorksheet(rows=rows, rtt=rtt)
+        shared.get_gspread_client = lambda scopes: FakeGspreadClient(self.worksheet)
+
+        started = time.perf_counter()
+        self.sheet = SheetClass()
+        self.startup_ms = round((time.perf_counter() - started) * 1000, 3)
+        self.setup_calls = Counter(self.worksheet.calls)
+
+    def calls_since_setup(self):
+        """API calls per method made after SheetClass was built."""
+        return dict(self.worksheet.calls - self.setup_calls)
+
+    def close(self):
+        self.sheet.close()
+
+
+# -------------------------------------------------------
+# End-to-end Turn Latency
+# -------------------------------------------------------
+def bench_turn_latency(secrets_dir, turns, model_latency, chunk_interval, sheet_rtt):
+    results = []
+    scenarios = [
+        {"mode": mode, "write_mode": write_mode, "border_mode": border_mode}
+        for mode in ("generate", "stream")
+        for write_mode, border_mode in (
+            (c.SHEET_WRITE_MODE_SYNC, c.BORDER_MODE_ROW),
+            (c.SHEET_WRITE_MODE_SYNC, c.BORDER_MODE_BATCH),
+            (c.SHEET_WRITE_MODE_ASYNC, c.BORDER_MODE_BATCH),
+        )
+    ]
+
+    for scenario in scenarios:
+        harness = SheetHarness(
+            secrets_dir, rtt=sheet_rtt,
+            WRITE_MODE=scenario["write_mode"], BORDER_MODE=scenario["border_mode"],
+            WRITE_FLUSH_INTERVAL=0.2,
+        )
+        client = FakeGenaiClient(FakeModelSettings(
+            latency=model_latency, chunk_interval=chunk_interval,
+        ))
+        chatbot = SyncWithMeChatBot(client, MODEL, harness.sheet)
+        metrics.reset()
+
+        samples, first_chunks = [], []
+        for i in range(turns):
+            question = f"Benchmark question {i}: how does caching help latency?"
+            started = time.perf_counter()
+            if scenario["mode"] == "stream":
+                first = None
+                for _ in chatbot.stream_gemini_text_response(question, use_cache=False):
+                    if first is None:
+                        first = time.perf_counter()
+                first_chunks.append((first - started) * 1000)
+            else:
+                chatbot.get_gemini_text_response(question, use_cache=False)
+            samples.append((time.perf_counter() - started) * 1000)
+
+        harness.sheet.flush()
+        record = {
+            "name": "turn_latency",
+            "params": dict(scenario, turns=turns, model_latency_s=model_latency,
+                           chunk_interval_s=chunk_interval, sheet_rtt_s=sheet_rtt),
+            "metrics": summarize(samples),
+        }
+        calls = harness.calls_since_setup()
+        record["metrics"]["sheets_calls_per_turn"] = round(sum(calls.values()) / turns, 3)
+        record["metrics"]["sheets_calls_by_method"] = calls
+        record["metrics"]["model_calls"] = dict(client.calls)
+        record["metrics"]["stages_avg_ms"] = stage_breakdown()
+        if first_chunks:
+            record["metrics"]["first_chunk"] = summarize(first_chunks)
+        results.append(record)
+        harness.close()
+
+    return results
+
+
+# -------------------------------------------------------
+# Sheet Size
+# -------------------------------------------------------
+def bench_sheet_size(secrets_dir, sizes, rows_written):
+    """Startup cost and per-row calls as the existing sheet grows."""
+    results = []
+    for size in sizes:
+        harness = SheetHarness(
+            secrets_dir, rows=size,
+            WRITE_MODE=c.SHEET_WRITE_MODE_SYNC, BORDER_MODE=c.BORDER_MODE_BATCH,
+        )
+
+        samples = []
+        for i in range(rows_written):
+            started = time.perf_counter()
+            harness.sheet.save_question_response(
+                f"question {i}", False, MODEL, None, "answer", "{}", "{}"
+            )
+            samples.append((time.perf_counter() - started) * 1000)
+
+        record = {
+            "name": "sheet_size",
+            "params": {"rows": size, "rows_written": rows_written},
+            "metrics": {
+                "startup_ms": harness.startup_ms,
+                "startup_calls": dict(harness.setup_calls),
+                "save": summarize(samples),
+                "sheets_calls_per_row": round(sum(harness.calls_since_setup().values()) / rows_written, 3),
+            },
+        }
+        results.append(record)
+        harness.close()
+    return results
+
+
+# -------------------------------------------------------
+# Context Building
+# -------------------------------------------------------
+def bench_context(history_lengths, repeat):
+    """Cost of building the prompt context as the session history grows."""
+    results = []
+    for length in history_lengths:
+        history = make_history(length)
+
+        # First build folds every turn that does not fit into the summary
+        window = ContextWindow()
+        started = time.perf_counter()
+        window.build(history)
+        initial_fold_ms = round((time.perf_counter() - started) * 1000, 3)
+
+        def steady_state():
+            history.append({"user": "One more question?", "assistant": ""})
+            window.build(history)
+            history[-1]["assistant"] = "short answer"
+
+        results.append({
+            "name": "context_build",
+            "params": {"history_turns": length},
+            "metrics": {
+                "build_context_text": measure(lambda: common.build_context_text(history), repeat),
+                "context_window_initial_fold_ms": initial_fold_ms,
+                "context_window_build": measure(steady_state, repeat),
+                "context_text_chars": len(common.build_context_text(history)),
+            },
+        })
+    return results
+
+
+# -------------------------------------------------------
+# Serialization
+# -------------------------------------------------------
+def bench_serialization(output_sizes, grounding_sizes, history_lengths, repeat):
+    """Cost of turning responses and history into JSON for the sheet."""
+    results = []
+    for output_tokens in output_sizes:
+        for grounding_chunks in grounding_sizes:
+            models = FakeGenaiClient(FakeModelSettings(
+                latency=0, output_tokens=output_tokens, grounding_chunks=grounding_chunks,
+            )).models
+            response = models.generate_content(MODEL, "serialize me")
+            answer = response.text
+
+            results.append({
+                "name": "serialization",
+                "params": {"output_tokens": output_tokens, "grounding_chunks": grounding_chunks},
+                "metrics": {
+                    "make_serializable": measure(lambda: common.make_serializable(response), repeat),
+                    "sdk_dump_to_json": measure(lambda: common.sdk_dump_to_json(response), repeat),
+                    "format_template": measure(lambda: common.format_template(
+                        c.FORMATTED_RESPONSE_TEMPLATE, {"question": "q", "answer": answer}
+                    ), repeat),
+                    "json_chars": len(common.sdk_dump_to_json(response)),
+                },
+            })
+
+    for length in history_lengths:
+        history = make_history(length)
+        results.append({
+            "name": "history_serialization",
+            "params": {"history_turns": length},
+            "metrics": {
+                "make_serializable": measure(lambda: common.make_serializable(history), repeat),
+            },
+        })
+    return results
+
+
+# -------------------------------------------------------
+# Startup
+# -------------------------------------------------------
+STARTUP_SCRIPT = """
+import json, time
+started = time.perf_counter()
+marks = {}
+
+def mark(name):
+    marks[name] = round((time.perf_counter() - started) * 1000, 3)
+
+from Common.Config_Loader import config
+mark("import_config")
+from Common.Sheet_Functions import SheetClass
+mark("import_sheet")
+from Module.SyncWithMeChatBot import SyncWithMeChatBot
+mark("import_chatbot")
+config.load()
+mark("config_load")
+
+from Benchmark.Fakes import FakeGenaiClient, FakeModelSettings
+chatbot = SyncWithMeChatBot(FakeGenaiClient(FakeModelSettings(latency=0)), config.get_model("GEMINI_2_5_FLASH"), None)
+chatbot.get_gemini_text_response("Startup benchmark question?", use_cache=False)
+mark("first_turn")
+print(json.dumps(marks))
+"""
+
+
+def bench_startup(secrets_dir, repeat):
+    """
+    Cold start in fresh interpreters: cumulative milliseconds until each
+    import, the config load and the first (fake) turn complete.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root, **{c.SECRETS_DIR_ENV: secrets_dir})
+    write_secrets(secrets_dir)
+
+    samples = {}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            capture_output=True, text=True, check=True, cwd=root, env=env,
+        ).stdout
+        samples.setdefault("process_total", []).append((time.perf_counter() - started) * 1000)
+        for name, value in json.loads(output.strip().splitlines()[-1]).items():
+            samples.setdefault(name, []).append(value)
+
+    return [{
+        "name": "startup",
+        "params": {"repeat": repeat},
+        "metrics": {name: summarize(values) for name, values in samples.items()},
+    }]
@@ -0,0 +1,354 @@
+import asyncio
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from google.genai import types
+
+
+# -------------------------------------------------------
+# Fake google.genai Client
+# -------------------------------------------------------
+class FakeModelSettings:
+    """Latency and size knobs shared by the sync and async fake models."""
+
+    def __init__(
+        self, latency=0.05, first_chunk_latency=None, chunk_interval=0.01,
+        chunks=8, output_tokens=200, thinking_tokens=0, grounding_chunks=0,
+        chars_per_token=4):
+
+        self.latency = latency
+        self.first_chunk_latency = latency if first_chunk_latency is None else first_chunk_latency
+        self.chunk_interval = chunk_interval
+        self.chunks = max(1, chunks)
+        self.output_tokens = output_tokens
+        self.thinking_tokens = thinking_tokens
+        self.grounding_chunks = grounding_chunks
+        self.chars_per_token = chars_per_token
+
+
+class FakeModels:
+    """Stands in for `client.models`; counts calls and sleeps like the API."""
+
+    def __init__(self, settings, calls):
+        self.settings = settings
+        self.calls = calls
+
+    # -------------------------------------------------------
+    # Response Building
+    # -------------------------------------------------------
+    def _prompt_tokens(self, contents, config):
+        if isinstance(contents, str):
+            contents = [types.Content(role="user", parts=[types.Part(text=contents)])]
+        system_instruction = getattr(config, "system_instruction", None)
+        if system_instruction is not None:
+            contents = [system_instruction] + list(contents or [])
+
+        chars = 0
+        for content in contents or []:
+            for part in getattr(content, "parts", None) or []:
+                chars += len(getattr(part, "text", "") or "")
+        return max(1, chars // self.settings.chars_per_token)
+
+    def _answer_text(self):
+        words = self.settings.output_tokens
+        return " ".join(f"word{i % 50}" for i in range(words))
+
+    def _grounding(self):
+        if not self.settings.grounding_chunks:
+            return None
+        return types.GroundingMetadata(
+            grounding_chunks=[
+                types.GroundingChunk(web=types.GroundingChunkWeb(
+                    uri=f"https://example.com/source/{i}", title=f"Source {i}"
+                ))
+                for i in range(self.settings.grounding_chunks)
+            ],
+            web_search_queries=["benchmark query"],
+        )
+
+    def _usage(self, prompt_tokens):
+        settings = self.settings
+        return types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=settings.output_tokens,
+            thoughts_token_count=settings.thinking_tokens or None,
+            total_token_count=prompt_tokens + settings.output_tokens + settings.thinking_tokens,
+        )
+
+    def _response(self, text, usage=None, thought=None, grounding=None):
+        parts = []
+        if thought:
+            parts.append(types.Part(text=thought, thought=True))
+        parts.append(types.Part(text=text))
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(
+                content=types.Content(role="model", parts=parts),
+                grounding_metadata=grounding,
+            )],
+            usage_metadata=usage,
+        )
+
+    def _chunks(self, contents, config):
+        text = self._answer_text()
+        size = max(1, len(text) // self.settings.chunks + 1)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        usage = self._usage(self._prompt_tokens(contents, config))
+        for index, piece in enumerate(pieces):
+            last = index == len(pieces) - 1
+            yield self._response(
+                piece,
+                usage=usage if last else None,
+                grounding=self._grounding() if last else None,
+            )
+
+    # -------------------------------------------------------
+    # API Surface
+    # -------------------------------------------------------
+    def generate_content(self, model, contents, config=None):
+        self.calls["generate_content"] += 1
+        time.sleep(self.settings.latency)
+        thought = "thinking " * 20 if self.settings.thinking_tokens else None
+        return self._response(
+            self._answer_text(),
+            usage=self._usage(self._prompt_tokens(contents, config)),
+            thought=thought,
+            grounding=self._grounding(),
+        )
+
+    def generate_content_stream(self, model, contents, config=None):
+        self.calls["generate_content_stream"] += 1
+        time.sleep(self.settings.first_chunk_latency)
+        for index, chunk in enumerate(self._chunks(contents, config)):
+            if index:
+                time.sleep(self.settings.chunk_interval)
+            yield chunk
+
+
+class FakeAsyncModels:
+    """Stands in for `client.aio.models`."""
+
+    def __init__(self, models):
+        self.models = models
+
+    async def generate_content(self, model, contents, config=None):
+        self.models.calls["aio.generate_content"] += 1
+        await asyncio.sleep(self.models.settings.latency)
+        return self.models._response(
+            self.models._answer_text(),
+            usage=self.models._usage(self.models._prompt_tokens(contents, config)),
+            grounding=self.models._grounding(),
+        )
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self.models.calls["aio.generate_content_stream"] += 1
+        settings = self.models.settings
+        chunks = list(self.models._chunks(contents, config))
+
+        async def stream():
+            await asyncio.sleep(settings.first_chunk_latency)
+            for index, chunk in enumerate(chunks):
+                if index:
+                    await asyncio.sleep(settings.chunk_interval)
+                yield chunk
+
+        return stream()
+
+
+class FakeCaches:
+    """Stands in for `client.caches` (explicit context caching)."""
+
+    def __init__(self, calls):
+        self.calls = calls
+        self._count = 0
+
+    def _entry(self, name, ttl):
+        seconds = int(str(ttl or "3600s").rstrip("s"))
+        return types.CachedContent(
+            name=name, expire_time=datetime.now(timezone.utc) + timedelta(seconds=seconds)
+        )
+
+    def create(self, model, config=None):
+        self.calls["caches.create"] += 1
+        self._count += 1
+        return self._entry(f"cachedContents/fake-{self._count}", getattr(config, "ttl", None))
+
+    def update(self, name, config=None):
+        self.calls["caches.update"] += 1
+        return self._entry(name, getattr(config, "ttl", None))
+
+    def delete(self, name, config=None):
+        self.calls["caches.delete"] += 1
+
+
+class FakeGenaiClient:
+    """
+    In-process replacement for `google.genai.Client` with configurable model
+    latency, token counts and streaming chunk timing. Responses are real
+    `google.genai.types` objects so extraction and serialization run the same
+    code paths as in production.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings or FakeModelSettings()
+        self.calls = Counter()
+        self.models = FakeModels(self.settings, self.calls)
+        self.aio = type("FakeAio", (), {})()
+        self.aio.models = FakeAsyncModels(self.models)
+        self.caches = FakeCaches(self.calls)
+
+
+# -------------------------------------------------------
+# Fake gspread Worksheet
+# -------------------------------------------------------
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+
+    def batch_update(self, body):
+        self.worksheet._call("batch_update")
+        return {"replies": [{} for _ in body.get("requests", [])]}
+
+
+class FakeWorksheet:
+    """
+    In-memory gspread worksheet that counts API calls per method and sleeps
+    `rtt` seconds on each one to simulate the network round trip.
+    """
+
+    def __init__(self, rows=0, rtt=0.0, title="Sheet1", column_count=9):
+        self.title = title
+        self.id = 0
+        self.rtt = rtt
+        self.calls = Counter()
+        self.spreadsheet = FakeSpreadsheet(self)
+        self._lock = threading.Lock()
+
+        self.values = [["Sr No"] + [f"col{i}" for i in range(2, column_count + 1)]]
+        for sr_no in range(1, rows + 1):
+            self.values.append([sr_no] + ["x"] * (column_count - 1))
+
+    def _call(self, name):
+        self.calls[name] += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+
+    @staticmethod
+    def _column_letter(col):
+        letters = ""
+        while col:
+            col, remainder = divmod(col - 1, 26)
+            letters = chr(65 + remainder) + letters
+        return letters
+
+    def api_calls(self):
+        return sum(self.calls.values())
+
+    # -------------------------------------------------------
+    # gspread API Surface
+    # -------------------------------------------------------
+    def col_values(self, col):
+        self._call("col_values")
+        return [row[col - 1] if len(row) >= col else "" for row in self.values]
+
+    def row_values(self, row):
+        self._call("row_values")
+        return list(self.values[row - 1]) if 0 < row <= len(self.values) else []
+
+    def get(self, range_name):
+        """Single-column ranges like "J5:J" (open-ended) or "J5:J9"."""
+        self._call("get")
+        start, _, stop = range_name.partition(":")
+        col = ord(start[0]) - 64
+        first = int(start[1:])
+        last = int(stop[1:]) if stop[1:] else len(self.values)
+        return [
+            [row[col - 1]] if len(row) >= col and row[col - 1] not in (None, "") else []
+            for row in self.values[first - 1:last]
+        ]
+
+    def get_all_values(self):
+        self._call("get_all_values")
+        return [list(row) for row in self.values]
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        self._call("append_rows")
+        with self._lock:
+            first_row = len(self.values) + 1
+            self.values.extend(list(row) for row in values)
+            last_row = len(self.values)
+        width = max(len(row) for row in values)
+        return {"updates": {
+            "updatedRange": f"{self.title}!A{first_row}:{self._column_letter(width)}{last_row}",
+            "updatedRows": len(values),
+        }}
+
+    def update(self, range_name=None, values=None, **kwargs):
+        """Writes `values` into ranges like "A6:A7" (rows grow as needed)."""
+        self._call("update")
+        start = range_name.split(":")[0]
+        col = ord(start[0]) - 64
+        first = int(start[1:])
+        with self._lock:
+            for offset, row_values in enumerate(values or []):
+                row = self.values[first - 1 + offset]
+                for index, value in enumerate(row_values):
+                    while len(row) < col + index:
+                        row.append("")
+                    row[col - 1 + index] = value
+        return {"updatedRange": f"{self.title}!{range_name}"}
+
+
+class FakeGspreadClient:
+    """Returns the same FakeWorksheet for any key / worksheet name."""
+
+    def __init__(self, worksheet):
+        self._worksheet = worksheet
+
+    def open_by_key(self, key):
+        return self
+
+    def worksheet(self, name):
+        return self._worksheet
+
+
+# -------------------------------------------------------
+# Fake Secrets Folder
+# -------------------------------------------------------
+def write_secrets(secrets_dir, sheet_settings=None, system_instruction_words=300):
+    """
+    Writes a Config.ini, .env and SYSTEM_INSTRUCTION.txt that let Config load
+    without real credentials. Rewriting it with other `sheet_settings` and
+    calling `config.check_for_changes()` switches settings between scenarios.
+    """
+    os.makedirs(secrets_dir, exist_ok=True)
+
+    sheet = {
+        "SPREADSHEET_ID": "benchmark",
+        "SHEET_NAME": "Sheet1",
+        "SCOPES": "https://www.googleapis.com/auth/spreadsheets",
+        "SERVICE_ACCOUNT_FILE": "Service_Account.json",
+        "BLOG_LINK": "https://example.com",
+    }
+    sheet.update(sheet_settings or {})
+
+    lines = [
+        "[API]", "GEMINI_API_KEY = benchmark",
+        "[MODEL]", "GEMINI_2_5_FLASH = gemini-2.5-flash",
+        "[SHEET]", *(f"{key} = {value}" for key, value in sheet.items()),
+        "[CACHE]", "CACHE_ENABLED = false",
+        "[APP]", "CONFIG_RELOAD_INTERVAL = 0",
+    ]
+    with open(os.path.join(secrets_dir, "Config.ini"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+    with open(os.path.join(secrets_dir, ".env"), "w", encoding="utf-8") as f:
+        f.write("GEMINI_API_KEY=benchmark\n")
+
+    with open(os.path.join(secrets_dir, "SYSTEM_INSTRUCTION.txt"), "w", encoding="utf-8") as f:
+        f.write(" ".join(f"instruction{i % 40}" for i in range(system_instruction_words)))
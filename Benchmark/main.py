@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from Benchmark.Fakes import write_secrets
+from Common import Constant as c
+
+
+SUITES = ("startup", "turn_latency", "sheet_size", "context", "serialization")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline SyncWithMe benchmarks (no API key or sheet needed)")
+    parser.add_argument("--only", help=f"comma-separated suites to run ({', '.join(SUITES)})")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations and smaller sizes")
+    parser.add_argument("--output", metavar="PATH", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="print changes against an earlier JSON report")
+    parser.add_argument("--turns", type=int, help="turns per latency scenario")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="fake model latency in seconds")
+    parser.add_argument("--chunk-interval", type=float, default=0.005, help="seconds between streamed chunks")
+    parser.add_argument("--sheet-rtt", type=float, default=0.02, help="fake Sheets round trip in seconds")
+    return parser.parse_args()
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def flatten(report):
+    """Maps "suite|params|metric" to every numeric value in a report."""
+    values = {}
+
+    def walk(prefix, node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                walk(f"{prefix}.{key}" if prefix else key, value)
+        elif isinstance(node, (int, float)) and not isinstance(node, bool):
+            values[prefix] = node
+
+    for record in report.get("results", []):
+        params = ",".join(f"{k}={v}" for k, v in sorted(record["params"].items()))
+        walk(f"{record['name']}|{params}|", record["metrics"])
+    return values
+
+
+def compare(report, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = flatten(json.load(f))
+    current = flatten(report)
+
+    print(f"{'metric':<100} {'baseline':>12} {'current':>12} {'ratio':>8}", file=sys.stderr)
+    for key in sorted(set(baseline) & set(current)):
+        old, new = baseline[key], current[key]
+        ratio = f"{new / old:.2f}" if old else "-"
+        print(f"{key:<100} {old:>12} {new:>12} {ratio:>8}", file=sys.stderr)
+
+
+def main():
+    args = parse_args()
+    suites = set(args.only.split(",")) if args.only else set(SUITES)
+
+    # Fake Secrets/ folder so Config loads without real credentials
+    secrets_dir = tempfile.mkdtemp(prefix="syncwithme-bench-")
+    write_secrets(secrets_dir)
+    os.environ[c.SECRETS_DIR_ENV] = secrets_dir
+
+    from Common.Logger_Config import logging
+    logging.setLevel("WARNING")
+    from Benchmark import Benchmarks as bench
+
+    quick = args.quick
+    turns = args.turns or (5 if quick else 30)
+    repeat = 5 if quick else 50
+    history_lengths = (10, 100, 500) if quick else (10, 100, 1000, 2000)
+    sheet_sizes = (100, 10000) if quick else (100, 1000, 10000, 50000)
+
+    started = time.perf_counter()
+    results = []
+    if "startup" in suites:
+        results += bench.bench_startup(secrets_dir, repeat=3 if quick else 10)
+    if "turn_latency" in suites:
+        results += bench.bench_turn_latency(
+            secrets_dir, turns, args.model_latency, args.chunk_interval, args.sheet_rtt
+        )
+    if "sheet_size" in suites:
+        results += bench.bench_sheet_size(secrets_dir, sheet_sizes, rows_written=5 if quick else 20)
+    if "context" in suites:
+        results += bench.bench_context(history_lengths, repeat)
+    if "serialization" in suites:
+        results += bench.bench_serialization(
+            output_sizes=(200, 2000) if quick else (200, 2000, 8000),
+            grounding_sizes=(0, 10),
+            history_lengths=history_lengths,
+            repeat=repeat,
+        )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": quick,
+            "duration_s": round(time.perf_counter() - started, 3),
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"✅ Benchmark report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
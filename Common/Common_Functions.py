@@ -1,7 +1,8 @@
 import json
-import re
 from enum import Enum
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from Common import Constant as c
 
 
 class CommonFunctions:
@@ -14,11 +15,37 @@ class CommonFunctions:
     """
 
     @staticmethod
-    def make_serializable(obj: Any) -> Any:
+    def make_serializable(
+        obj: Any,
+        fields: Optional[Iterable[str]] = None,
+        max_depth: int = c.SERIALIZE_MAX_DEPTH,
+        max_string: Optional[int] = None,
+        max_items: Optional[int] = None,
+        memo: Optional[Dict[Any, Any]] = None,
+    ) -> Any:
         """
-        Recursively convert objects to JSON-serializable forms.
+        Convert objects to JSON-serializable forms in a single walk.
+
+        - pydantic models (google-genai types) use the native `model_dump`
+          fast path; other objects fall back to their public attributes.
+        - `fields` is a whitelist of dotted paths ("usage_metadata",
+          "candidates.content.parts.text"); lists are looked through.
+        - `max_depth`, `max_string` and `max_items` bound the result; cut
+          values are replaced with deterministic markers.
+        - `memo` caches converted objects by id; pass the same dict to reuse
+          work across several calls on objects that stay alive meanwhile.
         Non-serializable objects are converted to strings.
         """
+        memo = {} if memo is None else memo
+        result = CommonFunctions._to_plain(obj, max_depth, memo)
+        if fields:
+            result = CommonFunctions._select_fields(result, CommonFunctions._field_tree(fields))
+        if max_string or max_items:
+            result = CommonFunctions._shrink(result, max_string, max_items)
+        return result
+
+    @staticmethod
+    def _to_plain(obj: Any, depth: int, memo: Dict[Any, Any]) -> Any:
         # Basic JSON types are returned as-is
         if obj is None or isinstance(obj, (str, int, float, bool)):
             return obj
@@ -27,68 +54,245 @@ class CommonFunctions:
         if isinstance(obj, Enum):
             return obj.value
 
-        # List/tuple -> convert each element
-        if isinstance(obj, (list, tuple)):
-            return [CommonFunctions.make_serializable(v) for v in obj]
+        if isinstance(obj, bytes):
+            return f"<{len(obj)} bytes>"
+
+        if depth <= 0:
+            return c.SERIALIZE_DEPTH_MARKER
+
+        # List/tuple -> convert each element (the depth limit also ends cycles)
+        if isinstance(obj, (list, tuple, set, frozenset)):
+            return [CommonFunctions._to_plain(v, depth - 1, memo) for v in obj]
 
         # Dict -> convert keys and values
         if isinstance(obj, dict):
-            return {str(k): CommonFunctions.make_serializable(v) for k, v in obj.items()}
+            return {str(k): CommonFunctions._to_plain(v, depth - 1, memo) for k, v in obj.items()}
+
+        # Other objects are memoized, they are the expensive part
+        key = (id(obj), depth)
+        if key in memo:
+            return memo[key]
+
+        # pydantic models (SDK types): native dump, then apply the depth limit
+        if hasattr(obj, "model_dump") and hasattr(type(obj), "model_fields"):
+            try:
+                result = CommonFunctions._limit_depth(
+                    obj.model_dump(mode="json", exclude_none=True), depth
+                )
+            except Exception:
+                result = CommonFunctions._to_plain(vars(obj), depth, memo)
 
         # Objects with __dict__ (SDK objects) -> convert their public attrs
-        if hasattr(obj, "__dict__"):
-            out = {}
-            for k, v in vars(obj).items():
-                if k.startswith("_"):
-                    continue
-                out[k] = CommonFunctions.make_serializable(v)
-            return out
+        elif hasattr(obj, "__dict__"):
+            result = {
+                k: CommonFunctions._to_plain(v, depth - 1, memo)
+                for k, v in vars(obj).items()
+                if not k.startswith("_")
+            }
+
+        # Fallback: string
+        else:
+            result = str(obj)
+
+        memo[key] = result
+        return result
+
+    @staticmethod
+    def _limit_depth(data: Any, depth: int) -> Any:
+        """Depth limit for already JSON-compatible data (model_dump output has no cycles)."""
+        if isinstance(data, dict):
+            if depth <= 0:
+                return c.SERIALIZE_DEPTH_MARKER
+            return {k: CommonFunctions._limit_depth(v, depth - 1) for k, v in data.items()}
+        if isinstance(data, list):
+            if depth <= 0:
+                return c.SERIALIZE_DEPTH_MARKER
+            return [CommonFunctions._limit_depth(v, depth - 1) for v in data]
+        return data
+
+    @staticmethod
+    def _field_tree(fields: Iterable[str]) -> Dict[str, Any]:
+        """{"a.b", "c"} -> {"a": {"b": None}, "c": None}; None keeps the whole value."""
+        tree: Dict[str, Any] = {}
+        for path in fields:
+            parts = [p for p in str(path).split(".") if p]
+            node = tree
+            for index, part in enumerate(parts):
+                if part in node and node[part] is None:
+                    break
+                if index == len(parts) - 1:
+                    node[part] = None
+                else:
+                    node = node.setdefault(part, {})
+        return tree
 
-        # Fallback: try JSON dump, otherwise string
+    @staticmethod
+    def _select_fields(data: Any, tree: Optional[Dict[str, Any]]) -> Any:
+        if tree is None:
+            return data
+        if isinstance(data, list):
+            return [CommonFunctions._select_fields(item, tree) for item in data]
+        if isinstance(data, dict):
+            return {
+                k: CommonFunctions._select_fields(v, tree[k])
+                for k, v in data.items() if k in tree
+            }
+        return data
+
+    @staticmethod
+    def _shrink(data: Any, max_string: Optional[int], max_items: Optional[int]) -> Any:
+        if isinstance(data, str):
+            if max_string and len(data) > max_string:
+                return data[:max_string] + c.SERIALIZE_TRUNCATED_MARKER.format(count=len(data) - max_string)
+            return data
+        if isinstance(data, list):
+            items = [CommonFunctions._shrink(v, max_string, max_items) for v in data[:max_items or None]]
+            if max_items and len(data) > max_items:
+                items.append(c.SERIALIZE_MORE_ITEMS_MARKER.format(count=len(data) - max_items))
+            return items
+        if isinstance(data, dict):
+            return {k: CommonFunctions._shrink(v, max_string, max_items) for k, v in data.items()}
+        return data
+
+    @staticmethod
+    def truncate_text(text: str, max_chars: int = c.SHEET_CELL_CHAR_LIMIT) -> str:
+        """Cut `text` to at most `max_chars` characters, ending with a marker saying how much was cut."""
+        text = "" if text is None else str(text)
+        if not max_chars or len(text) <= max_chars:
+            return text
+
+        marker = c.SERIALIZE_TRUNCATED_MARKER.format(count=len(text))
+        keep = max(0, max_chars - len(marker))
+        marker = c.SERIALIZE_TRUNCATED_MARKER.format(count=len(text) - keep)
+        return (text[:keep] + marker)[:max_chars]
+
+    @staticmethod
+    def dumps_bounded(data: Any, max_chars: int = c.SHEET_CELL_CHAR_LIMIT, indent: Optional[int] = None) -> str:
+        """
+        JSON-encode plain data so the result fits in `max_chars`. Long strings
+        and lists are shortened step by step (keeping the JSON valid) before
+        falling back to plain text truncation. The result is deterministic.
+        """
+        text = json.dumps(data, indent=indent, ensure_ascii=False)
+        if not max_chars or len(text) <= max_chars:
+            return text
+
+        max_string, max_items = max_chars // 2, 100
+        while max_string >= c.SERIALIZE_MIN_STRING:
+            shrunk = CommonFunctions._shrink(data, max_string, max_items)
+            text = json.dumps(shrunk, indent=indent, ensure_ascii=False)
+            if len(text) <= max_chars:
+                return text
+            max_string //= 2
+            max_items = max(1, max_items // 2)
+
+        return CommonFunctions.truncate_text(text, max_chars)
+
+    @staticmethod
+    def sdk_dump_to_json(
+        raw: Any,
+        fields: Optional[Iterable[str]] = None,
+        max_chars: Optional[int] = None,
+        indent: Optional[int] = 2,
+        max_depth: int = c.SERIALIZE_MAX_DEPTH,
+    ) -> str:
+        """
+        Safely convert an SDK response (or any complex object) into a JSON string.
+        Uses pydantic's `model_dump_json` directly when no whitelist or limits
+        apply; otherwise goes through make_serializable and dumps_bounded.
+        """
         try:
-            json.dumps(obj)
-            return obj
-        except Exception:
-            return str(obj)
+            if (
+                fields is None and max_chars is None
+                and hasattr(raw, "model_dump_json") and hasattr(type(raw), "model_fields")
+            ):
+                return raw.model_dump_json(exclude_none=True, indent=indent)
+
+            converted = CommonFunctions.make_serializable(raw, fields=fields, max_depth=max_depth)
+            return CommonFunctions.dumps_bounded(converted, max_chars, indent=indent)
+        except Exception as e:
+            return json.dumps({"error": str(e), "type": str(type(raw))}, indent=indent)
 
     @staticmethod
-    def format_template(template: Union[list, dict, str], updates: Dict[str, Any]) -> str:
+    def format_template(
+        template: Union[list, dict, str],
+        updates: Dict[str, Any],
+        max_chars: Optional[int] = None,
+    ) -> str:
         """
         Copy a template and update it with values from `updates`.
         - If template is a list and first element is a dict, it updates that dict.
         - If template is a dict, it updates it.
         - If template is a string, it performs simple replacement of keys wrapped in {{key}}.
-        Returns a JSON string for list/dict templates, or the formatted string.
+        Returns a JSON string for list/dict templates, or the formatted string,
+        bounded to `max_chars` when given (e.g. a sheet cell).
         """
+        memo: Dict[Any, Any] = {}
+        if isinstance(template, (list, dict)):
+            values = {k: CommonFunctions.make_serializable(v, memo=memo) for k, v in updates.items()}
+
         if isinstance(template, list):
             # make a shallow copy
             formatted = [item.copy() if isinstance(item, dict) else item for item in template]
             if formatted and isinstance(formatted[0], dict):
-                formatted[0].update({k: CommonFunctions.make_serializable(v) for k, v in updates.items()})
-            return json.dumps(formatted, ensure_ascii=False)
+                formatted[0].update(values)
+            return CommonFunctions.dumps_bounded(formatted, max_chars)
 
         if isinstance(template, dict):
             formatted = template.copy()
-            formatted.update({k: CommonFunctions.make_serializable(v) for k, v in updates.items()})
-            return json.dumps(formatted, ensure_ascii=False)
+            formatted.update(values)
+            return CommonFunctions.dumps_bounded(formatted, max_chars)
 
         if isinstance(template, str):
             result = template
             # simple templating: replace {{key}} with str(value)
             for k, v in updates.items():
                 result = result.replace(f"{{{{{k}}}}}", str(v))
-            return result
+            return CommonFunctions.truncate_text(result, max_chars)
 
         # Unknown type — return stringified
         return json.dumps({"template": str(template), "updates": updates}, ensure_ascii=False)
 
     @staticmethod
-    def build_context_text(context_history: List[Dict[str, str]]) -> str:
+    def to_int(value: Any, default: int) -> int:
+        """Parse a config value as int, falling back to `default`."""
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return default
+
+    @staticmethod
+    def to_float(value: Any, default: float) -> float:
+        """Parse a config value as float, falling back to `default`."""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return default
+
+    @staticmethod
+    def to_bool(value: Any, default: bool) -> bool:
+        """Parse a config value such as "true"/"0"/"yes" as bool."""
+        if isinstance(value, bool):
+            return value
+        if value is None:
+            return default
+        text = str(value).strip().lower()
+        if text in ("1", "true", "yes", "on"):
+            return True
+        if text in ("0", "false", "no", "off"):
+            return False
+        return default
+
+    @staticmethod
+    def build_context_text(context_history: List[Dict[str, str]], summary: str = "") -> str:
         """
         Build a newline-separated conversation context string from a list of messages.
         Each message is expected to be a dict with optional keys: 'user', 'assistant'.
+        An optional summary of earlier turns is placed first.
         """
         lines: List[str] = []
+        if summary:
+            lines.append(f"Summary of earlier conversation:\n{summary}")
         for msg in context_history or []:
             if not isinstance(msg, dict):
                 continue
@@ -101,86 +305,87 @@ class CommonFunctions:
         return "\n".join(lines).strip()
 
     @staticmethod
-    def sdk_dump_to_json(raw: Any) -> str:
-        """
-        Safely convert an SDK response (or any complex object) into a JSON string.
-        Handles enums, lists, dicts, and objects with __dict__ recursively.
-        """
-        def convert(obj: Any) -> Any:
-            # None and primitives
-            if obj is None or isinstance(obj, (str, int, float, bool)):
-                return obj
-
-            # Enum
-            if isinstance(obj, Enum):
-                return obj.value
-
-            # List/tuple
-            if isinstance(obj, (list, tuple)):
-                return [convert(i) for i in obj]
-
-            # Dict
-            if isinstance(obj, dict):
-                return {str(k): convert(v) for k, v in obj.items()}
-
-            # Objects with __dict__
-            if hasattr(obj, "__dict__"):
-                out = {}
-                for k, v in vars(obj).items():
-                    if k.startswith("_"):
-                        continue
-                    out[k] = convert(v)
-                return out
-
-            # Fallback to string
-            try:
-                return str(obj)
-            except Exception:
-                return {"unserializable_type": str(type(obj))}
+    def _field(obj: Any, name: str) -> Any:
+        """Attribute or dict key `name` of `obj` (SDK objects and plain dumps alike)."""
+        if isinstance(obj, dict):
+            return obj.get(name)
+        return getattr(obj, name, None)
 
-        try:
-            converted = convert(raw)
-            return json.dumps(converted, indent=2, ensure_ascii=False)
-        except Exception as e:
-            return json.dumps({"error": str(e), "type": str(type(raw))}, indent=2)
+    @staticmethod
+    def get_grounding_metadata(response: Any) -> Any:
+        """grounding_metadata of the first candidate, or `response` itself if it already is one."""
+        field = CommonFunctions._field
+        if response is None:
+            return None
+        if field(response, "grounding_chunks") is not None or field(response, "grounding_supports") is not None:
+            return response
+
+        candidates = field(response, "candidates") or []
+        for candidate in candidates:
+            metadata = field(candidate, "grounding_metadata")
+            if metadata is not None:
+                return metadata
+        return None
 
     @staticmethod
-    def extract_sources(response: Any) -> List[Dict[str, str]]:
+    def extract_sources(response: Any) -> List[Dict[str, Any]]:
         """
-        Extract sources (title, uri) from a response's string representation.
-        Returns a list of {"title": ..., "url": ...} dictionaries.
-        This is a best-effort parser that looks for common patterns.
+        Extract the web sources of a grounded response from its
+        `grounding_metadata`, in one pass over chunks and supports.
+
+        Sources are deduplicated by URL and numbered in order of first
+        appearance. Each is {"index", "title", "url", "domain", "segments"},
+        where segments are the answer spans ({"start", "end", "text"}) that
+        grounding supports attribute to that source.
+        Accepts a response, a candidate's grounding_metadata, or their dumps.
         """
-        text = ""
-        try:
-            # Prefer structured fields if present
-            if hasattr(response, "candidates") and response.candidates:
-                # Try to pull from candidate content metadata if available
-                for cand in response.candidates:
-                    # attempt to get source metadata
-                    # many SDK responses embed source info in .metadata or .content
-                    if hasattr(cand, "content") and hasattr(cand.content, "metadata"):
-                        meta = getattr(cand.content, "metadata", None)
-                        if isinstance(meta, dict):
-                            # try to extract title/url pairs
-                            titles = meta.get("titles") or meta.get("title")
-                            uri = meta.get("uri") or meta.get("url")
-                            if uri:
-                                return [{"title": titles or str(uri), "url": uri}]
-                # fallback to stringifying
-                text = str(response)
-            else:
-                text = str(response)
-        except Exception:
-            text = str(response)
-
-        # regex extraction fallback
-        titles = re.findall(r"title=['\"]([^'\"]+)['\"]", text)
-        urls = re.findall(r"(?:uri|url|link)=['\"]([^'\"]+)['\"]", text)
-
-        results: List[Dict[str, str]] = []
-        for t, u in zip(titles, urls):
-            results.append({"title": t, "url": u})
-
-        # If no pairs found, return empty list
-        return results
+        field = CommonFunctions._field
+        metadata = CommonFunctions.get_grounding_metadata(response)
+        if metadata is None:
+            return []
+
+        sources: List[Dict[str, Any]] = []
+        by_url: Dict[str, Dict[str, Any]] = {}
+        chunk_sources: List[Optional[Dict[str, Any]]] = []
+
+        for chunk in field(metadata, "grounding_chunks") or []:
+            web = field(chunk, "web") or field(chunk, "retrieved_context")
+            url = field(web, "uri") if web is not None else None
+            if not url:
+                chunk_sources.append(None)
+                continue
+
+            source = by_url.get(url)
+            if source is None:
+                domain = field(web, "domain") or ""
+                source = {
+                    "index": len(sources) + 1,
+                    "title": field(web, "title") or domain or url,
+                    "url": url,
+                    "domain": domain,
+                    "segments": [],
+                }
+                by_url[url] = source
+                sources.append(source)
+            chunk_sources.append(source)
+
+        seen_segments = set()
+        for support in field(metadata, "grounding_supports") or []:
+            segment = field(support, "segment")
+            if segment is None:
+                continue
+            span = {
+                "start": field(segment, "start_index") or 0,
+                "end": field(segment, "end_index") or 0,
+                "text": field(segment, "text") or "",
+            }
+            for chunk_index in field(support, "grounding_chunk_indices") or []:
+                if not 0 <= chunk_index < len(chunk_sources) or chunk_sources[chunk_index] is None:
+                    continue
+                source = chunk_sources[chunk_index]
+                key = (source["index"], span["start"], span["end"])
+                if key not in seen_segments:
+                    seen_segments.add(key)
+                    source["segments"].append(span)
+
+        return sources
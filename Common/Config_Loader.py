@@ -1,37 +1,97 @@
 import os
+import sys
 import json
+import threading
 import configparser
+from types import MappingProxyType
 from dotenv import load_dotenv
-from google.genai.client import Client
+from Common.Common_Functions import CommonFunctions as common
 from Common.Logger_Config import logging
-import streamlit as st
+from Common import Constant as c
+
+
+class ConfigSnapshot:
+    """
+    Immutable, flattened view of every config source.
+
+    `sections` maps section name -> read-only dict, `flat` maps every key to
+    its value using the same precedence as the old linear scan, and the
+    system instruction is read once. Local keys are stored lowercased
+    because configparser matches option names case-insensitively.
+    """
+
+    def __init__(self, sections, flat, system_instruction, api_key, google_creds, case_insensitive):
+        self.sections = MappingProxyType({
+            name: MappingProxyType(dict(values)) for name, values in sections.items()
+        })
+        self.flat = MappingProxyType(dict(flat))
+        self.system_instruction = system_instruction
+        self.api_key = api_key
+        self.google_creds = google_creds
+        self.case_insensitive = case_insensitive
+
+    def key(self, key_name):
+        return key_name.lower() if self.case_insensitive else key_name
 
 
 class Config:
     def __init__(self, config_path=None):
 
+        # st.secrets only exists inside a Streamlit app, so the CLI never imports streamlit
         self.is_streamlit_cloud = False
-        try:
-            if hasattr(st, "secrets") and len(st.secrets) > 0:
-                self.is_streamlit_cloud = True
-        except:
-            self.is_streamlit_cloud = False
+        if "streamlit" in sys.modules:
+            import streamlit as st
+            try:
+                if hasattr(st, "secrets") and len(st.secrets) > 0:
+                    self.is_streamlit_cloud = True
+            except:
+                self.is_streamlit_cloud = False
+
+        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.secrets_dir = os.getenv(c.SECRETS_DIR_ENV) or os.path.join(BASE_DIR, "Secrets")
+        self.config_path = config_path or os.path.join(self.secrets_dir, "Config.ini")
+        self.env_path = os.path.join(self.secrets_dir, ".env")
+        self.system_instruction_path = os.path.join(self.secrets_dir, "SYSTEM_INSTRUCTION.txt")
 
         if self.is_streamlit_cloud:
             logging.info("Running on Streamlit Cloud → Using st.secrets")
-            self._load_streamlit_secrets()
+            self._snapshot = self._load_streamlit_secrets()
         else:
             logging.info("Running Locally → Using Secrets folder")
-            self._load_local_secrets(config_path)
+            self._snapshot = self._load_local_secrets()
+
+        self._watch_stop = threading.Event()
+        self._watch_thread = None
+        if not self.is_streamlit_cloud:
+            self._file_signature = self._get_file_signature()
+            interval = common.to_float(self.fetch_optional_value("CONFIG_RELOAD_INTERVAL"), c.CONFIG_RELOAD_INTERVAL)
+            if interval > 0:
+                self._start_watcher(interval)
+
+    # ------------------------------------------------------------
+    # Snapshot Accessors (kept for existing callers)
+    # ------------------------------------------------------------
+    @property
+    def api_key(self):
+        return self._snapshot.api_key
+
+    @property
+    def google_creds(self):
+        return self._snapshot.google_creds
+
+    @property
+    def snapshot(self):
+        return self._snapshot
 
     # ------------------------------------------------------------
     # LOAD SECRETS FROM STREAMLIT CLOUD
     # ------------------------------------------------------------
     def _load_streamlit_secrets(self):
+        import streamlit as st
 
         # Required API Key
-        self.api_key = st.secrets.get("GEMINI_API_KEY")
-        if not self.api_key:
+        api_key = st.secrets.get("GEMINI_API_KEY")
+        if not api_key:
             raise KeyError("❌ GEMINI_API_KEY missing in Streamlit Secrets")
 
         # Load MODEL and SHEET sections
@@ -41,7 +101,7 @@ class Config:
         }
 
         # Load Service Account JSON
-        self.google_creds = st.secrets.get("google_service_account")
+        google_creds = st.secrets.get("google_service_account")
 
         self.system_instruction_table = (
             st.secrets.get("SYSTEM_INSTRUCTION_FILE")
@@ -49,57 +109,141 @@ class Config:
             or None
         )
 
+        system_instruction = None
         if self.system_instruction_table:
             logging.info("✅ SYSTEM_INSTRUCTION_FILE loaded successfully from Streamlit Secrets.")
+            inst = self.system_instruction_table.get("SYSTEM_INSTRUCTION")
+            if inst:
+                system_instruction = inst.strip()
         else:
             logging.warning("❌ SYSTEM_INSTRUCTION_FILE missing in Streamlit Secrets.")
 
+        # Same precedence as the old scan: top-level secret, MODEL/SHEET, other secret sections
+        flat = {}
+        secret_sections = {}
+        for name, value in st.secrets.items():
+            flat.setdefault(name, value)
+            if hasattr(value, "items"):
+                secret_sections[name] = dict(value)
+        for section in list(self.config.values()) + list(secret_sections.values()):
+            for key, value in section.items():
+                flat.setdefault(key, value)
+
+        sections = dict(secret_sections)
+        sections.update(self.config)
+
+        return ConfigSnapshot(sections, flat, system_instruction, api_key, google_creds, False)
+
     # ------------------------------------------------------------
     # LOAD LOCAL FILES FROM Secrets/
     # ------------------------------------------------------------
-    def _load_local_secrets(self, config_path):
-
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        SECRETS_DIR = os.path.join(BASE_DIR, "Secrets")
+    def _load_local_secrets(self, override_env=False):
 
         # Validate Secrets folder
-        if not os.path.exists(SECRETS_DIR):
-            raise FileNotFoundError(f"❌ Secrets folder missing at: {SECRETS_DIR}")
+        if not os.path.exists(self.secrets_dir):
+            raise FileNotFoundError(f"❌ Secrets folder missing at: {self.secrets_dir}")
 
         # Load .env
-        env_path = os.path.join(SECRETS_DIR, ".env")
-        if not os.path.exists(env_path):
-            raise FileNotFoundError(f"❌ .env missing at: {env_path}")
-        load_dotenv(env_path)
+        if not os.path.exists(self.env_path):
+            raise FileNotFoundError(f"❌ .env missing at: {self.env_path}")
+        load_dotenv(self.env_path, override=override_env)
 
         # Load Config.ini
-        if config_path is None:
-            config_path = os.path.join(SECRETS_DIR, "Config.ini")
-
-        if not os.path.exists(config_path):
-            raise FileNotFoundError(f"❌ Config.ini missing at: {config_path}")
+        if not os.path.exists(self.config_path):
+            raise FileNotFoundError(f"❌ Config.ini missing at: {self.config_path}")
 
-        self.config = configparser.ConfigParser()
-        self.config.read(config_path)
+        parser = configparser.ConfigParser()
+        parser.read(self.config_path)
 
         # API Key
-        self.api_key = (
+        api_key = (
             os.getenv("GEMINI_API_KEY")
-            or self.config["API"].get("GEMINI_API_KEY")
+            or parser["API"].get("GEMINI_API_KEY")
         )
-        if not self.api_key:
+        if not api_key:
             raise ValueError("❌ GEMINI_API_KEY missing in .env or Config.ini")
 
         # Service Account JSON
-        sa_path = os.path.join(SECRETS_DIR, "Service_Account.json")
-        self.google_creds = (
-            json.load(open(sa_path)) if os.path.exists(sa_path) else None
-        )
+        sa_path = os.path.join(self.secrets_dir, "Service_Account.json")
+        google_creds = None
+        if os.path.exists(sa_path):
+            with open(sa_path) as f:
+                google_creds = json.load(f)
+
+        # System instruction (read once per snapshot)
+        system_instruction = None
+        if os.path.exists(self.system_instruction_path):
+            with open(self.system_instruction_path, "r", encoding="utf-8") as f:
+                system_instruction = f.read().strip()
+        else:
+            logging.warning(f"⚠ SYSTEM_INSTRUCTION.txt not found at: {self.system_instruction_path}")
+
+        sections = {name: dict(parser[name]) for name in parser.sections()}
+        flat = {}
+        for values in sections.values():
+            for key, value in values.items():
+                flat.setdefault(key, value)
+
+        self.config = parser
+        return ConfigSnapshot(sections, flat, system_instruction, api_key, google_creds, True)
+
+    # ------------------------------------------------------------
+    # Hot Reload
+    # ------------------------------------------------------------
+    def _get_file_signature(self):
+        signature = []
+        for path in (self.config_path, self.env_path, self.system_instruction_path):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_ino, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def check_for_changes(self):
+        """
+        Rebuilds the snapshot when Config.ini, .env or the instruction file
+        changed (mtime/inode/size). The new snapshot replaces the old one in a
+        single assignment, so readers always see a complete snapshot.
+        """
+        if self.is_streamlit_cloud:
+            return False
+
+        signature = self._get_file_signature()
+        if signature == self._file_signature:
+            return False
+
+        try:
+            snapshot = self._load_local_secrets(override_env=True)
+        except Exception as e:
+            logging.error(f"❌ Config reload failed, keeping previous config: {e}")
+            return False
+
+        self._file_signature = signature
+        self._snapshot = snapshot
+        logging.info("✅ Config reloaded")
+        return True
+
+    def _start_watcher(self, interval):
+        def watch():
+            while not self._watch_stop.wait(interval):
+                try:
+                    self.check_for_changes()
+                except Exception as e:
+                    logging.error(f"❌ Config watcher error: {e}")
+
+        self._watch_thread = threading.Thread(target=watch, name="ConfigWatcher", daemon=True)
+        self._watch_thread.start()
+
+    def stop_watcher(self):
+        self._watch_stop.set()
 
     # ------------------------------------------------------------
     # Gemini Client
     # ------------------------------------------------------------
     def get_client(self):
+        from google.genai.client import Client
+
         try:
             return Client(api_key=self.api_key)
         except Exception as e:
@@ -109,86 +253,79 @@ class Config:
     # Model Name Fetch
     # ------------------------------------------------------------
     def get_model(self, model_name):
+        snapshot = self._snapshot
+        section = snapshot.sections.get("MODEL", {})
+        key = snapshot.key(model_name)
 
-        section = (
-            self.config.get("MODEL", {})
-            if self.is_streamlit_cloud
-            else self.config["MODEL"]
-        )
-
-        if model_name not in section:
+        if key not in section:
             raise ValueError(f"❌ Model not found: {model_name}")
 
-        return section[model_name]
+        return section[key]
 
     # ------------------------------------------------------------
     # System Instruction Loader
     # ------------------------------------------------------------
     def get_system_instruction(self):
-        try:
-            if self.is_streamlit_cloud:
-
-                table = (
-                    self.system_instruction_table
-                    or st.secrets.get("SYSTEM_INSTRUCTION_FILE")
-                    or st.secrets.get("system_instruction_file")
-                )
-
-                if table:
-                    inst = table.get("SYSTEM_INSTRUCTION")
-                    if inst:
-                        logging.info("✅ SYSTEM_INSTRUCTION loaded from Streamlit")
-                        return inst.strip()
-
-                logging.warning("❌ SYSTEM_INSTRUCTION not found in Streamlit secrets.")
-                return None
-
-            # Local machine
-            BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            file_path = os.path.join(BASE_DIR, "Secrets", "SYSTEM_INSTRUCTION.txt")
-
-            if os.path.exists(file_path):
-                return open(file_path, "r", encoding="utf-8").read().strip()
-
-            logging.warning(f"⚠ SYSTEM_INSTRUCTION.txt not found at: {file_path}")
-            return None
-
-        except Exception as e:
-            logging.error(f"❌ Error loading system instruction: {e}")
-            return None
+        return self._snapshot.system_instruction
 
     # ------------------------------------------------------------
     # Sheet Values Fetch
     # ------------------------------------------------------------
-    def fetch_sheet_value(self, key):
-        return self.config["SHEET"].get(key)
+    def fetch_sheet_value(self, key, default=None):
+        snapshot = self._snapshot
+        value = snapshot.sections.get("SHEET", {}).get(snapshot.key(key))
+        return default if value in (None, "") else value
 
     # ------------------------------------------------------------
     # General Key Finder
     # ------------------------------------------------------------
     def fetch_key_value(self, key_name):
-        # Streamlit CLOUD MODE
-        if self.is_streamlit_cloud:
-            if key_name in st.secrets:
-                return st.secrets[key_name]
-
-            for section_name, section in self.config.items():
-                if isinstance(section, dict) and key_name in section:
-                    return section[key_name]
-            for section_name, section in st.secrets.items():
-                if isinstance(section, dict) and key_name in section:
-                    return section[key_name]
-
-        # LOCAL MODE
-        else:
-
-            for sec in self.config.sections():
-                if key_name in self.config[sec]:
-                    return self.config[sec][key_name]
-            env_value = os.getenv(key_name)
-            if env_value:
-                return env_value
+        snapshot = self._snapshot
+        value = snapshot.flat.get(snapshot.key(key_name))
+        if value is not None:
+            return value
+
+        # LOCAL MODE falls back to environment variables
+        if not snapshot.case_insensitive:
+            raise KeyError(f"❌ Key '{key_name}' not found in any config source.")
+
+        env_value = os.getenv(key_name)
+        if env_value:
+            return env_value
         raise KeyError(f"❌ Key '{key_name}' not found in any config source.")
 
-# GLOBAL SINGLETON
-config = Config()
+    def fetch_optional_value(self, key_name, default=None):
+        """Same as fetch_key_value, but returns `default` for missing keys."""
+        try:
+            return self.fetch_key_value(key_name)
+        except KeyError:
+            return default
+
+class LazyConfig:
+    """
+    Stands in for the Config singleton and builds it on first use, so
+    importing a module never reads secrets. Attribute access is forwarded
+    to the real Config.
+    """
+
+    def __init__(self):
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = Config()
+        return self._instance
+
+    @property
+    def is_loaded(self):
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+
+# GLOBAL SINGLETON (loaded on first use)
+config = LazyConfig()
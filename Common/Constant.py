@@ -2,24 +2,67 @@ ERROR = "ERROR"
 NO_RESPONSE = "No response received"
 EMPTY_ANSWER = "Empty answer"
 RECEIVED = "Received"
+CACHED = "Cached"
 FAILED = "Failed"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 SOLID_BORDER = "SOLID"
 FORMATTED_RESPONSE_TEMPLATE = [{
     "question": "",
     "answer": "",
-    # "sources": []
+    "sources": []
 }]
 FORMATTED_RESPONSE_USAGE_TEMPLATE = [{
     "prompt_token": "",
     "output_token": "",
     "thinking_token": "",
-    "total_token": ""
+    "total_token": "",
+    "latency_ms": "",
+    "route": {},
+    "search": {},
+    "sources": "",
+    "budget": {},
+    "stage_timings_ms": {}
 }]
 NA = "N/A"
 PRO_MODEL = "-pro"
 MODEL_THINKING_BUDGET = 500
 
+# Model router (model and thinking budget per question)
+ROUTER_POLICY_ADAPTIVE = "adaptive"
+ROUTER_POLICY_FIXED = "fixed"
+ROUTER_POLICY = ROUTER_POLICY_ADAPTIVE
+ROUTER_TIER_FAST = "fast"
+ROUTER_TIER_DEFAULT = "default"
+ROUTER_TIER_DEEP = "deep"
+ROUTER_FAST_THRESHOLD = 0.15
+ROUTER_THINK_THRESHOLD = 0.35
+ROUTER_DEEP_THRESHOLD = 0.7
+ROUTER_THINKING_BUDGET_MIN = 128
+ROUTER_THINKING_BUDGET_MAX = 2048
+ROUTER_PRO_MIN_THINKING_BUDGET = 128
+ROUTER_LONG_QUESTION_TOKENS = 150
+ROUTER_SHORT_QUESTION_TOKENS = 4
+ROUTER_LENGTH_WEIGHT = 0.4
+ROUTER_LATENCY_TARGET_MS = 15000
+ROUTER_TOKEN_TARGET = 4000
+ROUTER_MAX_ERROR_RATE = 0.5
+ROUTER_MIN_OBSERVATIONS = 3
+ROUTER_DEGRADED_RETRY_SECONDS = 120
+ROUTER_EWMA_ALPHA = 0.2
+ROUTER_COMMAND = "/route"
+
+# Search grounding selection (Google Search tool per turn)
+SEARCH_POLICY_AUTO = "auto"
+SEARCH_POLICY_ALWAYS = "always"
+SEARCH_POLICY_NEVER = "never"
+SEARCH_POLICY = SEARCH_POLICY_AUTO
+SEARCH_BIAS = -1.0
+SEARCH_THRESHOLD = 0.5
+SEARCH_WEIGHTS_FILE = "search_weights.json"
+SEARCH_FIT_EPOCHS = 500
+SEARCH_FIT_LEARNING_RATE = 0.5
+SEARCH_FIT_MAX_SAMPLES = 5000
+
 THINKING = "Thinking..."
 GENERATING = "Generating..."
 
@@ -33,6 +76,182 @@ BLOCK_NONE = "BLOCK_NONE"
 BLOCK_MEDIUM_AND_ABOVE = "BLOCK_MEDIUM_AND_ABOVE"
 BLOCK_LOW_AND_ABOVE = "BLOCK_LOW_AND_ABOVE"
 
-MAX_CONTEXT = 6
 MAX_INPUT_TOKEN_LENGTH = 200
-MAX_OUTPUT_TOKEN_LENGTH = None
\ No newline at end of file
+MAX_OUTPUT_TOKEN_LENGTH = None
+
+# Google Sheet background writer
+SHEET_WRITE_MODE_ASYNC = "async"
+SHEET_WRITE_MODE_SYNC = "sync"
+SHEET_WRITE_MODE = SHEET_WRITE_MODE_ASYNC
+SHEET_WRITE_BATCH_SIZE = 20
+SHEET_WRITE_FLUSH_INTERVAL = 5.0
+SHEET_WRITE_QUEUE_SIZE = 1000
+SHEET_WRITE_ENQUEUE_TIMEOUT = 1.0
+SHEET_WRITE_CLOSE_TIMEOUT = 30.0
+SHEET_DEAD_LETTER_FILE = "sheet_dead_letter.jsonl"
+
+# Local sheet journal (write-ahead log replayed to the sheet)
+SHEET_RECORD_ID_COLUMN = 10
+JOURNAL_ENABLED = True
+JOURNAL_DB_FILE = "sheet_journal.db"
+JOURNAL_SYNCHRONOUS = "FULL"
+JOURNAL_REPLAY_BATCH_SIZE = 200
+JOURNAL_MAX_ATTEMPTS = 5
+JOURNAL_RETENTION_DAYS = 30
+
+# Log sinks (comma-separated: sheets, sqlite, parquet)
+LOG_SINK_SHEETS = "sheets"
+LOG_SINK_SQLITE = "sqlite"
+LOG_SINK_PARQUET = "parquet"
+LOG_SINKS = f"{LOG_SINK_SHEETS},{LOG_SINK_SQLITE}"
+LOG_TABLE = "turn_log"
+LOG_DB_FILE = "logs.db"
+LOG_PARQUET_DIR = "logs_parquet"
+LOG_PARQUET_BATCH_SIZE = 100
+
+# Google Sheet border formatting
+BORDER_MODE_BATCH = "batch"
+BORDER_MODE_PREFORMATTED = "preformatted"
+BORDER_MODE_ROW = "row"
+BORDER_MODE_NONE = "none"
+BORDER_MODE = BORDER_MODE_BATCH
+BORDER_PREFORMAT_ROWS = 1000
+
+# Response cache
+CACHE_ENABLED = True
+CACHE_MAX_ENTRIES = 500
+CACHE_TTL_SECONDS = 6 * 60 * 60
+
+# Token-budgeted context window
+CONTEXT_TOKEN_BUDGET = 1500
+CONTEXT_SUMMARY_TOKEN_BUDGET = 300
+CONTEXT_SUMMARY_USER_WORDS = 25
+CONTEXT_SUMMARY_ASSISTANT_WORDS = 40
+CONTEXT_SUMMARY_MODE_LOCAL = "local"
+CONTEXT_SUMMARY_MODE_MODEL = "model"
+CONTEXT_SUMMARY_MODE = CONTEXT_SUMMARY_MODE_LOCAL
+
+# Session history (recent turns in memory, all turns on disk)
+HISTORY_STORE_ENABLED = True
+HISTORY_DB_FILE = "sessions.db"
+HISTORY_RING_SIZE = 50
+HISTORY_RETENTION_DAYS = 30
+HISTORY_IDLE_SECONDS = 1800
+HISTORY_EVICT_INTERVAL = 60
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation. Keep facts, names, "
+    "decisions and open questions; be brief.\n\n"
+    "Current summary:\n{summary}\n\nNew turns:\n{turns}\n\nUpdated summary:"
+)
+
+# Local token estimator
+TOKEN_CHARS_PER_TOKEN = 4
+TOKEN_CALIBRATION_SMOOTHING = 0.2
+TOKEN_RATIO_MIN = 0.5
+TOKEN_RATIO_MAX = 3.0
+
+# Explicit context caching of the system instruction
+PROMPT_CACHE_ENABLED = False
+PROMPT_CACHE_TTL_SECONDS = 3600
+PROMPT_CACHE_REFRESH_MARGIN = 300
+PROMPT_CACHE_RETRY_AFTER = 600
+PROMPT_CACHE_DISPLAY_NAME = "syncwithme-system-instruction"
+PROMPT_CACHE_NO_TOOLS = "no_tools"
+
+# Token ledger and budgets (0 = unlimited)
+TOKEN_LEDGER_ENABLED = True
+TOKEN_LEDGER_DB_FILE = "token_ledger.db"
+TOKEN_LEDGER_BUCKET_SECONDS = 60
+TOKEN_LEDGER_FLUSH_INTERVAL = 30.0
+TOKEN_LEDGER_RETENTION_DAYS = 90
+TOKEN_BUDGET_WINDOW_SECONDS = 3600
+TOKEN_BUDGET_GLOBAL = 0
+TOKEN_BUDGET_SESSION = 0
+TOKEN_DEGRADE_CONTEXT_AT = 0.7
+TOKEN_DEGRADE_THINKING_AT = 0.85
+TOKEN_DEGRADE_MODEL_AT = 0.95
+TOKEN_DEGRADED_CONTEXT_RATIO = 0.5
+TOKEN_QUEUE_TIMEOUT = 30.0
+BUDGET_LEVEL_NORMAL = "normal"
+BUDGET_LEVEL_CONTEXT = "smaller_context"
+BUDGET_LEVEL_NO_THINKING = "no_thinking"
+BUDGET_LEVEL_CHEAP_MODEL = "cheaper_model"
+BUDGET_LEVEL_EXHAUSTED = "exhausted"
+BUDGET_SCOPE_GLOBAL = "global"
+BUDGET_SCOPE_SESSION = "session"
+USAGE_COMMAND = "/usage"
+TOKEN_BUDGET_EXHAUSTED = "Sorry, the token budget is used up for now. Please try again later."
+GENERATE_CONFIG_CACHE_SIZE = 32
+
+# Overrides the Secrets/ folder location (used by the offline benchmarks)
+SECRETS_DIR_ENV = "SYNCWITHME_SECRETS_DIR"
+
+# Config hot reload (seconds between file checks, 0 disables)
+CONFIG_RELOAD_INTERVAL = 2.0
+
+# Shared resources
+CREDENTIALS_REFRESH_MARGIN = 300
+SHEET_RETRY_INTERVAL = 60
+
+# Batch question runner
+BATCH_CONCURRENCY = 4
+BATCH_REQUESTS_PER_MINUTE = 10
+BATCH_TOKENS_PER_MINUTE = 250000
+BATCH_OUTPUT_TOKEN_ESTIMATE = 800
+BATCH_CHECKPOINT_SUFFIX = ".checkpoint"
+
+# Retry, backoff and circuit breaker
+BACKEND_GEMINI = "gemini"
+BACKEND_SHEETS = "sheets"
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+RETRY_MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+RETRY_DEADLINE = 30.0
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0
+GEMINI_TIMEOUT_MS = 60000
+SHEETS_TIMEOUT = 20
+SHEET_WRITE_RETRY_DELAY = 15.0
+MODEL_UNAVAILABLE = "Sorry, the model is temporarily unavailable. Please try again shortly."
+
+# Latency spans and metrics
+METRICS_PREFIX = "syncwithme_"
+METRICS_LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+METRIC_STAGE_DURATION = "stage_duration_ms"
+METRIC_TURN_DURATION = "turn_duration_ms"
+METRIC_FIRST_CHUNK = "first_chunk_ms"
+METRIC_TURNS = "turns"
+METRIC_TOKENS = "tokens"
+METRIC_API_ERRORS = "api_errors"
+METRIC_CACHE_HITS = "response_cache_hits"
+METRIC_CACHE_MISSES = "response_cache_misses"
+METRIC_SEARCH_DECISIONS = "search_decisions"
+METRIC_BUDGET_LEVELS = "budget_levels"
+METRIC_SHEET_ROWS = "sheet_rows_written"
+METRIC_SHEET_QUEUE_DEPTH = "sheet_queue_depth"
+METRIC_SHEET_DEAD_LETTERED = "sheet_rows_dead_lettered"
+METRICS_COMMAND = "/metrics"
+METRICS_PANEL_ENABLED = False
+
+# Streamlit rendering windows
+UI_MESSAGE_WINDOW = 30
+UI_HISTORY_WINDOW = 50
+UI_HISTORY_PREVIEW_CHARS = 30
+
+# Response serialization
+SHEET_CELL_CHAR_LIMIT = 50000
+SERIALIZE_MAX_DEPTH = 12
+SERIALIZE_MIN_STRING = 16
+SERIALIZE_DEPTH_MARKER = "<max depth>"
+SERIALIZE_TRUNCATED_MARKER = "… [truncated {count} chars]"
+SERIALIZE_MORE_ITEMS_MARKER = "… [{count} more items]"
+SDK_RESPONSE_FIELDS = (
+    "candidates.content.parts.text",
+    "candidates.finish_reason",
+    "candidates.grounding_metadata.grounding_chunks",
+    "candidates.grounding_metadata.web_search_queries",
+    "usage_metadata",
+    "model_version",
+    "response_id",
+)
@@ -0,0 +1,371 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from Common.Logger_Config import logging
+from Common.Metrics import metrics
+from Common.Resilience import CircuitOpenError, is_retryable
+from Common import Constant as c
+
+
+class LogJournal:
+    """
+    Local append-only journal of sheet rows (SQLite in WAL mode).
+
+    Every row is stored here before any Sheets call, keyed by its record id,
+    so a turn's log survives Sheets outages, failed writes and restarts.
+    Rows move from `pending` to `sent` once they are in the sheet; rows that
+    keep failing with a permanent error are parked as `failed`.
+    """
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+    def __init__(self, db_path, synchronous=c.JOURNAL_SYNCHRONOUS, retention_days=c.JOURNAL_RETENTION_DAYS):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(folder, exist_ok=True)
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA synchronous={synchronous}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sheet_journal ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "record_id TEXT NOT NULL UNIQUE, "
+            "row_json TEXT NOT NULL, "
+            "status TEXT NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "sent_at REAL, "
+            "sheet_row INTEGER, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "last_error TEXT)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sheet_journal_status ON sheet_journal(status, seq)"
+        )
+        self._db.commit()
+        self.prune()
+        logging.info(f"✅ Sheet journal opened: {db_path} ({self.pending_count()} pending)")
+
+    # -------------------------------------------------------
+    # Write
+    # -------------------------------------------------------
+    def append(self, record_id, row):
+        """Durably stores one row. Appending the same record id twice is a no-op."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO sheet_journal (record_id, row_json, status, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (record_id, json.dumps(row, ensure_ascii=False), self.PENDING, time.time()),
+            )
+            self._db.commit()
+
+    def mark_sent(self, record_ids, first_row=None):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE sheet_journal SET status = ?, sent_at = ?, sheet_row = ?, last_error = NULL "
+                "WHERE record_id = ?",
+                [
+                    (self.SENT, now, first_row + index if first_row else None, record_id)
+                    for index, record_id in enumerate(record_ids)
+                ],
+            )
+            self._db.commit()
+
+    def mark_attempt(self, record_ids, error, max_attempts=c.JOURNAL_MAX_ATTEMPTS, permanent=False):
+        """Counts a failed attempt; rows past `max_attempts` permanent failures are parked."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE sheet_journal SET attempts = attempts + 1, last_error = ? WHERE record_id = ?",
+                [(str(error)[:500], record_id) for record_id in record_ids],
+            )
+            if permanent:
+                self._db.executemany(
+                    "UPDATE sheet_journal SET status = ? WHERE record_id = ? AND attempts >= ?",
+                    [(self.FAILED, record_id, max_attempts) for record_id in record_ids],
+                )
+            self._db.commit()
+
+    def requeue_failed(self):
+        """Moves parked rows back to pending, e.g. after fixing the sheet."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE sheet_journal SET status = ?, attempts = 0 WHERE status = ?",
+                (self.PENDING, self.FAILED),
+            )
+            self._db.commit()
+            return cursor.rowcount
+
+    def prune(self):
+        """Deletes sent rows older than the retention period."""
+        if not self.retention_days:
+            return 0
+        cutoff = time.time() - self.retention_days * 86400
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM sheet_journal WHERE status = ? AND sent_at < ?", (self.SENT, cutoff)
+            )
+            self._db.commit()
+            return cursor.rowcount
+
+    # -------------------------------------------------------
+    # Read
+    # -------------------------------------------------------
+    def pending(self, limit):
+        """Oldest pending rows as [(record_id, row, created_at)]."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT record_id, row_json, created_at FROM sheet_journal "
+                "WHERE status = ? ORDER BY seq LIMIT ?",
+                (self.PENDING, limit),
+            ).fetchall()
+        return [(record_id, json.loads(row_json), created_at) for record_id, row_json, created_at in rows]
+
+    def last_sheet_row(self):
+        """Highest sheet row of a sent row, or None when unknown."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT MAX(sheet_row) FROM sheet_journal WHERE status = ?", (self.SENT,)
+            ).fetchone()[0]
+
+    def pending_count(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM sheet_journal WHERE status = ?", (self.PENDING,)
+            ).fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM sheet_journal GROUP BY status"
+            ).fetchall())
+        return {status: counts.get(status, 0) for status in (self.PENDING, self.SENT, self.FAILED)}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class JournalReplayer:
+    """
+    Pushes pending journal rows to the sheet in bulk.
+
+    Drop-in replacement for SheetWriter: `enqueue(row)` only appends to the
+    local journal, so logging runs at disk speed. A worker thread sends the
+    oldest pending rows with one `write_fn(rows)` call once `batch_size` rows
+    are waiting or the oldest has waited `flush_interval` seconds; after an
+    outage the backlog is replayed `replay_batch_size` rows at a time.
+
+    Replays are idempotent: the record id is the row's last cell, and after
+    a failed or interrupted write `find_written_fn(record_ids, after_row)`
+    reports the ids that already reached the sheet below the last row known
+    to be written, so they are not appended again. A batch rejected with a
+    permanent error is resent one row at a time, so only the bad row is
+    parked.
+    """
+
+    def __init__(
+        self, journal, write_fn, find_written_fn=None,
+        batch_size=c.SHEET_WRITE_BATCH_SIZE,
+        flush_interval=c.SHEET_WRITE_FLUSH_INTERVAL,
+        replay_batch_size=c.JOURNAL_REPLAY_BATCH_SIZE,
+        retry_delay=c.SHEET_WRITE_RETRY_DELAY):
+
+        self.journal = journal
+        self.write_fn = write_fn
+        self.find_written_fn = find_written_fn
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval))
+        self.replay_batch_size = max(self.batch_size, int(replay_batch_size))
+        self.retry_delay = retry_delay
+
+        self._wake = threading.Event()
+        self._idle = threading.Condition()
+        self._flush_requested = 0
+        self._stopping = False
+        self._closed = False
+        self._step_lock = threading.Lock()
+        self._isolate = False
+        # rows from before this start may have been written without being marked sent
+        self._needs_reconcile = journal.pending_count() > 0
+
+        self._thread = threading.Thread(target=self._run, name="JournalReplayer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # -------------------------------------------------------
+    # Public API (same as SheetWriter)
+    # -------------------------------------------------------
+    def enqueue(self, row):
+        """Journals one row and wakes the worker."""
+        self.journal.append(row[c.SHEET_RECORD_ID_COLUMN - 1], row)
+        self._wake.set()
+
+    def send_now(self):
+        """
+        Sends pending rows from the calling thread (sync write mode). A failed
+        send leaves them journaled for the worker to retry, so the caller is
+        never blocked by an outage for longer than one attempt.
+        """
+        with self._step_lock:
+            self._step(force=True)
+
+    def queue_depth(self):
+        return self.journal.pending_count()
+
+    def flush(self, timeout=None):
+        """Blocks until every journaled row has been sent, or `timeout` passes."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._idle:
+            self._flush_requested += 1
+        try:
+            self._wake.set()
+            with self._idle:
+                while self.journal.pending_count():
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if (remaining is not None and remaining <= 0) or not self._thread.is_alive():
+                        return False
+                    self._idle.wait(remaining if remaining is not None else 1.0)
+            return True
+        finally:
+            with self._idle:
+                self._flush_requested -= 1
+
+    def close(self, timeout=c.SHEET_WRITE_CLOSE_TIMEOUT):
+        """Tries to send what is pending, then stops. Unsent rows stay journaled."""
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout)
+        self._closed = True
+
+        pending = self.journal.pending_count()
+        if pending:
+            logging.warning(f"⚠ {pending} journaled row(s) not yet in Google Sheet, they will be replayed on next start")
+
+    # -------------------------------------------------------
+    # Worker
+    # -------------------------------------------------------
+    def _run(self):
+        wait = 0.0
+        while not self._stopping:
+            # idle workers still poll, so rows left by a failed send_now() are retried
+            self._wake.wait(self.retry_delay if wait is None else wait)
+            self._wake.clear()
+            if self._stopping:
+                return
+
+            try:
+                with self._step_lock:
+                    wait = self._step(force=bool(self._flush_requested))
+            except Exception as e:
+                logging.error(f"❌ Journal replayer error: {e}")
+                wait = self.retry_delay
+
+            with self._idle:
+                self._idle.notify_all()
+
+    def _step(self, force=False):
+        """
+        Sends at most one batch. Returns how long to sleep before the next
+        step (None when nothing is pending).
+        """
+        batch = self.journal.pending(self.replay_batch_size)
+        metrics.set_gauge(c.METRIC_SHEET_QUEUE_DEPTH, len(batch))
+        if not batch:
+            return None
+
+        oldest_age = time.time() - batch[0][2]
+        if len(batch) < self.batch_size and oldest_age < self.flush_interval and not force:
+            return self.flush_interval - oldest_age
+
+        if self._needs_reconcile:
+            written = self._reconcile(batch)
+            if written is None:
+                return self.retry_delay
+            batch = [item for item in batch if item[0] not in written]
+            if not batch:
+                return 0.0
+
+        if self._isolate:
+            return self._send_one_by_one(batch)
+
+        record_ids = [record_id for record_id, _, _ in batch]
+        rows = [row for _, row, _ in batch]
+        try:
+            written = self.write_fn(rows)
+        except Exception as e:
+            # the write may have reached the sheet before failing, check before resending
+            self._needs_reconcile = True
+            if not self._is_transient(e) and len(batch) > 1:
+                # one bad row must not park the whole batch; find it row by row
+                logging.warning(f"⚠ {len(rows)} journaled row(s) rejected, resending one at a time: {e}")
+                self._isolate = True
+                return 0.0
+            self.journal.mark_attempt(record_ids, e, permanent=not self._is_transient(e))
+            logging.warning(f"⚠ Failed to replay {len(rows)} journaled row(s), will retry: {e}")
+            return self.retry_delay
+
+        first_row = written[0] if written else None
+        self.journal.mark_sent(record_ids, first_row)
+        logging.info(f"✅ Replayed {len(rows)} journaled row(s) to Google Sheet")
+        return 0.0
+
+    def _send_one_by_one(self, batch):
+        """Sends `batch` row by row; a permanently rejected row only counts an attempt for itself."""
+        sent = 0
+        for record_id, row, _ in batch:
+            try:
+                written = self.write_fn([row])
+            except Exception as e:
+                self._needs_reconcile = True
+                transient = self._is_transient(e)
+                self.journal.mark_attempt([record_id], e, permanent=not transient)
+                if transient:
+                    logging.warning(f"⚠ Failed to replay journaled row {record_id}, will retry: {e}")
+                    return self.retry_delay
+                logging.error(f"❌ Google Sheet rejected journaled row {record_id}: {e}")
+                continue
+            self.journal.mark_sent([record_id], written[0] if written else None)
+            sent += 1
+
+        self._isolate = False
+        logging.info(f"✅ Replayed {sent} of {len(batch)} journaled row(s) one at a time")
+        return 0.0
+
+    @staticmethod
+    def _is_transient(error):
+        return is_retryable(error) or isinstance(error, (CircuitOpenError, ConnectionError))
+
+    def _reconcile(self, batch):
+        """
+        Marks rows of `batch` that are already in the sheet as sent and
+        returns their record ids, or None when the sheet cannot be read.
+        """
+        if self.find_written_fn is None:
+            self._needs_reconcile = False
+            return set()
+        try:
+            written = set(self.find_written_fn(
+                [record_id for record_id, _, _ in batch], after_row=self.journal.last_sheet_row()
+            ))
+        except Exception as e:
+            logging.warning(f"⚠ Could not check which journaled rows reached the sheet: {e}")
+            return None
+
+        if written:
+            self.journal.mark_sent(sorted(written))
+            logging.info(f"✅ {len(written)} journaled row(s) were already in Google Sheet")
+        self._needs_reconcile = False
+        return written
@@ -0,0 +1,153 @@
+import sqlite3
+import time
+
+from Common.Log_Sinks import create_log_table
+from Common import Constant as c
+
+
+class LogQuery:
+    """
+    Read-only analytics over the SQLite log sink. Every query is answered
+    from an index on the local table, never from the sheet.
+
+    `since` arguments are epoch seconds; `window` arguments are seconds back
+    from now. Both are optional.
+    """
+
+    METRICS = ("latency_ms", "prompt_tokens", "output_tokens", "thinking_tokens", "total_tokens")
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        create_log_table(self._db)
+
+    @staticmethod
+    def _since(since=None, window=None):
+        if window:
+            return time.time() - window
+        return since or 0
+
+    # -------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------
+    def top_questions(self, limit=10, since=None, window=None):
+        """Most asked questions (case and spacing insensitive)."""
+        rows = self._db.execute(
+            f"SELECT question_key, COUNT(*) AS count, MAX(question) AS question, "
+            f"MAX(created_at) AS last_asked "
+            f"FROM {c.LOG_TABLE} WHERE created_at >= ? "
+            f"GROUP BY question_key ORDER BY count DESC, last_asked DESC LIMIT ?",
+            (self._since(since, window), limit),
+        ).fetchall()
+        return [
+            {"question": row["question"], "count": row["count"], "last_asked": row["last_asked"]}
+            for row in rows
+        ]
+
+    def percentiles(self, metric="latency_ms", percentiles=(50, 90, 99), since=None, window=None):
+        """
+        Nearest-rank percentiles of `metric` per model, e.g.
+        {"gemini-2.5-flash": {"n": 120, "p50": 810.0, "p90": ..., "p99": ...}}.
+        Each value is one indexed OFFSET lookup on (model, metric).
+        """
+        if metric not in self.METRICS:
+            raise ValueError(f"❌ Unknown metric '{metric}', expected one of {self.METRICS}")
+
+        since = self._since(since, window)
+        result = {}
+        for model in self.models():
+            count = self._db.execute(
+                f"SELECT COUNT(*) FROM {c.LOG_TABLE} "
+                f"WHERE model = ? AND {metric} IS NOT NULL AND created_at >= ?",
+                (model, since),
+            ).fetchone()[0]
+            if not count:
+                continue
+
+            stats = {"n": count}
+            for p in percentiles:
+                rank = max(1, -(-p * count // 100))  # ceil(p * count / 100)
+                stats[f"p{p}"] = self._db.execute(
+                    f"SELECT {metric} FROM {c.LOG_TABLE} "
+                    f"WHERE model = ? AND {metric} IS NOT NULL AND created_at >= ? "
+                    f"ORDER BY {metric} LIMIT 1 OFFSET ?",
+                    (model, since, rank - 1),
+                ).fetchone()[0]
+            result[model] = stats
+        return result
+
+    def error_rates(self, since=None, window=None):
+        """Turns, failures and error rate per model."""
+        rows = self._db.execute(
+            f"SELECT model, COUNT(*) AS turns, "
+            f"SUM(CASE WHEN status = ? THEN 1 ELSE 0 END) AS failed "
+            f"FROM {c.LOG_TABLE} WHERE created_at >= ? GROUP BY model",
+            (c.FAILED, self._since(since, window)),
+        ).fetchall()
+        return {
+            row["model"]: {
+                "turns": row["turns"],
+                "failed": row["failed"],
+                "error_rate": round(row["failed"] / row["turns"], 4) if row["turns"] else 0.0,
+            }
+            for row in rows
+        }
+
+    def grounding(self, since=None, window=None):
+        """
+        Share of answered turns sent with Google Search attached, and their
+        latency with and without it (mean and nearest-rank median).
+        """
+        since = self._since(since, window)
+        groups = {}
+        for enabled, label in ((1, "with_search"), (0, "without_search")):
+            count, avg = self._db.execute(
+                f"SELECT COUNT(*), AVG(latency_ms) FROM {c.LOG_TABLE} "
+                f"WHERE search = ? AND status = ? AND latency_ms IS NOT NULL AND created_at >= ?",
+                (enabled, c.RECEIVED, since),
+            ).fetchone()
+            median = None
+            if count:
+                median = self._db.execute(
+                    f"SELECT latency_ms FROM {c.LOG_TABLE} "
+                    f"WHERE search = ? AND status = ? AND latency_ms IS NOT NULL AND created_at >= ? "
+                    f"ORDER BY latency_ms LIMIT 1 OFFSET ?",
+                    (enabled, c.RECEIVED, since, (count - 1) // 2),
+                ).fetchone()[0]
+            groups[label] = {
+                "n": count,
+                "avg_ms": round(avg, 1) if avg is not None else None,
+                "p50_ms": median,
+            }
+
+        with_search, without_search = groups["with_search"], groups["without_search"]
+        turns = with_search["n"] + without_search["n"]
+        difference = {}
+        for key in ("avg_ms", "p50_ms"):
+            if with_search[key] is not None and without_search[key] is not None:
+                difference[key] = round(with_search[key] - without_search[key], 1)
+        return {
+            "turns": turns,
+            "grounding_rate": round(with_search["n"] / turns, 4) if turns else 0.0,
+            **groups,
+            "latency_difference_ms": difference,
+        }
+
+    def models(self):
+        return [
+            row[0] for row in self._db.execute(f"SELECT DISTINCT model FROM {c.LOG_TABLE}").fetchall()
+        ]
+
+    def report(self, window=None, limit=10):
+        """Everything above in one dict (used by `--log-report`)."""
+        return {
+            "top_questions": self.top_questions(limit, window=window),
+            "latency_ms": self.percentiles("latency_ms", window=window),
+            "total_tokens": self.percentiles("total_tokens", window=window),
+            "error_rates": self.error_rates(window=window),
+            "grounding": self.grounding(window=window),
+        }
+
+    def close(self):
+        self._db.close()
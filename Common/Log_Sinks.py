@@ -0,0 +1,276 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from Common.Logger_Config import logging
+from Common import Constant as c
+
+
+# -------------------------------------------------------
+# Log Record
+# -------------------------------------------------------
+def normalize_question(question):
+    """Key used to group repeated questions (case and spacing insensitive)."""
+    return re.sub(r"\s+", " ", str(question or "")).strip().lower()
+
+
+def _parse_usage(formatted_usage):
+    """Reads the usage dict back from the formatted usage JSON (None when unreadable)."""
+    try:
+        usage = json.loads(formatted_usage)
+    except (TypeError, ValueError):
+        return {}
+    if isinstance(usage, list):
+        usage = usage[0] if usage else {}
+    return usage if isinstance(usage, dict) else {}
+
+
+def _to_number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def build_log_record(
+    question, is_think, model_used,
+    response=c.NA, bot_text=c.NA,
+    formatted_response=None, formatted_usage=None,
+    cached=False):
+    """Flat, typed record of one turn for the local sinks."""
+    failed = isinstance(response, (str, Exception))
+    usage = _parse_usage(formatted_usage)
+    search = usage.get("search")
+    return {
+        "record_id": uuid.uuid4().hex,
+        "created_at": time.time(),
+        "question": str(question or ""),
+        "question_key": normalize_question(question),
+        "is_think": bool(is_think),
+        "model": str(model_used or c.NA),
+        "status": c.FAILED if failed else (c.CACHED if cached else c.RECEIVED),
+        "answer": str(response) if failed else str(bot_text or ""),
+        "latency_ms": _to_number(usage.get("latency_ms")),
+        "prompt_tokens": _to_number(usage.get("prompt_token")),
+        "output_tokens": _to_number(usage.get("output_token")),
+        "thinking_tokens": _to_number(usage.get("thinking_token")),
+        "total_tokens": _to_number(usage.get("total_token")),
+        "search": search.get("enabled") if isinstance(search, dict) and "enabled" in search else None,
+        "grounded": None if failed else _to_number(usage.get("sources")),
+        "formatted_response": formatted_response if isinstance(formatted_response, str) else None,
+        "formatted_usage": formatted_usage if isinstance(formatted_usage, str) else None,
+    }
+
+
+# -------------------------------------------------------
+# Sink Interface
+# -------------------------------------------------------
+class LogSink(ABC):
+    """
+    Destination for turn logs. Every sink stores the typed record built by
+    `build_log_record` in `save_record`; SheetClass also overrides
+    `save_question_response` to log the raw SDK response.
+    """
+
+    name = "sink"
+
+    def save_question_response(
+        self, question, is_think, model_used,
+        response=c.NA, bot_text=c.NA,
+        formatted_response=None, formatted_usage=None,
+        cached=False):
+
+        try:
+            self.save_record(build_log_record(
+                question, is_think, model_used, response, bot_text,
+                formatted_response, formatted_usage, cached,
+            ))
+        except Exception as e:
+            logging.error(f"❌ Failed to save row to {self.name} log: {e}")
+
+    @abstractmethod
+    def save_record(self, record):
+        """Stores one record from `build_log_record`."""
+
+    def queue_depth(self):
+        return 0
+
+    def flush(self, timeout=None):
+        return True
+
+    def close(self):
+        pass
+
+
+class SQLiteLogSink(LogSink):
+    """
+    Indexed local log table (SQLite in WAL mode). Backs `LogQuery`, so
+    analytics never need to download the sheet.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        create_log_table(self._db)
+        logging.info(f"✅ SQLite log opened: {db_path}")
+
+    def save_record(self, record):
+        columns = ", ".join(LOG_COLUMNS)
+        placeholders = ", ".join("?" for _ in LOG_COLUMNS)
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR IGNORE INTO {c.LOG_TABLE} ({columns}) VALUES ({placeholders})",
+                [record[column] for column in LOG_COLUMNS],
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ParquetLogSink(LogSink):
+    """
+    Columnar export: records are buffered and written as one Parquet file
+    per batch (`logs-<timestamp>.parquet`) for pandas / DuckDB / Spark.
+    Needs the optional `pyarrow` package.
+    """
+
+    name = "parquet"
+
+    def __init__(self, folder, batch_size=c.LOG_PARQUET_BATCH_SIZE):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("❌ The parquet log sink needs pyarrow: pip install pyarrow") from e
+
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.folder = folder
+        self.batch_size = max(1, int(batch_size))
+        self._buffer = []
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        logging.info(f"✅ Parquet log folder: {folder}")
+
+    def save_record(self, record):
+        with self._lock:
+            self._buffer.append(record)
+            if len(self._buffer) < self.batch_size:
+                return
+            records, self._buffer = self._buffer, []
+        self._write(records)
+
+    def _write(self, records):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = os.path.join(self.folder, f"logs-{stamp}.parquet")
+        table = self._pa.Table.from_pylist(records)
+        self._pq.write_table(table, path)
+        logging.info(f"✅ Wrote {len(records)} log record(s) to {path}")
+
+    def queue_depth(self):
+        return len(self._buffer)
+
+    def flush(self, timeout=None):
+        with self._lock:
+            records, self._buffer = self._buffer, []
+        if records:
+            try:
+                self._write(records)
+            except Exception as e:
+                logging.error(f"❌ Failed to write Parquet log: {e}")
+                return False
+        return True
+
+    def close(self):
+        self.flush()
+
+
+class MultiLogSink(LogSink):
+    """Fans every turn out to several sinks; one failing sink never blocks the others."""
+
+    name = "multi"
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def save_question_response(self, *args, **kwargs):
+        for sink in self.sinks:
+            try:
+                sink.save_question_response(*args, **kwargs)
+            except Exception as e:
+                logging.error(f"❌ Failed to save row to {type(sink).__name__}: {e}")
+
+    def save_record(self, record):
+        for sink in self.sinks:
+            try:
+                sink.save_record(record)
+            except Exception as e:
+                logging.error(f"❌ Failed to save row to {type(sink).__name__}: {e}")
+
+    def queue_depth(self):
+        return sum(sink.queue_depth() for sink in self.sinks)
+
+    def flush(self, timeout=None):
+        return all([sink.flush(timeout) for sink in self.sinks])
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+# -------------------------------------------------------
+# SQLite Schema
+# -------------------------------------------------------
+LOG_COLUMNS = (
+    "record_id", "created_at", "question", "question_key", "is_think", "model",
+    "status", "answer", "latency_ms", "prompt_tokens", "output_tokens",
+    "thinking_tokens", "total_tokens", "formatted_response", "formatted_usage",
+    "search", "grounded",
+)
+
+
+def create_log_table(db):
+    db.execute(
+        f"CREATE TABLE IF NOT EXISTS {c.LOG_TABLE} ("
+        "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "record_id TEXT NOT NULL UNIQUE, "
+        "created_at REAL NOT NULL, "
+        "question TEXT, "
+        "question_key TEXT, "
+        "is_think INTEGER, "
+        "model TEXT, "
+        "status TEXT, "
+        "answer TEXT, "
+        "latency_ms REAL, "
+        "prompt_tokens INTEGER, "
+        "output_tokens INTEGER, "
+        "thinking_tokens INTEGER, "
+        "total_tokens INTEGER, "
+        "formatted_response TEXT, "
+        "formatted_usage TEXT, "
+        "search INTEGER, "
+        "grounded INTEGER)"
+    )
+    # one index per query shape in LogQuery
+    for name, columns in (
+        ("created", "created_at"),
+        ("question", "question_key, created_at"),
+        ("model_status", "model, status, created_at"),
+        ("model_latency", "model, latency_ms"),
+        ("model_tokens", "model, total_tokens"),
+        ("search_latency", "search, status, latency_ms"),
+    ):
+        db.execute(f"CREATE INDEX IF NOT EXISTS idx_{c.LOG_TABLE}_{name} ON {c.LOG_TABLE}({columns})")
+    db.commit()
@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from Common import Constant as c
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(label_key, extra=None):
+    pairs = list(label_key) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    """Fixed-bucket histogram (milliseconds by default) with sum and count."""
+
+    def __init__(self, buckets=c.METRICS_LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Bucket upper bound below which a fraction `q` of observations fall."""
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for i, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "avg": round(self.sum / self.count, 3) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """
+    In-process counters, gauges and histograms.
+
+    Values can be dumped as JSON or in the Prometheus text exposition format
+    so the CLI, the Streamlit app or a scraper can read them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    # -------------------------------------------------------
+    # Recording
+    # -------------------------------------------------------
+    def inc(self, name, value=1, labels=None):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, labels=None):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, labels=None):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, stage, timings=None):
+        """
+        Times the enclosed block as `stage_duration_ms{stage=...}` and stores
+        the duration in `timings[stage]` when a dict is given.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.observe(c.METRIC_STAGE_DURATION, elapsed_ms, {"stage": stage})
+            if timings is not None:
+                timings[stage] = round(timings.get(stage, 0) + elapsed_ms, 1)
+
+    # -------------------------------------------------------
+    # Export
+    # -------------------------------------------------------
+    def snapshot(self):
+        from Common.Resilience import resilience
+
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: hist.to_dict() for key, hist in self._histograms.items()}
+
+        def flatten(items):
+            return {name + _format_labels(labels): value for (name, labels), value in sorted(items.items())}
+
+        return {
+            "counters": flatten(counters),
+            "gauges": flatten(gauges),
+            "histograms": flatten(histograms),
+            "circuit_breakers": resilience.stats(),
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, ensure_ascii=False)
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+
+            for (name, labels), value in counters:
+                lines.append(f"{c.METRICS_PREFIX}{name}_total{_format_labels(labels)} {value}")
+
+            for (name, labels), value in gauges:
+                lines.append(f"{c.METRICS_PREFIX}{name}{_format_labels(labels)} {value}")
+
+            for (name, labels), hist in histograms:
+                running = 0
+                for bound, count in zip(list(hist.buckets) + ["+Inf"], hist.counts):
+                    running += count
+                    lines.append(
+                        f"{c.METRICS_PREFIX}{name}_bucket{_format_labels(labels, [('le', bound)])} {running}"
+                    )
+                lines.append(f"{c.METRICS_PREFIX}{name}_sum{_format_labels(labels)} {round(hist.sum, 3)}")
+                lines.append(f"{c.METRICS_PREFIX}{name}_count{_format_labels(labels)} {hist.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes Prometheus text for *.prom / *.txt paths, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+# GLOBAL SINGLETON
+metrics = MetricsRegistry()
@@ -0,0 +1,310 @@
+import asyncio
+import random
+import re
+import threading
+import time
+
+from Common.Logger_Config import logging
+from Common import Constant as c
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit breaker is open."""
+
+
+# -------------------------------------------------------
+# Error Classification
+# -------------------------------------------------------
+def get_status_code(error):
+    """HTTP status of a google-genai / gspread / requests / httpx error, if any."""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def get_retry_after(error):
+    """Seconds the server asked us to wait (Retry-After header or RetryInfo), if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("Retry-After") or headers.get("retry-after")
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                pass
+
+    details = getattr(error, "details", None) or getattr(error, "message", None)
+    if details:
+        match = re.search(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", str(details))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def is_retryable(error):
+    """Transient errors: throttling, server errors, timeouts and connection failures."""
+    if isinstance(error, CircuitOpenError):
+        return False
+
+    status = get_status_code(error)
+    if status is not None:
+        return status in c.RETRYABLE_STATUS_CODES
+
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    name = type(error).__name__
+    return any(marker in name for marker in ("Timeout", "Connect", "Transport", "Network"))
+
+
+# -------------------------------------------------------
+# Circuit Breaker
+# -------------------------------------------------------
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive transient failures and fails
+    fast for `reset_timeout` seconds. After that one trial call is let
+    through (half-open); success closes the breaker, failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=c.BREAKER_FAILURE_THRESHOLD, reset_timeout=c.BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.short_circuited = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.short_circuited += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    self.short_circuited += 1
+                    return False
+                self._trial_in_flight = True
+
+            self.calls += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+            if self.state != self.CLOSED:
+                logging.info(f"✅ Circuit '{self.name}' closed")
+            self.state = self.CLOSED
+
+    def record_failure(self, transient=True):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if not transient:
+                if self.state == self.HALF_OPEN:
+                    self.state = self.CLOSED
+                return
+
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logging.warning(f"⚠ Circuit '{self.name}' opened after {self.consecutive_failures} failure(s)")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """
+        Ends a call that was interrupted (cancelled task, KeyboardInterrupt,
+        Streamlit rerun) without counting it as a success or a failure, so a
+        half-open breaker lets the next trial through.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries": self.retries,
+                "short_circuited": self.short_circuited,
+            }
+
+
+# -------------------------------------------------------
+# Retry Policy
+# -------------------------------------------------------
+class RetryPolicy:
+    """Jittered exponential backoff bounded by attempts and an overall deadline."""
+
+    def __init__(
+        self, max_attempts=c.RETRY_MAX_ATTEMPTS, base_delay=c.RETRY_BASE_DELAY,
+        max_delay=c.RETRY_MAX_DELAY, deadline=c.RETRY_DEADLINE):
+
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def next_delay(self, attempt, error, started):
+        """
+        Seconds to wait before attempt `attempt + 1`, or None to give up.
+        Uses "full jitter" unless the server asked for a specific delay.
+        """
+        if attempt >= self.max_attempts or not is_retryable(error):
+            return None
+
+        delay = get_retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+        if self.deadline and time.monotonic() - started + delay > self.deadline:
+            return None
+        return delay
+
+
+# -------------------------------------------------------
+# Resilience Registry
+# -------------------------------------------------------
+class Resilience:
+    """One breaker and retry policy per backend name ("gemini", "sheets")."""
+
+    def __init__(self):
+        self._breakers = {}
+        self._policies = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, name):
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name)
+            return self._breakers[name]
+
+    def policy(self, name):
+        with self._lock:
+            return self._policies.setdefault(name, RetryPolicy())
+
+    def configure(self, name, policy=None, breaker=None):
+        with self._lock:
+            if policy:
+                self._policies[name] = policy
+            if breaker:
+                self._breakers[name] = breaker
+
+    def call(self, name, fn, *args, **kwargs):
+        """Calls fn(*args, **kwargs) with retries and the backend's breaker."""
+        breaker = self.breaker(name)
+        policy = self.policy(name)
+        started = time.monotonic()
+        attempt = 0
+
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"{name} circuit is open, failing fast")
+
+            attempt += 1
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                breaker.record_failure(is_retryable(e))
+                delay = policy.next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+                breaker.record_retry()
+                logging.warning(f"⚠ {name} call failed ({e}), retry {attempt} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            except BaseException:
+                breaker.release_trial()
+                raise
+
+            breaker.record_success()
+            return result
+
+    def call_once(self, name, fn, *args, **kwargs):
+        """
+        Calls fn(*args, **kwargs) once through the backend's breaker. For
+        non-idempotent calls whose caller retries after checking what landed.
+        """
+        breaker = self.breaker(name)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{name} circuit is open, failing fast")
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            breaker.record_failure(is_retryable(e))
+            raise
+        except BaseException:
+            breaker.release_trial()
+            raise
+
+        breaker.record_success()
+        return result
+
+    async def acall(self, name, fn, *args, **kwargs):
+        """Async variant of call(); `fn` returns an awaitable."""
+        breaker = self.breaker(name)
+        policy = self.policy(name)
+        started = time.monotonic()
+        attempt = 0
+
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"{name} circuit is open, failing fast")
+
+            attempt += 1
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                breaker.record_failure(is_retryable(e))
+                delay = policy.next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+                breaker.record_retry()
+                logging.warning(f"⚠ {name} call failed ({e}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                breaker.release_trial()
+                raise
+
+            breaker.record_success()
+            return result
+
+    def stats(self):
+        """Breaker state and retry counters per backend, for monitoring."""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+# GLOBAL SINGLETON
+resilience = Resilience()
@@ -0,0 +1,213 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from Common.Common_Functions import CommonFunctions as common
+from Common.Config_Loader import config
+from Common.Logger_Config import logging
+from Common import Constant as c
+
+
+class SharedResources:
+    """
+    Process-wide registry of expensive, thread-safe resources.
+
+    Every Streamlit session (and the CLI) gets the same pooled Gemini client,
+    the same authorized gspread client and the same SheetClass, so auth
+    handshakes and HTTP connection pools are paid once per process. The
+    Gemini client is rebuilt when the API key changes in config, and the
+    service-account token is refreshed shortly before it expires.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+        self._gemini_client = None
+        self._gemini_api_key = None
+
+        self._credentials = None
+        self._credentials_source = None
+        self._gspread_client = None
+
+        self._sheet = None
+        self._sheet_failed_at = None
+        self._log_sink = None
+
+    # -------------------------------------------------------
+    # Gemini Client
+    # -------------------------------------------------------
+    def get_gemini_client(self):
+        with self._lock:
+            api_key = config.api_key
+            if self._gemini_client is None or api_key != self._gemini_api_key:
+                self._gemini_client = config.get_client()
+                self._gemini_api_key = api_key
+                logging.info("✅ Shared Gemini client created")
+            return self._gemini_client
+
+    # -------------------------------------------------------
+    # Google Credentials + gspread Client
+    # -------------------------------------------------------
+    def _load_credentials(self, scopes):
+        from google.oauth2.service_account import Credentials
+
+        if config.is_streamlit_cloud:
+            logging.info("Using Streamlit Cloud credentials")
+
+            service_info = config.google_creds
+            if not service_info:
+                raise ValueError("❌ Missing [google_service_account] in st.secrets")
+
+            source = ("info", id(service_info))
+            credentials = Credentials.from_service_account_info(
+                dict(service_info), scopes=scopes
+            )
+
+        else:
+            logging.info("Using Local Google JSON credentials")
+
+            service_file = os.path.join(
+                config.secrets_dir,
+                config.fetch_sheet_value("SERVICE_ACCOUNT_FILE")
+            )
+
+            if not os.path.exists(service_file):
+                raise FileNotFoundError(f"❌ Missing Service Account JSON at: {service_file}")
+
+            source = ("file", service_file, os.stat(service_file).st_mtime_ns)
+            credentials = Credentials.from_service_account_file(
+                service_file, scopes=scopes
+            )
+
+        return credentials, source
+
+    def _credentials_changed(self):
+        if self._credentials_source is None:
+            return True
+        if self._credentials_source[0] == "info":
+            return self._credentials_source[1] != id(config.google_creds)
+
+        service_file = self._credentials_source[1]
+        try:
+            return os.stat(service_file).st_mtime_ns != self._credentials_source[2]
+        except OSError:
+            return True
+
+    def _refresh_credentials(self):
+        """Refreshes the access token when it is missing or about to expire."""
+        from google.auth.transport.requests import Request
+
+        credentials = self._credentials
+        expiry = getattr(credentials, "expiry", None)
+        if credentials.token and expiry:
+            # google-auth keeps expiry as naive UTC
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            if (expiry - now).total_seconds() > c.CREDENTIALS_REFRESH_MARGIN:
+                return
+
+        try:
+            credentials.refresh(Request())
+        except Exception as e:
+            logging.error(f"❌ Could not refresh Google credentials: {e}")
+
+    def get_gspread_client(self, scopes):
+        import gspread
+
+        with self._lock:
+            if self._gspread_client is None or self._credentials_changed():
+                self._credentials, self._credentials_source = self._load_credentials(scopes)
+                self._gspread_client = gspread.authorize(self._credentials)
+                if hasattr(self._gspread_client, "set_timeout"):
+                    self._gspread_client.set_timeout(c.SHEETS_TIMEOUT)
+                logging.info("✅ Shared gspread client authorized")
+            else:
+                self._refresh_credentials()
+            return self._gspread_client
+
+    # -------------------------------------------------------
+    # Sheet Logger
+    # -------------------------------------------------------
+    def get_sheet(self):
+        """
+        Returns the shared SheetClass, or None when it cannot be loaded. A
+        failed load is retried after SHEET_RETRY_INTERVAL seconds instead of
+        on every session.
+        """
+        from Common.Sheet_Functions import SheetClass
+
+        with self._lock:
+            if self._sheet is not None:
+                return self._sheet
+
+            if self._sheet_failed_at and time.monotonic() - self._sheet_failed_at < c.SHEET_RETRY_INTERVAL:
+                return None
+
+            try:
+                self._sheet = SheetClass()
+                self._sheet_failed_at = None
+            except Exception as e:
+                logging.error(f"❌ Google Sheet unavailable: {e}")
+                self._sheet_failed_at = time.monotonic()
+
+            return self._sheet
+
+    def get_log_sink(self):
+        """
+        Returns the turn logger selected by LOG_SINKS ("sheets", "sqlite",
+        "parquet", comma-separated), or None when none can be loaded. A
+        sheets-only setup returns the SheetClass itself.
+        """
+        from Common.Log_Sinks import MultiLogSink, ParquetLogSink, SQLiteLogSink
+
+        with self._lock:
+            if self._log_sink is not None:
+                return self._log_sink
+
+            raw = config.fetch_optional_value("LOG_SINKS") or c.LOG_SINKS
+            names = [name.strip().lower() for name in str(raw).split(",") if name.strip()]
+            if names == [c.LOG_SINK_SHEETS]:
+                return self.get_sheet()
+
+            sinks = []
+            for name in names:
+                try:
+                    if name == c.LOG_SINK_SHEETS:
+                        sheet = self.get_sheet()
+                        if sheet is not None:
+                            sinks.append(sheet)
+                    elif name == c.LOG_SINK_SQLITE:
+                        sinks.append(SQLiteLogSink(self.log_db_path()))
+                    elif name == c.LOG_SINK_PARQUET:
+                        sinks.append(ParquetLogSink(
+                            config.fetch_optional_value("LOG_PARQUET_DIR")
+                            or os.path.join(config.secrets_dir, c.LOG_PARQUET_DIR),
+                            batch_size=common.to_int(
+                                config.fetch_optional_value("LOG_PARQUET_BATCH_SIZE"), c.LOG_PARQUET_BATCH_SIZE
+                            ),
+                        ))
+                    else:
+                        logging.warning(f"⚠ Unknown log sink '{name}' ignored")
+                except Exception as e:
+                    logging.error(f"❌ Log sink '{name}' unavailable: {e}")
+
+            if not sinks:
+                return None
+            self._log_sink = sinks[0] if len(sinks) == 1 else MultiLogSink(sinks)
+            return self._log_sink
+
+    @staticmethod
+    def log_db_path():
+        return config.fetch_optional_value("LOG_DB_PATH") or os.path.join(config.secrets_dir, c.LOG_DB_FILE)
+
+    def close(self):
+        """Flushes the shared sheet writer and log sinks; called on shutdown."""
+        with self._lock:
+            if self._log_sink is not None and self._log_sink is not self._sheet:
+                self._log_sink.close()
+            if self._sheet is not None:
+                self._sheet.close()
+
+
+# GLOBAL SINGLETON
+shared = SharedResources()
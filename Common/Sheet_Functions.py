@@ -1,24 +1,162 @@
 import os
-import gspread
-import streamlit as st
-from google.oauth2.service_account import Credentials
+import re
+import threading
+import uuid
 from datetime import datetime
-from gspread_formatting import Border, Borders, CellFormat, format_cell_range
 
 from Common.Config_Loader import config
+from Common.Common_Functions import CommonFunctions as common
+from Common.Log_Journal import JournalReplayer, LogJournal
+from Common.Log_Sinks import LogSink
 from Common.Logger_Config import logging
+from Common.Metrics import metrics
+from Common.Resilience import resilience
+from Common.Shared_Resources import shared
+from Common.Sheet_Writer import SheetWriter
 from Common import Constant as c
 
 
-class SheetClass:
-    def __init__(self):
+class RowAllocator:
+    """
+    Tracks the last written row and serial number locally so a save never has
+    to download the sheet.
+
+    The sheet is read once at startup. Serial numbers are derived from the row
+    number (`sr_no = row - offset`), so every process sharing the sheet computes
+    the same serial for the same row. When another process appended in between,
+    the range returned by `append_rows` shows where our rows really landed and
+    only those serial cells are rewritten.
+    """
+
+    RANGE_PATTERN = re.compile(r"![A-Z]+(\d+)(?::[A-Z]+(\d+))?$")
+
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self.last_row = 0
+        self.offset = 0
+        self.resync()
+
+    # -------------------------------------------------------
+    # Read last row once
+    # -------------------------------------------------------
+    def resync(self):
+        values = resilience.call(c.BACKEND_SHEETS, self.sheet.col_values, 1)
+        self.last_row = len(values)
+
+        last_sr_no = 0
+        if len(values) > 1:
+            try:
+                last_sr_no = int(values[-1])
+            except (TypeError, ValueError):
+                last_sr_no = 0
+
+        self.offset = self.last_row - last_sr_no
+        logging.info(f"✅ Row allocator synced: last row {self.last_row}, offset {self.offset}")
+        return values
+
+    def resync_tail(self, from_row):
+        """
+        Like resync(), but reads column A only from `from_row` on, for when
+        every row before it is known to be written.
+        """
+        values = [
+            row[0] if row else ""
+            for row in resilience.call(c.BACKEND_SHEETS, self.sheet.get, f"A{from_row}:A")
+        ]
+        if not values:
+            self.last_row = max(self.last_row, from_row - 1)
+            return values
+
+        self.last_row = from_row - 1 + len(values)
+        try:
+            self.offset = self.last_row - int(values[-1])
+        except (TypeError, ValueError):
+            pass
+        logging.info(f"✅ Row allocator synced from row {from_row}: last row {self.last_row}, offset {self.offset}")
+        return values
+
+    # -------------------------------------------------------
+    # Allocation
+    # -------------------------------------------------------
+    def next_sr_no(self):
+        return self.last_row + 1 - self.offset
+
+    def reserve(self, rows):
+        """Write predicted serial numbers into column A of `rows`."""
+        first_row = self.last_row + 1
+        for index, row in enumerate(rows):
+            row[0] = first_row + index - self.offset
+        return first_row
+
+    def commit(self, rows, expected_first_row, append_result):
+        """
+        Record where `rows` were appended. On conflict, fix their serial numbers
+        in place. Returns (first_row, last_row) of the written range.
+        """
+        updated = self._parse_updated_range(append_result)
+        if updated is None:
+            logging.warning("⚠ append_rows returned no updated range, resyncing")
+            # The offset is shared by every writer; the tail serial may be one
+            # of our own predicted (possibly wrong) values, so keep the old one
+            offset = self.offset
+            values = self.resync()
+            self.offset = offset
+
+            last_row = self.last_row
+            first_row = last_row - len(rows) + 1
+            written = values[first_row - 1:last_row]
+            expected = [str(first_row + index - self.offset) for index in range(len(rows))]
+            if [str(value) for value in written] != expected:
+                logging.warning(
+                    f"⚠ Serial numbers in rows {first_row}-{last_row} do not match their rows, fixing"
+                )
+                self._fix_serials(rows, first_row, last_row)
+            return first_row, last_row
+
+        first_row, last_row = updated
+        self.last_row = max(self.last_row, last_row)
+
+        if first_row != expected_first_row:
+            logging.warning(
+                f"⚠ Rows landed at {first_row} instead of {expected_first_row}, "
+                "another writer appended first; fixing serial numbers"
+            )
+            self._fix_serials(rows, first_row, last_row)
+
+        return first_row, last_row
 
-        self.is_streamlit_cloud = False
+    def _fix_serials(self, rows, first_row, last_row):
+        """Rewrite column A of `first_row`..`last_row` with the serials derived from the row numbers."""
+        fixed = [[first_row + index - self.offset] for index in range(len(rows))]
+        for row, value in zip(rows, fixed):
+            row[0] = value[0]
+        resilience.call(
+            c.BACKEND_SHEETS, self.sheet.update,
+            range_name=f"A{first_row}:A{last_row}", values=fixed
+        )
+
+    def _parse_updated_range(self, append_result):
         try:
-            if hasattr(st, "secrets") and len(st.secrets) > 0:
-                self.is_streamlit_cloud = True
-        except:
-            self.is_streamlit_cloud = False
+            updated_range = append_result["updates"]["updatedRange"]
+        except (TypeError, KeyError):
+            return None
+
+        match = self.RANGE_PATTERN.search(updated_range)
+        if not match:
+            return None
+
+        first_row = int(match.group(1))
+        last_row = int(match.group(2) or first_row)
+        return first_row, last_row
+
+
+class SheetClass(LogSink):
+
+    name = "sheets"
+
+    def __init__(self):
+
+        self.is_streamlit_cloud = config.is_streamlit_cloud
 
         # Load sheet settings
         self.spreadsheet_id = config.fetch_sheet_value("SPREADSHEET_ID")
@@ -30,50 +168,92 @@ class SheetClass:
         ]
 
         self.sheet = None
-        self._authenticate_and_load_sheet()
+        self.allocator = None
+        self._write_lock = threading.Lock()
+
+        self.journal = None
+        if common.to_bool(config.fetch_sheet_value("JOURNAL_ENABLED"), c.JOURNAL_ENABLED):
+            self.journal = LogJournal(
+                config.fetch_sheet_value("JOURNAL_DB_PATH")
+                or os.path.join(config.secrets_dir, c.JOURNAL_DB_FILE),
+                synchronous=str(config.fetch_sheet_value("JOURNAL_SYNCHRONOUS", c.JOURNAL_SYNCHRONOUS)).upper(),
+                retention_days=common.to_int(
+                    config.fetch_sheet_value("JOURNAL_RETENTION_DAYS"), c.JOURNAL_RETENTION_DAYS
+                ),
+            )
+
+        try:
+            self._connect()
+        except Exception:
+            # With a journal, rows are kept locally until the sheet is reachable
+            if self.journal is None:
+                raise
+            logging.warning("⚠ Google Sheet unreachable, rows will be journaled and replayed later")
+
+        self.border_mode = str(config.fetch_sheet_value("BORDER_MODE", c.BORDER_MODE)).lower()
+        self.preformat_rows = common.to_int(
+            config.fetch_sheet_value("PREFORMAT_ROWS"), c.BORDER_PREFORMAT_ROWS
+        )
+        self._preformatted_until = 0
+        self.cell_char_limit = common.to_int(
+            config.fetch_sheet_value("CELL_CHAR_LIMIT"), c.SHEET_CELL_CHAR_LIMIT
+        )
+
+        self.writer = None
+        self.write_mode = str(config.fetch_sheet_value("WRITE_MODE", c.SHEET_WRITE_MODE)).lower()
+        batch_size = common.to_int(
+            config.fetch_sheet_value("WRITE_BATCH_SIZE"), c.SHEET_WRITE_BATCH_SIZE
+        )
+        flush_interval = common.to_float(
+            config.fetch_sheet_value("WRITE_FLUSH_INTERVAL"), c.SHEET_WRITE_FLUSH_INTERVAL
+        )
+        if self.journal is not None:
+            self.writer = JournalReplayer(
+                self.journal, self._write_rows, self._find_written_records,
+                batch_size=batch_size,
+                flush_interval=flush_interval,
+                replay_batch_size=common.to_int(
+                    config.fetch_sheet_value("JOURNAL_REPLAY_BATCH_SIZE"), c.JOURNAL_REPLAY_BATCH_SIZE
+                ),
+            )
+        elif self.write_mode == c.SHEET_WRITE_MODE_ASYNC:
+            self.writer = SheetWriter(
+                self._write_rows,
+                batch_size=batch_size,
+                flush_interval=flush_interval,
+                max_queue_size=common.to_int(
+                    config.fetch_sheet_value("WRITE_QUEUE_SIZE"), c.SHEET_WRITE_QUEUE_SIZE
+                ),
+                dead_letter_path=config.fetch_sheet_value("WRITE_DEAD_LETTER_PATH")
+                or os.path.join(config.secrets_dir, c.SHEET_DEAD_LETTER_FILE),
+            )
 
     # -------------------------------------------------------
     # Authenticate + Load Sheet
     # -------------------------------------------------------
-    def _authenticate_and_load_sheet(self):
-        try:
-            if self.is_streamlit_cloud:
-                logging.info("Using Streamlit Cloud credentials")
-
-                service_info = st.secrets.get("google_service_account")
-                if not service_info:
-                    raise ValueError("❌ Missing [google_service_account] in st.secrets")
-
-                credentials = Credentials.from_service_account_info(
-                    service_info, scopes=self.scopes
-                )
-
-            else:
-                logging.info("Using Local Google JSON credentials")
-
-                BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                SECRETS_DIR = os.path.join(BASE_DIR, "Secrets")
-
-                service_file = os.path.join(
-                    SECRETS_DIR,
-                    config.fetch_sheet_value("SERVICE_ACCOUNT_FILE")
-                )
-
-                if not os.path.exists(service_file):
-                    raise FileNotFoundError(f"❌ Missing Service Account JSON at: {service_file}")
+    def _connect(self):
+        self._authenticate_and_load_sheet()
+        self.allocator = RowAllocator(self.sheet)
 
-                credentials = Credentials.from_service_account_file(
-                    service_file, scopes=self.scopes
-                )
+    def _ensure_connected(self):
+        """Connects on first use when the sheet was unreachable at startup."""
+        if self.allocator is not None:
+            return
+        try:
+            self._connect()
+        except Exception as e:
+            raise ConnectionError(f"Google Sheet unreachable: {e}") from e
 
-            # Connect to sheet
-            client = gspread.authorize(credentials)
+    def _authenticate_and_load_sheet(self):
+        try:
+            # Connect to sheet through the process-wide authorized client
+            client = shared.get_gspread_client(self.scopes)
             self.sheet = client.open_by_key(self.spreadsheet_id).worksheet(self.sheet_name)
 
             logging.info(f"✅ Google Sheet Loaded: {self.sheet_name}")
 
         except Exception as e:
-            logging.exception("❌ Error loading Google Sheet: {e}")
+            logging.exception(f"❌ Error loading Google Sheet: {e}")
             raise
 
     # -------------------------------------------------------
@@ -90,6 +270,9 @@ class SheetClass:
     # Apply Border Formatting
     # -------------------------------------------------------
     def add_all_borders_to_row(self, row_number):
+        # only the legacy row mode needs gspread_formatting
+        from gspread_formatting import Border, Borders, CellFormat, format_cell_range
+
         try:
             row_values = self.sheet.row_values(row_number)
             last_col_index = len(row_values)
@@ -108,17 +291,109 @@ class SheetClass:
         except Exception as e:
             logging.error(f"❌ Border Error: {e}")
 
+    def _border_request(self, first_row, last_row, column_count):
+        b = {"style": c.SOLID_BORDER}
+        return {
+            "updateBorders": {
+                "range": {
+                    "sheetId": self.sheet.id,
+                    "startRowIndex": first_row - 1,
+                    "endRowIndex": last_row,
+                    "startColumnIndex": 0,
+                    "endColumnIndex": column_count,
+                },
+                "top": b, "bottom": b, "left": b, "right": b,
+                "innerHorizontal": b, "innerVertical": b,
+            }
+        }
+
+    def add_borders_to_rows(self, first_row, last_row, column_count):
+        """Border every cell of rows first_row..last_row with one batch_update."""
+        try:
+            resilience.call(c.BACKEND_SHEETS, self.sheet.spreadsheet.batch_update, {
+                "requests": [self._border_request(first_row, last_row, column_count)]
+            })
+        except Exception as e:
+            logging.error(f"❌ Border Error: {e}")
+
+    def _apply_borders(self, first_row, last_row, column_count):
+        """
+        Format freshly written rows according to BORDER_MODE:
+        - batch:        one batch_update for the whole written range
+        - preformatted: border PREFORMAT_ROWS rows ahead, one call per block
+        - row:          legacy per-row read + format (two calls per row)
+        - none:         skip formatting
+        """
+        if self.border_mode == c.BORDER_MODE_BATCH:
+            self.add_borders_to_rows(first_row, last_row, column_count)
+
+        elif self.border_mode == c.BORDER_MODE_PREFORMATTED:
+            if last_row > self._preformatted_until:
+                until = last_row + self.preformat_rows
+                self.add_borders_to_rows(1, until, column_count)
+                self._preformatted_until = until
+                logging.info(f"✅ Preformatted borders up to row {until}")
+
+        elif self.border_mode == c.BORDER_MODE_ROW:
+            for row_number in range(first_row, last_row + 1):
+                self.add_all_borders_to_row(row_number)
+
     # -------------------------------------------------------
     # Serial Number
     # -------------------------------------------------------
     def get_next_sr_no(self):
-        try:
-            values = self.sheet.col_values(1)
-            if len(values) <= 1:
-                return 1
-            return int(values[-1]) + 1
-        except:
-            return 1
+        self._ensure_connected()
+        return self.allocator.next_sr_no()
+
+    # -------------------------------------------------------
+    # Write Rows (single API call per batch)
+    # -------------------------------------------------------
+    def _write_rows(self, rows):
+        """
+        Assign serial numbers and append `rows` with one `append_rows` call.
+        Used directly in sync mode and as the flush function of the writer.
+        Returns (first_row, last_row) of the written range.
+        """
+        with self._write_lock:
+            self._ensure_connected()
+            with metrics.span("sheet_append"):
+                expected_first_row = self.allocator.reserve(rows)
+                # the journal replayer retries after checking which rows landed
+                call = resilience.call if self.journal is None else resilience.call_once
+                result = call(c.BACKEND_SHEETS, self.sheet.append_rows, rows)
+                first_row, last_row = self.allocator.commit(rows, expected_first_row, result)
+
+            with metrics.span("sheet_borders"):
+                column_count = max(len(row) for row in rows)
+                self._apply_borders(first_row, last_row, column_count)
+
+            metrics.inc(c.METRIC_SHEET_ROWS, len(rows))
+            return first_row, last_row
+
+    def _find_written_records(self, record_ids, after_row=None):
+        """
+        Record ids from `record_ids` that are already in the sheet. Called by
+        the journal replayer after a failed or interrupted write. With
+        `after_row` (the last row known to be written) only the rows below
+        it are read, so the cost does not grow with the sheet.
+        """
+        with self._write_lock:
+            self._ensure_connected()
+            if after_row:
+                column = self._convert_to_column_letter(c.SHEET_RECORD_ID_COLUMN)
+                values = [
+                    row[0] for row in resilience.call(
+                        c.BACKEND_SHEETS, self.sheet.get, f"{column}{after_row + 1}:{column}"
+                    ) if row
+                ]
+                # rows may have landed even though the write reported an error
+                self.allocator.resync_tail(after_row + 1)
+            else:
+                values = resilience.call(
+                    c.BACKEND_SHEETS, self.sheet.col_values, c.SHEET_RECORD_ID_COLUMN
+                )
+                self.allocator.resync()
+        return set(record_ids) & set(values)
 
     # -------------------------------------------------------
     # Save Entry
@@ -126,10 +401,10 @@ class SheetClass:
     def save_question_response(
         self, question, is_think, model_used,
         response=c.NA, bot_text=c.NA,
-        formatted_response=None, formatted_usage=None):
+        formatted_response=None, formatted_usage=None,
+        cached=False):
 
         try:
-            sr_no = self.get_next_sr_no()
             datestamp = datetime.now().strftime(c.DATE_FORMAT)
 
             if isinstance(response, str) or isinstance(response, Exception):
@@ -137,23 +412,78 @@ class SheetClass:
                 bot_text_safe = str(response)
                 formatted_safe = c.NO_RESPONSE
             else:
-                status = c.RECEIVED
-                bot_text_safe = bot_text or response
-                formatted_safe = formatted_response or response
-
+                status = c.CACHED if cached else c.RECEIVED
+                dumped = None
+                if not bot_text or not formatted_response:
+                    dumped = common.sdk_dump_to_json(
+                        response, fields=c.SDK_RESPONSE_FIELDS,
+                        max_chars=self.cell_char_limit, indent=None
+                    )
+                bot_text_safe = bot_text or dumped
+                formatted_safe = formatted_response or dumped
+
+            # Serial number is assigned when the row is written
             row_data = [
-                sr_no, question, is_think,
-                model_used, bot_text_safe,
+                None, self._fit_cell(question), is_think,
+                model_used, self._fit_cell(bot_text_safe),
                 status, datestamp,
-                formatted_safe, formatted_usage
+                self._fit_cell(formatted_safe), self._fit_cell(formatted_usage),
+                uuid.uuid4().hex
             ]
+            self._save_row(row_data)
 
-            self.sheet.append_row(row_data)
-
-            new_row = len(self.sheet.get_all_values())
-            self.add_all_borders_to_row(new_row)
+        except Exception as e:
+            logging.error(f"❌ Failed to save row: {e}")
 
+    def save_record(self, record):
+        """Saves a typed record from `build_log_record` as one sheet row."""
+        failed = record["status"] == c.FAILED
+        row_data = [
+            None, self._fit_cell(record["question"]), record["is_think"],
+            record["model"], self._fit_cell(record["answer"]),
+            record["status"], datetime.fromtimestamp(record["created_at"]).strftime(c.DATE_FORMAT),
+            c.NO_RESPONSE if failed else self._fit_cell(record["formatted_response"] or c.NA),
+            self._fit_cell(record["formatted_usage"]),
+            record["record_id"]
+        ]
+        self._save_row(row_data)
+
+    def _save_row(self, row_data):
+        """Journals, queues or writes one row according to the write mode."""
+        if self.journal is not None and self.write_mode == c.SHEET_WRITE_MODE_SYNC:
+            with metrics.span("sheet_enqueue"):
+                self.writer.enqueue(row_data)
+            self.writer.send_now()
+            logging.info("✅ Row journaled and sent")
+        elif self.writer:
+            with metrics.span("sheet_enqueue"):
+                self.writer.enqueue(row_data)
+            metrics.set_gauge(c.METRIC_SHEET_QUEUE_DEPTH, self.writer.queue_depth())
+            logging.info("✅ Row queued")
+        else:
+            self._write_rows([row_data])
             logging.info("✅ Row saved")
 
-        except Exception as e:
-            logging.error(f"❌ Failed to save row: {e}")
+    def _fit_cell(self, value):
+        """Keeps text within the Sheets per-cell character limit."""
+        if isinstance(value, str) and len(value) > self.cell_char_limit:
+            return common.truncate_text(value, self.cell_char_limit)
+        return value
+
+    # -------------------------------------------------------
+    # Writer Controls
+    # -------------------------------------------------------
+    def queue_depth(self):
+        """Rows waiting in the background writer or journal (0 in sync mode without journal)."""
+        return self.writer.queue_depth() if self.writer else 0
+
+    def flush(self, timeout=None):
+        """Write every queued row now."""
+        return self.writer.flush(timeout) if self.writer else True
+
+    def close(self):
+        """Flush pending rows and stop the background writer."""
+        if self.writer:
+            self.writer.close()
+        if self.journal is not None:
+            self.journal.close()
@@ -0,0 +1,213 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+from Common.Logger_Config import logging
+from Common.Metrics import metrics
+from Common.Resilience import CircuitOpenError, is_retryable
+from Common import Constant as c
+
+
+class _FlushRequest:
+    """Marker placed on the queue to force the worker to flush its batch."""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class SheetWriter:
+    """
+    Background writer for Google Sheet rows.
+
+    Rows are put on a bounded queue and a worker thread flushes them in bulk
+    through `flush_fn(rows)` when the batch is full or the flush interval has
+    passed since the first queued row. The caller never waits on the Sheets API.
+    Rows of a batch that failed with a transient error stay in memory and are
+    retried after `retry_delay` seconds; rows rejected for good are appended
+    to the `dead_letter_path` JSONL file instead of being lost.
+    """
+
+    def __init__(
+        self, flush_fn,
+        batch_size=c.SHEET_WRITE_BATCH_SIZE,
+        flush_interval=c.SHEET_WRITE_FLUSH_INTERVAL,
+        max_queue_size=c.SHEET_WRITE_QUEUE_SIZE,
+        enqueue_timeout=c.SHEET_WRITE_ENQUEUE_TIMEOUT,
+        retry_delay=c.SHEET_WRITE_RETRY_DELAY,
+        dead_letter_path=None):
+
+        self.flush_fn = flush_fn
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval))
+        self.enqueue_timeout = enqueue_timeout
+        self.retry_delay = retry_delay
+        self.max_pending = max(self.batch_size, int(max_queue_size))
+        self.dead_letter_path = dead_letter_path
+        self.dead_lettered = 0
+        self.dead_letter_rows = []  # used when there is no dead-letter file
+
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue_size)))
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._thread = threading.Thread(
+            target=self._run, name="SheetWriter", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    # -------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------
+    def enqueue(self, row):
+        """
+        Queue one row for the next batch. When the queue stays full for longer
+        than `enqueue_timeout`, the row is written synchronously instead of
+        being dropped.
+        """
+        if self._closed:
+            self.flush_fn([row])
+            return
+
+        try:
+            self._queue.put(row, timeout=self.enqueue_timeout)
+        except queue.Full:
+            logging.warning("⚠ Sheet write queue is full, writing row synchronously")
+            self.flush_fn([row])
+
+    def queue_depth(self):
+        """Number of rows waiting to be written (queued + current batch)."""
+        with self._lock:
+            return self._queue.qsize() + self._in_flight
+
+    def flush(self, timeout=None):
+        """Block until every row queued so far has been written."""
+        if self._closed or not self._thread.is_alive():
+            return True
+
+        request = _FlushRequest()
+        try:
+            self._queue.put(request, timeout=timeout)
+        except queue.Full:
+            return False
+        return request.done.wait(timeout)
+
+    def close(self, timeout=c.SHEET_WRITE_CLOSE_TIMEOUT):
+        """Flush pending rows and stop the worker thread."""
+        if self._closed:
+            return
+
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logging.error("❌ Sheet writer could not be stopped cleanly, queue is full")
+            return
+
+        self._thread.join(timeout)
+        self._closed = True
+
+        if self._thread.is_alive():
+            logging.error(f"❌ Sheet writer still running after {timeout}s, rows may be lost")
+
+    # -------------------------------------------------------
+    # Worker
+    # -------------------------------------------------------
+    def _run(self):
+        batch = []
+        deadline = None
+        retrying = False
+
+        while True:
+            if batch:
+                wait = max(0.0, deadline - time.monotonic())
+            else:
+                wait = None
+
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._write(batch)
+                return
+
+            if isinstance(item, _FlushRequest):
+                if self._write(batch):
+                    batch = []
+                    retrying = False
+                item.done.set()
+                continue
+
+            if item is not None:
+                with self._lock:
+                    batch.append(item)
+                    self._trim(batch)
+                    self._in_flight = len(batch)
+                if len(batch) == 1:
+                    deadline = time.monotonic() + self.flush_interval
+
+            full = len(batch) >= self.batch_size and not retrying
+            if batch and (full or time.monotonic() >= deadline):
+                if self._write(batch):
+                    batch = []
+                    retrying = False
+                else:
+                    # Keep the rows and try again later instead of losing them
+                    retrying = True
+                    deadline = time.monotonic() + self.retry_delay
+
+    def _trim(self, batch):
+        overflow = len(batch) - self.max_pending
+        if overflow > 0:
+            del batch[:overflow]
+            logging.error(f"❌ Sheet writer backlog full, dropped {overflow} oldest row(s)")
+
+    def _write(self, batch):
+        """
+        Writes `batch`. Returns False when it failed with a transient error
+        (throttling, outage, open circuit) and should be retried.
+        """
+        if not batch:
+            return True
+
+        try:
+            self.flush_fn(list(batch))
+            logging.info(f"✅ Flushed {len(batch)} row(s) to Google Sheet")
+        except Exception as e:
+            if is_retryable(e) or isinstance(e, CircuitOpenError):
+                logging.warning(f"⚠ Failed to flush {len(batch)} row(s), will retry: {e}")
+                return False
+            logging.error(f"❌ Failed to flush {len(batch)} row(s): {e}")
+            self._dead_letter(batch, e)
+
+        with self._lock:
+            self._in_flight = 0
+        return True
+
+    def _dead_letter(self, batch, error):
+        """Parks rows the sheet rejected for good so they can be inspected and re-sent."""
+        self.dead_lettered += len(batch)
+        metrics.inc(c.METRIC_SHEET_DEAD_LETTERED, len(batch))
+        if not self.dead_letter_path:
+            self.dead_letter_rows.extend(batch)
+            del self.dead_letter_rows[:-self.max_pending]
+            logging.warning(f"⚠ Kept {len(batch)} rejected row(s) in memory (no dead-letter file)")
+            return
+
+        try:
+            folder = os.path.dirname(os.path.abspath(self.dead_letter_path))
+            os.makedirs(folder, exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for row in batch:
+                    f.write(json.dumps({"error": str(error), "row": row}, ensure_ascii=False, default=str) + "\n")
+            logging.warning(f"⚠ Parked {len(batch)} row(s) in {self.dead_letter_path}")
+        except Exception as e:
+            logging.error(f"❌ Could not write {len(batch)} row(s) to the dead-letter file: {e}")
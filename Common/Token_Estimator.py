@@ -0,0 +1,65 @@
+import math
+import re
+import threading
+
+from Common import Constant as c
+
+
+class TokenEstimator:
+    """
+    Fast local token estimate for prompt text.
+
+    The raw estimate counts word pieces (long words count once per
+    `chars_per_token` characters, punctuation counts as its own token).
+    `calibrate()` keeps a moving correction factor from the
+    `prompt_token_count` values the API reports, so the estimate follows
+    the real tokenizer without calling it.
+    """
+
+    TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+    def __init__(self, chars_per_token=c.TOKEN_CHARS_PER_TOKEN, smoothing=c.TOKEN_CALIBRATION_SMOOTHING):
+        self.chars_per_token = chars_per_token
+        self.smoothing = smoothing
+        self.ratio = 1.0
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------
+    # Estimate
+    # -------------------------------------------------------
+    def raw_estimate(self, text):
+        if not text:
+            return 0
+        tokens = 0
+        for piece in self.TOKEN_PATTERN.findall(text):
+            tokens += max(1, math.ceil(len(piece) / self.chars_per_token))
+        return tokens
+
+    def estimate(self, text):
+        """Calibrated token estimate for `text`."""
+        return int(math.ceil(self.raw_estimate(text) * self.ratio))
+
+    # -------------------------------------------------------
+    # Calibration
+    # -------------------------------------------------------
+    def calibrate(self, raw_tokens, actual_tokens):
+        """
+        Update the correction factor with one observation: `raw_tokens` is the
+        raw_estimate() of the prompt that was sent, `actual_tokens` the
+        prompt_token_count the API reported for it.
+        """
+        if not raw_tokens or not actual_tokens:
+            return
+
+        observed = min(max(actual_tokens / raw_tokens, c.TOKEN_RATIO_MIN), c.TOKEN_RATIO_MAX)
+        with self._lock:
+            if self.samples == 0:
+                self.ratio = observed
+            else:
+                self.ratio += self.smoothing * (observed - self.ratio)
+            self.samples += 1
+
+
+# PROCESS-WIDE ESTIMATOR (calibration is shared by all sessions)
+token_estimator = TokenEstimator()
@@ -0,0 +1,429 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+
+from Common.Common_Functions import CommonFunctions as common
+from Common.Config_Loader import config
+from Common.Logger_Config import logging
+from Common import Constant as c
+
+
+COUNT_KEYS = ("prompt", "output", "thinking", "total", "turns")
+
+
+def _empty_counts():
+    return dict.fromkeys(COUNT_KEYS, 0)
+
+
+def _add_counts(target, counts):
+    for key in COUNT_KEYS:
+        target[key] += counts.get(key) or 0
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised when a turn cannot start because a token budget stays exhausted."""
+
+    def __init__(self, scope, used, budget):
+        super().__init__(f"{scope} token budget exhausted ({used}/{budget})")
+        self.scope = scope
+        self.used = used
+        self.budget = budget
+
+
+class BudgetPlan:
+    """How the next turn is degraded to stay within the token budgets."""
+
+    def __init__(self, level=c.BUDGET_LEVEL_NORMAL, used_fraction=0.0, scope=None):
+        self.level = level
+        self.used_fraction = used_fraction
+        self.scope = scope
+
+    @property
+    def smaller_context(self):
+        return self.level in (c.BUDGET_LEVEL_CONTEXT, c.BUDGET_LEVEL_NO_THINKING, c.BUDGET_LEVEL_CHEAP_MODEL)
+
+    @property
+    def no_thinking(self):
+        return self.level in (c.BUDGET_LEVEL_NO_THINKING, c.BUDGET_LEVEL_CHEAP_MODEL)
+
+    @property
+    def cheaper_model(self):
+        return self.level == c.BUDGET_LEVEL_CHEAP_MODEL
+
+    def to_dict(self):
+        return {"level": self.level, "used_fraction": round(self.used_fraction, 3), "scope": self.scope}
+
+
+class TokenLedger:
+    """
+    Prompt, output, thinking and total tokens per session, per model and
+    per time bucket.
+
+    Counts live in memory (`bucket_seconds` buckets over the last
+    `window_seconds`) and are added to a SQLite table every
+    `flush_interval` seconds, so restarts keep the current window and the
+    long-term history stays queryable. `plan` turns the window usage into a
+    degradation level against the global and per-session budgets
+    (0 = unlimited): smaller context, then no thinking, then a cheaper
+    model; at the budget `wait_for_budget` queues the turn until the window
+    has room again.
+    """
+
+    def __init__(
+        self, db_path=None,
+        window_seconds=c.TOKEN_BUDGET_WINDOW_SECONDS,
+        global_budget=c.TOKEN_BUDGET_GLOBAL,
+        session_budget=c.TOKEN_BUDGET_SESSION,
+        bucket_seconds=c.TOKEN_LEDGER_BUCKET_SECONDS,
+        flush_interval=c.TOKEN_LEDGER_FLUSH_INTERVAL,
+        degrade_at=(c.TOKEN_DEGRADE_CONTEXT_AT, c.TOKEN_DEGRADE_THINKING_AT, c.TOKEN_DEGRADE_MODEL_AT),
+        retention_days=c.TOKEN_LEDGER_RETENTION_DAYS):
+
+        self.db_path = db_path
+        self.window_seconds = max(1, int(window_seconds))
+        self.global_budget = int(global_budget or 0)
+        self.session_budget = int(session_budget or 0)
+        self.bucket_seconds = max(1, int(bucket_seconds))
+        self.flush_interval = flush_interval
+        self.degrade_at = tuple(degrade_at)
+
+        self._global = {}    # bucket -> counts
+        self._sessions = {}  # session_id -> {bucket -> counts}
+        self._models = {}    # model -> counts since start
+        self._pending = {}   # (bucket, session_id, model) -> counts not yet persisted
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._expired_cutoff = None
+        self._closed = False
+
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS token_usage ("
+                "bucket INTEGER NOT NULL, "
+                "session_id TEXT NOT NULL, "
+                "model TEXT NOT NULL, "
+                "prompt INTEGER NOT NULL DEFAULT 0, "
+                "output INTEGER NOT NULL DEFAULT 0, "
+                "thinking INTEGER NOT NULL DEFAULT 0, "
+                "total INTEGER NOT NULL DEFAULT 0, "
+                "turns INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (bucket, session_id, model))"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_token_usage_session ON token_usage(session_id, bucket)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_token_usage_model ON token_usage(model, bucket)")
+            self._db.commit()
+            if retention_days:
+                self.prune(retention_days)
+            self._load_window()
+            logging.info(f"✅ Token ledger opened: {db_path}")
+
+            if flush_interval and flush_interval > 0:
+                threading.Thread(target=self._run_flusher, name="TokenLedgerFlusher", daemon=True).start()
+            atexit.register(self.close)
+
+    # -------------------------------------------------------
+    # Record
+    # -------------------------------------------------------
+    def record(self, session_id, model, counts, now=None):
+        """Adds one turn's token counts ({"prompt", "output", "thinking", "total"})."""
+        counts = {key: counts.get(key) or 0 for key in COUNT_KEYS}
+        counts["turns"] = 1
+        bucket = self._bucket(now)
+        session_id = session_id or c.NA
+        model = model or c.NA
+
+        with self._lock:
+            _add_counts(self._global.setdefault(bucket, _empty_counts()), counts)
+            _add_counts(self._sessions.setdefault(session_id, {}).setdefault(bucket, _empty_counts()), counts)
+            _add_counts(self._models.setdefault(model, _empty_counts()), counts)
+            _add_counts(self._pending.setdefault((bucket, session_id, model), _empty_counts()), counts)
+            self._expire(now)
+
+    def _bucket(self, now=None):
+        now = time.time() if now is None else now
+        return int(now // self.bucket_seconds) * self.bucket_seconds
+
+    def _expire(self, now=None):
+        """Drops buckets that left the window (caller holds the lock)."""
+        cutoff = self._bucket(now) - self.window_seconds
+        # the window only moves once per bucket
+        if cutoff == self._expired_cutoff:
+            return
+        self._expired_cutoff = cutoff
+        for bucket in [b for b in self._global if b <= cutoff]:
+            del self._global[bucket]
+        for session_id in list(self._sessions):
+            buckets = self._sessions[session_id]
+            for bucket in [b for b in buckets if b <= cutoff]:
+                del buckets[bucket]
+            if not buckets:
+                del self._sessions[session_id]
+
+    # -------------------------------------------------------
+    # Window Usage + Budgets
+    # -------------------------------------------------------
+    def window_usage(self, session_id=None, now=None):
+        """Token counts in the current window, globally or for one session."""
+        with self._lock:
+            self._expire(now)
+            buckets = self._global if session_id is None else self._sessions.get(session_id, {})
+            total = _empty_counts()
+            for counts in buckets.values():
+                _add_counts(total, counts)
+            return total
+
+    def used_fraction(self, session_id=None, now=None):
+        """(fraction, scope) of the tighter of the global and session budgets."""
+        fractions = [(0.0, None)]
+        if self.global_budget:
+            fractions.append((self.window_usage(now=now)["total"] / self.global_budget, c.BUDGET_SCOPE_GLOBAL))
+        if self.session_budget and session_id:
+            fractions.append((
+                self.window_usage(session_id, now)["total"] / self.session_budget, c.BUDGET_SCOPE_SESSION
+            ))
+        return max(fractions, key=lambda item: item[0])
+
+    def plan(self, session_id=None, now=None):
+        fraction, scope = self.used_fraction(session_id, now)
+        context_at, thinking_at, model_at = self.degrade_at
+        if fraction >= 1.0:
+            level = c.BUDGET_LEVEL_EXHAUSTED
+        elif fraction >= model_at:
+            level = c.BUDGET_LEVEL_CHEAP_MODEL
+        elif fraction >= thinking_at:
+            level = c.BUDGET_LEVEL_NO_THINKING
+        elif fraction >= context_at:
+            level = c.BUDGET_LEVEL_CONTEXT
+        else:
+            level = c.BUDGET_LEVEL_NORMAL
+        return BudgetPlan(level, fraction, scope)
+
+    def wait_for_budget(self, session_id=None, timeout=c.TOKEN_QUEUE_TIMEOUT):
+        """
+        Queues the caller until the window is back under budget, then returns
+        the new plan. Raises TokenBudgetExceeded after `timeout` seconds.
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            plan = self.plan(session_id)
+            if plan.level != c.BUDGET_LEVEL_EXHAUSTED:
+                return plan
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                budget = self.global_budget if plan.scope == c.BUDGET_SCOPE_GLOBAL else self.session_budget
+                used = self.window_usage(None if plan.scope == c.BUDGET_SCOPE_GLOBAL else session_id)["total"]
+                raise TokenBudgetExceeded(plan.scope, used, budget)
+            # room appears when the oldest bucket leaves the window
+            time.sleep(min(remaining, self._seconds_until_expiry(session_id)))
+
+    def _seconds_until_expiry(self, session_id=None):
+        with self._lock:
+            buckets = list(self._global) + list(self._sessions.get(session_id, {}))
+        if not buckets:
+            return 0.0
+        return max(0.05, min(buckets) + self.window_seconds - time.time())
+
+    # -------------------------------------------------------
+    # Summaries
+    # -------------------------------------------------------
+    def summary(self, session_id=None):
+        """Window usage against the budgets, plus per-model totals since start."""
+        plan = self.plan(session_id)
+        result = {
+            "window_seconds": self.window_seconds,
+            "level": plan.level,
+            "global": {"used": self.window_usage(), "budget": self.global_budget or None},
+        }
+        if session_id:
+            result["session"] = {
+                "session_id": session_id,
+                "used": self.window_usage(session_id),
+                "budget": self.session_budget or None,
+                "lifetime": self.totals(session_id=session_id),
+            }
+        with self._lock:
+            result["models"] = {model: dict(counts) for model, counts in self._models.items()}
+        return result
+
+    def totals(self, session_id=None, model=None, since=None):
+        """Persisted plus pending counts, optionally for one session/model and since an epoch time."""
+        total = _empty_counts()
+        with self._lock:
+            for (bucket, pending_session, pending_model), counts in self._pending.items():
+                if session_id and pending_session != session_id:
+                    continue
+                if model and pending_model != model:
+                    continue
+                if since and bucket < since:
+                    continue
+                _add_counts(total, counts)
+        if self._db is None:
+            return total
+
+        clauses, params = ["bucket >= ?"], [since or 0]
+        if session_id:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if model:
+            clauses.append("model = ?")
+            params.append(model)
+        with self._db_lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(f'COALESCE(SUM({key}), 0)' for key in COUNT_KEYS)} "
+                f"FROM token_usage WHERE {' AND '.join(clauses)}",
+                params,
+            ).fetchone()
+        for key, value in zip(COUNT_KEYS, row):
+            total[key] += value
+        return total
+
+    def report(self, window=None, limit=10):
+        """Persisted usage per model and top sessions (`window` = seconds back), for `--usage-report`."""
+        self.flush()
+        since = time.time() - window if window else 0
+        report = {"since": since or None, "total": self.totals(since=since), "models": {}, "top_sessions": []}
+        if self._db is None:
+            return report
+
+        sums = ", ".join(f"SUM({key})" for key in COUNT_KEYS)
+        with self._db_lock:
+            model_rows = self._db.execute(
+                f"SELECT model, {sums} FROM token_usage WHERE bucket >= ? GROUP BY model ORDER BY SUM(total) DESC",
+                (since,),
+            ).fetchall()
+            session_rows = self._db.execute(
+                f"SELECT session_id, {sums} FROM token_usage WHERE bucket >= ? "
+                f"GROUP BY session_id ORDER BY SUM(total) DESC LIMIT ?",
+                (since, limit),
+            ).fetchall()
+        report["models"] = {row[0]: dict(zip(COUNT_KEYS, row[1:])) for row in model_rows}
+        report["top_sessions"] = [
+            {"session_id": row[0], **dict(zip(COUNT_KEYS, row[1:]))} for row in session_rows
+        ]
+        return report
+
+    # -------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------
+    def flush(self):
+        """Adds the pending counts to the SQLite table."""
+        if self._db is None:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT INTO token_usage (bucket, session_id, model, prompt, output, thinking, total, turns) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(bucket, session_id, model) DO UPDATE SET "
+                    "prompt = prompt + excluded.prompt, output = output + excluded.output, "
+                    "thinking = thinking + excluded.thinking, total = total + excluded.total, "
+                    "turns = turns + excluded.turns",
+                    [
+                        (bucket, session_id, model, *(counts[key] for key in COUNT_KEYS))
+                        for (bucket, session_id, model), counts in pending.items()
+                    ],
+                )
+                self._db.commit()
+        except Exception as e:
+            logging.error(f"❌ Failed to persist token ledger: {e}")
+            # keep the counts for the next flush
+            with self._lock:
+                for key, counts in pending.items():
+                    _add_counts(self._pending.setdefault(key, _empty_counts()), counts)
+
+    def prune(self, retention_days):
+        cutoff = time.time() - retention_days * 86400
+        with self._db_lock:
+            cursor = self._db.execute("DELETE FROM token_usage WHERE bucket < ?", (cutoff,))
+            self._db.commit()
+            return cursor.rowcount
+
+    def _load_window(self):
+        """Restores the current window from disk after a restart."""
+        cutoff = self._bucket() - self.window_seconds
+        with self._db_lock:
+            rows = self._db.execute(
+                f"SELECT bucket, session_id, {', '.join(COUNT_KEYS)} FROM token_usage WHERE bucket > ?",
+                (cutoff,),
+            ).fetchall()
+        with self._lock:
+            for bucket, session_id, *values in rows:
+                counts = dict(zip(COUNT_KEYS, values))
+                _add_counts(self._global.setdefault(bucket, _empty_counts()), counts)
+                _add_counts(self._sessions.setdefault(session_id, {}).setdefault(bucket, _empty_counts()), counts)
+
+    def _run_flusher(self):
+        while not self._closed:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+
+
+# PROCESS-WIDE LEDGER
+_ledger = None
+_ledger_loaded = False
+_ledger_lock = threading.Lock()
+
+
+def get_token_ledger():
+    """Returns the TokenLedger shared by all sessions, or None when disabled."""
+    global _ledger, _ledger_loaded
+    with _ledger_lock:
+        if not _ledger_loaded:
+            _ledger_loaded = True
+            if common.to_bool(config.fetch_optional_value("TOKEN_LEDGER_ENABLED"), c.TOKEN_LEDGER_ENABLED):
+                try:
+                    _ledger = TokenLedger(
+                        config.fetch_optional_value("TOKEN_LEDGER_DB_PATH")
+                        or os.path.join(config.secrets_dir, c.TOKEN_LEDGER_DB_FILE),
+                        window_seconds=common.to_int(
+                            config.fetch_optional_value("TOKEN_BUDGET_WINDOW_SECONDS"), c.TOKEN_BUDGET_WINDOW_SECONDS
+                        ),
+                        global_budget=common.to_int(
+                            config.fetch_optional_value("TOKEN_BUDGET_GLOBAL"), c.TOKEN_BUDGET_GLOBAL
+                        ),
+                        session_budget=common.to_int(
+                            config.fetch_optional_value("TOKEN_BUDGET_SESSION"), c.TOKEN_BUDGET_SESSION
+                        ),
+                        flush_interval=common.to_float(
+                            config.fetch_optional_value("TOKEN_LEDGER_FLUSH_INTERVAL"), c.TOKEN_LEDGER_FLUSH_INTERVAL
+                        ),
+                        degrade_at=(
+                            common.to_float(
+                                config.fetch_optional_value("TOKEN_DEGRADE_CONTEXT_AT"), c.TOKEN_DEGRADE_CONTEXT_AT
+                            ),
+                            common.to_float(
+                                config.fetch_optional_value("TOKEN_DEGRADE_THINKING_AT"), c.TOKEN_DEGRADE_THINKING_AT
+                            ),
+                            common.to_float(
+                                config.fetch_optional_value("TOKEN_DEGRADE_MODEL_AT"), c.TOKEN_DEGRADE_MODEL_AT
+                            ),
+                        ),
+                        retention_days=common.to_int(
+                            config.fetch_optional_value("TOKEN_LEDGER_RETENTION_DAYS"), c.TOKEN_LEDGER_RETENTION_DAYS
+                        ),
+                    )
+                except Exception as e:
+                    logging.error(f"❌ Token ledger unavailable, budgets are not enforced: {e}")
+        return _ledger
@@ -0,0 +1,232 @@
+import asyncio
+import csv
+import json
+import os
+import time
+from collections import deque
+
+from Common.Logger_Config import logging
+from Common.Token_Estimator import token_estimator
+from Common import Constant as c
+
+
+class RateLimiter:
+    """
+    Sliding one-minute window limiting requests per minute and tokens per
+    minute. Token reservations use an estimate and are corrected with the
+    real usage once a call finishes.
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = deque()
+        self._tokens = deque()
+        self._lock = asyncio.Lock()
+
+    def _trim(self, now):
+        while self._requests and now - self._requests[0] >= 60:
+            self._requests.popleft()
+        while self._tokens and now - self._tokens[0][0] >= 60:
+            self._tokens.popleft()
+
+    def _wait_time(self, tokens, now):
+        wait = 0.0
+        if self.requests_per_minute and len(self._requests) >= self.requests_per_minute:
+            wait = max(wait, 60 - (now - self._requests[0]))
+
+        if self.tokens_per_minute:
+            used = sum(count for _, count in self._tokens)
+            excess = used + tokens - self.tokens_per_minute
+            if excess > 0 and self._tokens:
+                # wait until enough old reservations leave the window
+                freed = 0
+                for stamp, count in self._tokens:
+                    freed += count
+                    if freed >= excess:
+                        wait = max(wait, 60 - (now - stamp))
+                        break
+        return wait
+
+    async def acquire(self, tokens):
+        """Waits for a free slot and returns the reservation to correct later."""
+        tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else tokens
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._trim(now)
+                wait = self._wait_time(tokens, now)
+                if wait <= 0:
+                    self._requests.append(now)
+                    reservation = [now, tokens]
+                    self._tokens.append(reservation)
+                    return reservation
+                await asyncio.sleep(wait)
+
+    def settle(self, reservation, actual_tokens):
+        """
+        Replaces the estimated token count with the real one. A call that
+        reported no usage (e.g. it failed) frees its reservation.
+        """
+        reservation[1] = actual_tokens or 0
+
+
+class BatchRunner:
+    """
+    Runs many independent questions concurrently through the async chatbot.
+
+    Questions come from a JSONL file (one object with "question" and optional
+    "id"/"thinking_mode" per line) or a CSV file with a "question" column.
+    Each result is appended to the output JSONL as soon as it finishes and its
+    id is recorded in a checkpoint file, so an interrupted run resumes where
+    it stopped; failed questions are retried on resume and their earlier
+    result line is replaced. Each worker reuses one chatbot and clears its
+    history between questions. Sheet rows go through the shared batched
+    writer.
+    """
+
+    def __init__(
+        self, chatbot_factory, concurrency=c.BATCH_CONCURRENCY,
+        requests_per_minute=c.BATCH_REQUESTS_PER_MINUTE,
+        tokens_per_minute=c.BATCH_TOKENS_PER_MINUTE,
+        use_cache=True):
+
+        self.chatbot_factory = chatbot_factory
+        self.concurrency = max(1, int(concurrency))
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.use_cache = use_cache
+
+    # -------------------------------------------------------
+    # Input / Checkpoint
+    # -------------------------------------------------------
+    @staticmethod
+    def load_questions(input_path):
+        """Returns a list of {"id", "question", "thinking_mode"} dicts."""
+        items = []
+        if input_path.lower().endswith(".csv"):
+            with open(input_path, newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+        else:
+            with open(input_path, encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+
+        for index, row in enumerate(rows, start=1):
+            question = (row.get("question") or "").strip()
+            if not question:
+                continue
+            items.append({
+                "id": str(row.get("id") or index),
+                "question": question,
+                "thinking_mode": str(row.get("thinking_mode", "")).lower() in ("1", "true", "yes"),
+            })
+        return items
+
+    @staticmethod
+    def load_checkpoint(checkpoint_path):
+        if not os.path.exists(checkpoint_path):
+            return set()
+        with open(checkpoint_path, encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+
+    @staticmethod
+    def drop_unfinished_results(output_path, done):
+        """
+        Rewrites the output keeping one result line per checkpointed id, so
+        questions retried on resume replace their failed result.
+        """
+        if not os.path.exists(output_path):
+            return
+        kept, seen = [], set()
+        with open(output_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result_id = str(json.loads(line).get("id"))
+                except (ValueError, AttributeError):
+                    continue
+                if result_id in done and result_id not in seen:
+                    seen.add(result_id)
+                    kept.append(line if line.endswith("\n") else line + "\n")
+
+        temp_path = output_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.writelines(kept)
+        os.replace(temp_path, output_path)
+
+    # -------------------------------------------------------
+    # Run
+    # -------------------------------------------------------
+    async def run(self, input_path, output_path, checkpoint_path=None):
+        checkpoint_path = checkpoint_path or output_path + c.BATCH_CHECKPOINT_SUFFIX
+        done = self.load_checkpoint(checkpoint_path)
+        pending = [item for item in self.load_questions(input_path) if item["id"] not in done]
+        self.drop_unfinished_results(output_path, done)
+
+        logging.info(f"Batch: {len(pending)} question(s) to run, {len(done)} already done")
+
+        queue = asyncio.Queue()
+        for item in pending:
+            queue.put_nowait(item)
+
+        write_lock = asyncio.Lock()
+        summary = {"done": 0, "failed": 0, "skipped": len(done)}
+
+        with open(output_path, "a", encoding="utf-8") as output, \
+                open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+
+            async def worker():
+                chatbot = None
+                while True:
+                    try:
+                        item = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    if chatbot is None:
+                        chatbot = self.chatbot_factory()
+                    else:
+                        chatbot.clear_history()
+                    result = await self._run_one(chatbot, item)
+                    async with write_lock:
+                        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                        output.flush()
+                        # failed questions are not checkpointed so a resume retries them
+                        if not result.get("error"):
+                            checkpoint.write(item["id"] + "\n")
+                            checkpoint.flush()
+                    summary["failed" if result.get("error") else "done"] += 1
+
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+        logging.info(f"✅ Batch finished: {summary}")
+        return summary
+
+    async def _run_one(self, chatbot, item):
+        estimate = token_estimator.estimate(item["question"]) + c.BATCH_OUTPUT_TOKEN_ESTIMATE
+        reservations = []
+
+        async def reserve():
+            # cache hits never get here, so they take no limiter capacity
+            reservations.append(await self.limiter.acquire(estimate))
+
+        started = time.perf_counter()
+        chatbot.router.last_decision = None
+        result = {"id": item["id"], "question": item["question"]}
+        try:
+            result["answer"] = await chatbot.aget_gemini_text_response(
+                item["question"], item["thinking_mode"], use_cache=self.use_cache,
+                before_model_call=reserve,
+            )
+            result["cached"] = chatbot.last_cached
+            result["total_tokens"] = chatbot.last_total_tokens
+            if chatbot.last_error:
+                result["error"] = chatbot.last_error
+        except Exception as e:
+            logging.error(f"❌ Batch question {item['id']} failed: {e}")
+            result["error"] = str(e)
+        finally:
+            for reservation in reservations:
+                self.limiter.settle(reservation, chatbot.last_total_tokens)
+
+        decision = chatbot.router.last_decision
+        result["model"] = decision.model if decision else chatbot.model
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
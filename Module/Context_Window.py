@@ -0,0 +1,141 @@
+import re
+
+from Common.Logger_Config import logging
+from Common.Token_Estimator import token_estimator
+from Common import Constant as c
+
+
+class ContextWindow:
+    """
+    Token-budgeted view over a session history.
+
+    The newest turns are kept verbatim while they fit in
+    `token_budget - summary_budget`. Turns that fall out of that window are
+    folded into a rolling summary (at most `summary_budget` tokens) instead
+    of being dropped. Every turn is summarized exactly once, so the work per
+    call only depends on the turns that left the window since the last call.
+    """
+
+    def __init__(
+        self, token_budget=c.CONTEXT_TOKEN_BUDGET,
+        summary_budget=c.CONTEXT_SUMMARY_TOKEN_BUDGET,
+        estimator=None, summarizer=None):
+
+        self.token_budget = token_budget
+        self.summary_budget = min(summary_budget, token_budget)
+        self.estimator = estimator or token_estimator
+        self.summarizer = summarizer
+
+        self.summary = ""
+        self.summarized_count = 0
+
+    # -------------------------------------------------------
+    # Build Window
+    # -------------------------------------------------------
+    def build(self, history, token_budget=None):
+        """
+        Returns (summary, recent_turns) for `history`, where the last entry is
+        the current question. The current turn is always included.
+        `token_budget` overrides the window size for this call only.
+        """
+        if not history:
+            return self.summary, []
+
+        recent_budget = max(0, (token_budget or self.token_budget) - self.summary_budget)
+        first_kept = len(history) - 1
+        used = self.turn_tokens(history[-1])
+
+        while first_kept > self.summarized_count:
+            cost = self.turn_tokens(history[first_kept - 1])
+            if used + cost > recent_budget:
+                break
+            used += cost
+            first_kept -= 1
+
+        if first_kept > self.summarized_count:
+            self._fold(history[self.summarized_count:first_kept])
+            self.summarized_count = first_kept
+
+        return self.summary, history[first_kept:]
+
+    def turn_tokens(self, turn):
+        if not isinstance(turn, dict):
+            return 0
+        return (
+            self.estimator.estimate(turn.get("user") or "")
+            + self.estimator.estimate(turn.get("assistant") or "")
+        )
+
+    def reset(self):
+        self.summary = ""
+        self.summarized_count = 0
+
+    # -------------------------------------------------------
+    # Summary
+    # -------------------------------------------------------
+    def _fold(self, turns):
+        summary = None
+        if self.summarizer:
+            try:
+                summary = self.summarizer(self.summary, turns)
+            except Exception as e:
+                logging.warning(f"⚠ Summarizer failed, using local summary: {e}")
+
+        if not summary:
+            summary = self.extractive_summary(self.summary, turns)
+
+        self.summary = self._trim(summary.strip())
+
+    @classmethod
+    def extractive_summary(cls, summary, turns):
+        """Appends one short line per turn: the question and the answer's first sentence."""
+        lines = [summary] if summary else []
+        for turn in turns:
+            if not isinstance(turn, dict):
+                continue
+            user_msg = cls._shorten(turn.get("user"), c.CONTEXT_SUMMARY_USER_WORDS)
+            assistant_msg = cls._shorten(
+                cls._first_sentence(turn.get("assistant")), c.CONTEXT_SUMMARY_ASSISTANT_WORDS
+            )
+            if user_msg:
+                line = f"- User asked: {user_msg}"
+                if assistant_msg:
+                    line += f" | Assistant: {assistant_msg}"
+                lines.append(line)
+        return "\n".join(lines)
+
+    def _trim(self, summary):
+        """Drops the oldest summary lines until the summary fits its budget."""
+        # Line estimates are summed (newlines cost nothing), so each line is estimated once
+        lines = summary.split("\n")
+        costs = [self.estimator.estimate(line) for line in lines]
+        total = sum(costs)
+        first = 0
+        while first < len(lines) - 1 and total > self.summary_budget:
+            total -= costs[first]
+            first += 1
+
+        text = "\n".join(lines[first:])
+        if self.estimator.estimate(text) > self.summary_budget:
+            words = text.split()
+            while words and self.estimator.estimate(" ".join(words)) > self.summary_budget:
+                words = words[: max(1, len(words) * 3 // 4)] if len(words) > 1 else []
+            text = " ".join(words)
+        return text
+
+    @staticmethod
+    def _first_sentence(text):
+        if not text:
+            return ""
+        text = text.strip()
+        # find the first terminator directly; a lazy "(.+?[.!?])" rescans from every start position
+        match = re.search(r"[.!?](?=\s|$)", text)
+        return text[:match.end()] if match else text
+
+    @staticmethod
+    def _shorten(text, max_words):
+        words = re.sub(r"\s+", " ", str(text or "")).strip().split(" ")
+        words = [w for w in words if w]
+        if len(words) <= max_words:
+            return " ".join(words)
+        return " ".join(words[:max_words]) + " ..."
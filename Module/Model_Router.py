@@ -0,0 +1,379 @@
+import re
+import threading
+import time
+
+from Common.Common_Functions import CommonFunctions as common
+from Common.Config_Loader import config
+from Common.Logger_Config import logging
+from Common.Token_Estimator import token_estimator
+from Common import Constant as c
+from Module.Response_Cache import ResponseCache
+
+
+class RouteDecision:
+    """Model and thinking settings chosen for one question."""
+
+    def __init__(self, model, is_think, thinking_budget, tier, score=0.0, reason=""):
+        self.model = model
+        self.is_think = is_think
+        # None leaves thinking to the model default, 0 turns it off
+        self.thinking_budget = thinking_budget
+        self.tier = tier
+        self.score = score
+        self.reason = reason
+
+    def to_dict(self):
+        return {
+            "model": self.model,
+            "tier": self.tier,
+            "thinking_budget": self.thinking_budget,
+            "score": round(self.score, 2),
+            "reason": self.reason,
+        }
+
+
+class ModelStats:
+    """
+    Exponentially weighted latency, total tokens and error rate per model,
+    observed from real turns and shared by every session in the process.
+    """
+
+    def __init__(self, alpha=c.ROUTER_EWMA_ALPHA):
+        self.alpha = alpha
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def observe(self, model, latency_ms, total_tokens=None, ok=True):
+        with self._lock:
+            stats = self._stats.get(model)
+            if stats is None:
+                self._stats[model] = {
+                    "turns": 1,
+                    "latency_ms": float(latency_ms),
+                    "total_tokens": float(total_tokens or 0),
+                    "error_rate": 0.0 if ok else 1.0,
+                    "updated_at": time.monotonic(),
+                }
+                return
+            a = self.alpha
+            stats["turns"] += 1
+            stats["latency_ms"] += a * (latency_ms - stats["latency_ms"])
+            if total_tokens:
+                stats["total_tokens"] += a * (total_tokens - stats["total_tokens"])
+            stats["error_rate"] += a * ((0.0 if ok else 1.0) - stats["error_rate"])
+            stats["updated_at"] = time.monotonic()
+
+    def get(self, model):
+        with self._lock:
+            stats = self._stats.get(model)
+            return dict(stats) if stats else None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                model: {key: round(value, 3) for key, value in stats.items() if key != "updated_at"}
+                for model, stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+model_stats = ModelStats()
+
+
+class ModelRouter:
+    """
+    Picks the model and thinking budget for each question before it is sent.
+
+    A question is scored from cheap local signals (length, reasoning or code
+    keywords, several sub-questions, greetings, need for recent facts) and
+    the score selects a tier: `fast` (small model, thinking off), `default`
+    or `deep` (strong model, larger budget). The tier steps down while its
+    model's observed latency or error rate is above target, and the budget
+    is halved while its observed token use is above target.
+
+    Policy `fixed` keeps the previous behavior (one model, thinking only for
+    Pro models or Thinking Mode). An override pins the model and/or budget.
+    """
+
+    HARD_PATTERN = re.compile(
+        r"\b(why|how (does|do|can|would|should)|explain|prove|derive|compare|analy[sz]e|"
+        r"design|architect\w*|debug|algorithm|calculate|optimi[sz]e|trade-?offs?|"
+        r"step[- ]by[- ]step|pros and cons|implement|refactor|evaluate)\b",
+        re.IGNORECASE,
+    )
+    CODE_PATTERN = re.compile(r"```|\b(def|class|function|SELECT|import)\b|[{};]\s*$", re.MULTILINE)
+    SIMPLE_PATTERN = re.compile(
+        r"^\s*(hi|hello|hey|thanks|thank you|ok(ay)?|bye|good (morning|night|evening)|"
+        r"who are you|what is your name)\b",
+        re.IGNORECASE,
+    )
+
+    TIERS = (c.ROUTER_TIER_FAST, c.ROUTER_TIER_DEFAULT, c.ROUTER_TIER_DEEP)
+
+    def __init__(
+        self, default_model, fast_model=None, deep_model=None,
+        policy=c.ROUTER_POLICY_ADAPTIVE, stats=None,
+        fast_threshold=c.ROUTER_FAST_THRESHOLD,
+        think_threshold=c.ROUTER_THINK_THRESHOLD,
+        deep_threshold=c.ROUTER_DEEP_THRESHOLD,
+        budget_min=c.ROUTER_THINKING_BUDGET_MIN,
+        budget_max=c.ROUTER_THINKING_BUDGET_MAX,
+        latency_target_ms=c.ROUTER_LATENCY_TARGET_MS,
+        token_target=c.ROUTER_TOKEN_TARGET,
+        max_error_rate=c.ROUTER_MAX_ERROR_RATE,
+        tier_budgets=None):
+
+        self.models = {
+            c.ROUTER_TIER_FAST: fast_model,
+            c.ROUTER_TIER_DEFAULT: default_model,
+            c.ROUTER_TIER_DEEP: deep_model,
+        }
+        self.policy = str(policy or c.ROUTER_POLICY_ADAPTIVE).lower()
+        self.stats = stats if stats is not None else model_stats
+        self.fast_threshold = fast_threshold
+        self.think_threshold = think_threshold
+        self.deep_threshold = deep_threshold
+        self.budget_min = int(budget_min)
+        self.budget_max = max(int(budget_max), self.budget_min)
+        self.latency_target_ms = latency_target_ms
+        self.token_target = token_target
+        self.max_error_rate = max_error_rate
+        # thinking budget per tier below the think threshold; None keeps the model's default
+        self.tier_budgets = dict(tier_budgets or {})
+
+        self.override_model = None
+        self.override_budget = None
+        self.last_decision = None
+
+    @classmethod
+    def from_config(cls, default_model):
+        """Builds a router from the optional [ROUTER] section of Config.ini."""
+        router = cls(
+            default_model,
+            fast_model=cls._config_model("ROUTER_FAST_MODEL"),
+            deep_model=cls._config_model("ROUTER_DEEP_MODEL"),
+            policy=config.fetch_optional_value("ROUTER_POLICY", c.ROUTER_POLICY),
+            fast_threshold=common.to_float(
+                config.fetch_optional_value("ROUTER_FAST_THRESHOLD"), c.ROUTER_FAST_THRESHOLD
+            ),
+            think_threshold=common.to_float(
+                config.fetch_optional_value("ROUTER_THINK_THRESHOLD"), c.ROUTER_THINK_THRESHOLD
+            ),
+            deep_threshold=common.to_float(
+                config.fetch_optional_value("ROUTER_DEEP_THRESHOLD"), c.ROUTER_DEEP_THRESHOLD
+            ),
+            budget_min=common.to_int(
+                config.fetch_optional_value("ROUTER_THINKING_BUDGET_MIN"), c.ROUTER_THINKING_BUDGET_MIN
+            ),
+            budget_max=common.to_int(
+                config.fetch_optional_value("ROUTER_THINKING_BUDGET_MAX"), c.ROUTER_THINKING_BUDGET_MAX
+            ),
+            latency_target_ms=common.to_float(
+                config.fetch_optional_value("ROUTER_LATENCY_TARGET_MS"), c.ROUTER_LATENCY_TARGET_MS
+            ),
+            token_target=common.to_float(
+                config.fetch_optional_value("ROUTER_TOKEN_TARGET"), c.ROUTER_TOKEN_TARGET
+            ),
+            max_error_rate=common.to_float(
+                config.fetch_optional_value("ROUTER_MAX_ERROR_RATE"), c.ROUTER_MAX_ERROR_RATE
+            ),
+            tier_budgets={
+                tier: cls._config_budget(f"ROUTER_{tier.upper()}_THINKING_BUDGET") for tier in cls.TIERS
+            },
+        )
+        router.set_override(
+            model=cls._config_model("ROUTER_OVERRIDE_MODEL"),
+            thinking_budget=cls._config_budget("ROUTER_OVERRIDE_THINKING_BUDGET"),
+        )
+        return router
+
+    @staticmethod
+    def _config_budget(key):
+        """Thinking budget named by `key`, or None when unset."""
+        value = config.fetch_optional_value(key)
+        return None if value in (None, "") else common.to_int(value, None)
+
+    @staticmethod
+    def _config_model(key):
+        """Resolves a [MODEL] key named by `key`, or None when unset or unknown."""
+        model_key = config.fetch_optional_value(key)
+        if not model_key:
+            return None
+        try:
+            return config.get_model(model_key)
+        except ValueError as e:
+            logging.warning(f"⚠ {key} ignored: {e}")
+            return None
+
+    def set_override(self, model=None, thinking_budget=None):
+        """Pins the model and/or thinking budget for every question (None clears)."""
+        self.override_model = model
+        self.override_budget = thinking_budget
+
+    # -------------------------------------------------------
+    # Signals
+    # -------------------------------------------------------
+    def features(self, question):
+        text = str(question or "")
+        return {
+            "tokens": token_estimator.estimate(text),
+            "hard": len({match.group(0).lower() for match in self.HARD_PATTERN.finditer(text)}),
+            "code": bool(self.CODE_PATTERN.search(text)),
+            "questions": text.count("?"),
+            "lines": text.count("\n") + 1,
+            "simple": bool(self.SIMPLE_PATTERN.match(text)),
+            "recent": ResponseCache.is_time_sensitive(text),
+        }
+
+    @staticmethod
+    def score(features):
+        """Complexity in [0, 1] and the signals that contributed to it."""
+        score = min(c.ROUTER_LENGTH_WEIGHT, features["tokens"] / c.ROUTER_LONG_QUESTION_TOKENS * c.ROUTER_LENGTH_WEIGHT)
+        reasons = [f"tokens={features['tokens']}"]
+        if features["hard"]:
+            # every further reasoning cue adds a little, up to 0.5
+            score += min(0.5, 0.3 + 0.1 * (features["hard"] - 1))
+            reasons.append(f"reasoning x{features['hard']}")
+        if features["code"]:
+            score += 0.25
+            reasons.append("code")
+        if features["questions"] > 1 or features["lines"] > 3:
+            score += 0.15
+            reasons.append("multi-part")
+        if features["simple"] or features["tokens"] <= c.ROUTER_SHORT_QUESTION_TOKENS:
+            score -= 0.3
+            reasons.append("simple")
+        if features["recent"]:
+            # fresh facts come from search, not from longer reasoning
+            score -= 0.15
+            reasons.append("recent")
+        return max(0.0, min(1.0, score)), reasons
+
+    # -------------------------------------------------------
+    # Routing
+    # -------------------------------------------------------
+    def route(self, question, thinking_mode=False):
+        """Returns the RouteDecision for `question`."""
+        if self.policy == c.ROUTER_POLICY_FIXED:
+            decision = self._fixed_route(thinking_mode)
+        else:
+            decision = self._adaptive_route(question, thinking_mode)
+
+        if self.override_model or self.override_budget is not None:
+            decision = self._apply_override(decision)
+
+        self.last_decision = decision
+        return decision
+
+    def _fixed_route(self, thinking_mode):
+        model = self.models[c.ROUTER_TIER_DEFAULT]
+        is_think = self._is_pro(model) or thinking_mode
+        return RouteDecision(
+            model, is_think, c.MODEL_THINKING_BUDGET if is_think else None,
+            c.ROUTER_TIER_DEFAULT, reason="policy=fixed",
+        )
+
+    def _adaptive_route(self, question, thinking_mode):
+        score, reasons = self.score(self.features(question))
+
+        if score >= self.deep_threshold:
+            tier = c.ROUTER_TIER_DEEP
+        elif score <= self.fast_threshold and not thinking_mode:
+            tier = c.ROUTER_TIER_FAST
+        else:
+            tier = c.ROUTER_TIER_DEFAULT
+        tier = self._available_tier(tier)
+
+        # Observed latency / errors: step down while the chosen model is slow
+        if not thinking_mode:
+            while tier != self._available_tier(c.ROUTER_TIER_FAST) and self._is_degraded(self.models[tier]):
+                reasons.append(f"{tier} degraded")
+                tier = self._available_tier(self.TIERS[self.TIERS.index(tier) - 1])
+        model = self.models[tier]
+
+        if thinking_mode:
+            budget = max(c.MODEL_THINKING_BUDGET, self._scaled_budget(score))
+            reasons.append("thinking mode")
+        elif score >= self.think_threshold:
+            budget = self._scaled_budget(score)
+        else:
+            budget = self.tier_budgets.get(tier)
+
+        # Observed token use: halve the budget while the model runs over target
+        stats = self.stats.get(model)
+        if budget and not thinking_mode and stats and stats["total_tokens"] > self.token_target:
+            budget //= 2
+            reasons.append("token target")
+
+        if self._is_pro(model) and budget is not None:
+            # Pro models cannot turn thinking off
+            budget = max(budget, c.ROUTER_PRO_MIN_THINKING_BUDGET)
+
+        return RouteDecision(model, bool(budget), budget, tier, score, ", ".join(reasons))
+
+    def _apply_override(self, decision):
+        model = self.override_model or decision.model
+        budget = decision.thinking_budget if self.override_budget is None else self.override_budget
+        if self._is_pro(model) and budget == 0:
+            budget = c.ROUTER_PRO_MIN_THINKING_BUDGET
+        return RouteDecision(
+            model, bool(budget), budget, decision.tier, decision.score,
+            f"{decision.reason}, override" if decision.reason else "override",
+        )
+
+    def constrain(self, decision, no_thinking=False, cheaper=False):
+        """
+        Returns `decision` degraded for a token budget: the fast tier's model
+        when `cheaper` (if one is configured) and/or thinking turned off.
+        """
+        model, tier, budget = decision.model, decision.tier, decision.thinking_budget
+        reasons = [decision.reason] if decision.reason else []
+        fast_model = self.models.get(c.ROUTER_TIER_FAST)
+        if cheaper and fast_model and model != fast_model:
+            model, tier = fast_model, c.ROUTER_TIER_FAST
+            reasons.append("budget: cheaper model")
+        if no_thinking and budget != 0:
+            budget = 0
+            reasons.append("budget: no thinking")
+        if self._is_pro(model) and budget == 0:
+            budget = c.ROUTER_PRO_MIN_THINKING_BUDGET
+        if (model, tier, budget) == (decision.model, decision.tier, decision.thinking_budget):
+            return decision
+        decision = RouteDecision(model, bool(budget), budget, tier, decision.score, ", ".join(reasons))
+        self.last_decision = decision
+        return decision
+
+    def _available_tier(self, tier):
+        """`tier` if it has a model, otherwise the default tier."""
+        return tier if self.models.get(tier) else c.ROUTER_TIER_DEFAULT
+
+    def _is_degraded(self, model):
+        stats = self.stats.get(model)
+        if not stats or stats["turns"] < c.ROUTER_MIN_OBSERVATIONS:
+            return False
+        # a model that has not been tried for a while gets another chance
+        if time.monotonic() - stats["updated_at"] > c.ROUTER_DEGRADED_RETRY_SECONDS:
+            return False
+        return (
+            stats["latency_ms"] > self.latency_target_ms
+            or stats["error_rate"] > self.max_error_rate
+        )
+
+    def _scaled_budget(self, score):
+        budget = self.budget_min + score * (self.budget_max - self.budget_min)
+        return int(round(budget / 64.0)) * 64 or self.budget_min
+
+    @staticmethod
+    def _is_pro(model):
+        return c.PRO_MODEL in str(model or "").lower()
+
+    # -------------------------------------------------------
+    # Feedback
+    # -------------------------------------------------------
+    def observe(self, decision, latency_ms, total_tokens=None, ok=True):
+        """Feeds one finished turn of `decision` back into the model stats."""
+        if decision is not None:
+            self.stats.observe(decision.model, latency_ms, total_tokens, ok)
@@ -0,0 +1,154 @@
+import hashlib
+import threading
+import time
+
+from Common.Logger_Config import logging
+from Common import Constant as c
+
+
+class SystemInstructionCache:
+    """
+    Explicit context cache for the stable prompt prefix (system instruction
+    and tools) of one model.
+
+    The prefix is registered once with `client.caches.create` and later
+    calls reference it by name through `cached_content`, so Gemini does not
+    re-process it on every turn. The entry is reused while valid, its TTL is
+    extended shortly before it expires, and it is recreated when the system
+    instruction changes or the server no longer knows it.
+    """
+
+    def __init__(
+        self, client, model,
+        ttl_seconds=c.PROMPT_CACHE_TTL_SECONDS,
+        refresh_margin=c.PROMPT_CACHE_REFRESH_MARGIN,
+        retry_after=c.PROMPT_CACHE_RETRY_AFTER):
+
+        self.client = client
+        self.model = model
+        self.ttl_seconds = int(ttl_seconds)
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+
+        self.name = None
+        self.key = None
+        self.expires_at = 0.0
+        self._disabled_until = 0.0
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------
+    # Lookup
+    # -------------------------------------------------------
+    def get_name(self, system_instruction, tools=None):
+        """
+        Returns the cached content name for this prefix, creating or
+        refreshing it when needed. Returns None when caching is unavailable;
+        callers then send the prefix inline.
+        """
+        if not system_instruction:
+            return None
+
+        key = self._make_key(system_instruction, tools)
+        now = time.time()
+
+        with self._lock:
+            if now < self._disabled_until:
+                return None
+
+            if self.name and self.key == key:
+                if now < self.expires_at - self.refresh_margin:
+                    return self.name
+                if now < self.expires_at and self._refresh(now):
+                    return self.name
+
+            if self.name and self.key != key:
+                self._delete()
+
+            return self._create(system_instruction, tools, key, now)
+
+    def invalidate(self):
+        """Forget the current entry, e.g. after the server rejected it."""
+        with self._lock:
+            self._delete()
+
+    # -------------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------------
+    def _create(self, system_instruction, tools, key, now):
+        # imported on first use, like the client, to keep startup light
+        from google.genai.types import CreateCachedContentConfig
+
+        try:
+            cached = self.client.caches.create(
+                model=self.model,
+                config=CreateCachedContentConfig(
+                    display_name=c.PROMPT_CACHE_DISPLAY_NAME,
+                    system_instruction=system_instruction,
+                    tools=tools,
+                    ttl=f"{self.ttl_seconds}s",
+                ),
+            )
+        except Exception as e:
+            # Typical cause: prefix below the model's minimum cacheable size
+            logging.warning(f"⚠ Prompt cache unavailable, sending system instruction inline: {e}")
+            self._disabled_until = now + self.retry_after
+            self.name = None
+            return None
+
+        self.name = cached.name
+        self.key = key
+        self.expires_at = self._expire_time(cached, now)
+        logging.info(f"✅ Prompt cache created: {self.name}")
+        return self.name
+
+    def _refresh(self, now):
+        from google.genai.types import UpdateCachedContentConfig
+
+        try:
+            cached = self.client.caches.update(
+                name=self.name,
+                config=UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s"),
+            )
+        except Exception as e:
+            logging.warning(f"⚠ Prompt cache refresh failed, recreating: {e}")
+            self.name = None
+            return False
+
+        self.expires_at = self._expire_time(cached, now)
+        return True
+
+    def _delete(self):
+        name, self.name, self.key, self.expires_at = self.name, None, None, 0.0
+        if not name:
+            return
+        try:
+            self.client.caches.delete(name=name)
+        except Exception as e:
+            logging.warning(f"⚠ Could not delete prompt cache {name}: {e}")
+
+    def _expire_time(self, cached, now):
+        expire_time = getattr(cached, "expire_time", None)
+        if expire_time is not None:
+            try:
+                return expire_time.timestamp()
+            except Exception:
+                pass
+        return now + self.ttl_seconds
+
+    @staticmethod
+    def _make_key(system_instruction, tools):
+        payload = system_instruction + "|" + repr(tools)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# PROCESS-WIDE REGISTRY (one cache entry per client, model and prefix variant)
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_system_instruction_cache(client, model, variant=None):
+    with _caches_lock:
+        key = (id(client), model, variant)
+        if key not in _caches:
+            _caches[key] = SystemInstructionCache(client, model)
+        return _caches[key]
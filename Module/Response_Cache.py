@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from Common.Common_Functions import CommonFunctions as common
+from Common.Config_Loader import config
+from Common.Logger_Config import logging
+from Common import Constant as c
+
+
+class ResponseCache:
+    """
+    Answer cache placed in front of generate_content.
+
+    Entries live in an in-memory LRU with a TTL and a size cap. When
+    `db_path` is given, entries are also written to a SQLite table so they
+    survive restarts and can be shared by processes on the same host.
+    """
+
+    TIME_SENSITIVE_PATTERN = re.compile(
+        r"\b(today|tonight|tomorrow|yesterday|now|current(ly)?|latest|recent|news|"
+        r"weather|price|stock|score|live|this (week|month|year))\b",
+        re.IGNORECASE,
+    )
+
+    def __init__(self, max_entries=c.CACHE_MAX_ENTRIES, ttl_seconds=c.CACHE_TTL_SECONDS, db_path=None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.db_path = db_path
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._db = None
+        if db_path:
+            self._open_db(db_path)
+
+    # -------------------------------------------------------
+    # Build From Config
+    # -------------------------------------------------------
+    @classmethod
+    def from_config(cls):
+        """Returns a cache configured from the [CACHE] section, or None when disabled."""
+        if not common.to_bool(config.fetch_optional_value("CACHE_ENABLED"), c.CACHE_ENABLED):
+            return None
+
+        return cls(
+            max_entries=common.to_int(config.fetch_optional_value("CACHE_MAX_ENTRIES"), c.CACHE_MAX_ENTRIES),
+            ttl_seconds=common.to_float(config.fetch_optional_value("CACHE_TTL_SECONDS"), c.CACHE_TTL_SECONDS),
+            db_path=config.fetch_optional_value("CACHE_DB_PATH") or None,
+        )
+
+    # -------------------------------------------------------
+    # Keys
+    # -------------------------------------------------------
+    @staticmethod
+    def normalize_question(question):
+        text = re.sub(r"\s+", " ", str(question or "")).strip().lower()
+        return text.rstrip("?!. ")
+
+    @classmethod
+    def is_time_sensitive(cls, question):
+        return bool(cls.TIME_SENSITIVE_PATTERN.search(str(question or "")))
+
+    @classmethod
+    def make_key(cls, question, model, thinking, system_instruction, context_text):
+        """Hash of normalized question, model, thinking mode, system instruction and prior context."""
+        sys_hash = hashlib.sha256((system_instruction or "").encode("utf-8")).hexdigest()
+        payload = json.dumps(
+            [cls.normalize_question(question), model, bool(thinking), sys_hash, context_text or ""],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # -------------------------------------------------------
+    # Get / Put
+    # -------------------------------------------------------
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+
+            row = self._db_get(key, now)
+            if row is not None:
+                # keep the stored expiry; promotion to memory must not extend it
+                value, expires_at = row
+                self._store(key, value, expires_at)
+                self.hits += 1
+                return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._store(key, value, now + self.ttl_seconds)
+            self._db_put(key, value, now)
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db:
+                self._db.execute("DELETE FROM response_cache")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    # -------------------------------------------------------
+    # SQLite Tier
+    # -------------------------------------------------------
+    def _open_db(self, db_path):
+        try:
+            folder = os.path.dirname(os.path.abspath(db_path))
+            os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_response_cache_access "
+                "ON response_cache(last_access)"
+            )
+            self._db.commit()
+            logging.info(f"✅ Response cache database opened: {db_path}")
+        except Exception as e:
+            logging.error(f"❌ Could not open response cache database: {e}")
+            self._db = None
+
+    def _db_get(self, key, now):
+        """(value, expires_at) of a live entry in the database, or None."""
+        if not self._db:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return row
+        except Exception as e:
+            logging.error(f"❌ Response cache read error: {e}")
+            return None
+
+    def _db_put(self, key, value, now):
+        if not self._db:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl_seconds, now),
+            )
+            self._db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+            self._db.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+        except Exception as e:
+            logging.error(f"❌ Response cache write error: {e}")
+
+
+# PROCESS-WIDE DEFAULT CACHE
+_default_cache = None
+_default_cache_loaded = False
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Returns the cache shared by all chatbot instances in this process."""
+    global _default_cache, _default_cache_loaded
+    with _default_cache_lock:
+        if not _default_cache_loaded:
+            _default_cache = ResponseCache.from_config()
+            _default_cache_loaded = True
+        return _default_cache
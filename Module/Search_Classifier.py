@@ -0,0 +1,209 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+
+from Common.Common_Functions import CommonFunctions as common
+from Common.Config_Loader import config
+from Common.Logger_Config import logging
+from Common import Constant as c
+from Module.Model_Router import ModelRouter
+from Module.Response_Cache import ResponseCache
+
+
+class SearchDecision:
+    """Whether Google Search grounding is attached to one turn, and why."""
+
+    def __init__(self, enabled, score=None, reasons=()):
+        self.enabled = enabled
+        self.score = score
+        self.reasons = list(reasons)
+
+    def to_dict(self):
+        return {
+            "enabled": self.enabled,
+            "score": None if self.score is None else round(self.score, 3),
+            "reasons": self.reasons,
+        }
+
+
+class SearchRule:
+    """One named signal: `pattern` matching the question adds `weight` to the logit."""
+
+    def __init__(self, name, pattern, weight):
+        self.name = name
+        self.pattern = pattern if hasattr(pattern, "search") else re.compile(pattern, re.IGNORECASE)
+        self.weight = float(weight)
+
+    def matches(self, question):
+        return bool(self.pattern.search(question))
+
+
+class SearchClassifier:
+    """
+    Local, rule-based decision whether a question needs Google Search.
+
+    Every rule that matches adds its weight to `bias`; the logistic of the
+    sum is the search probability and search is attached at or above
+    `threshold`. Rules can be added with `add_rule`, and weights fitted
+    offline on logged turns (`fit_weights`) replace the hand-set ones.
+    """
+
+    DEFAULT_RULES = (
+        ("recency", ResponseCache.TIME_SENSITIVE_PATTERN, 3.0),
+        ("explicit", r"\b(search|look up|google|sources?|cite|citations?|links?|websites?|references?)\b", 3.0),
+        ("lookup", r"\b(who (is|was|won|are|were)|when (is|was|did|does|will)|where (is|was|are)|"
+                   r"how (much|many|old|tall|far)|what happened)\b", 2.0),
+        ("url", r"https?://|www\.", 1.5),
+        ("year", r"\b(19|20)\d{2}\b", 1.0),
+        ("entity", re.compile(r"(?<=[\w,;:]\s)[A-Z][a-z]{2,}"), 0.8),  # capitalized word mid-sentence
+        ("greeting", ModelRouter.SIMPLE_PATTERN, -3.0),
+        ("code", ModelRouter.CODE_PATTERN, -2.0),
+        ("task", r"\b(explain|prove|derive|calculate|solve|write|rewrite|translate|summari[sz]e|"
+                 r"brainstorm|poem|story|joke|refactor|debug)\b", -1.5),
+        ("short", r"^\s*\S+(\s+\S+){0,2}\s*$", -1.0),
+    )
+
+    def __init__(self, rules=None, bias=c.SEARCH_BIAS, threshold=c.SEARCH_THRESHOLD, policy=c.SEARCH_POLICY):
+        self.rules = [SearchRule(*rule) for rule in (rules if rules is not None else self.DEFAULT_RULES)]
+        self.bias = float(bias)
+        self.threshold = float(threshold)
+        self.policy = str(policy or c.SEARCH_POLICY).lower()
+
+    @classmethod
+    def from_config(cls):
+        """Builds a classifier from the optional [SEARCH] section of Config.ini."""
+        classifier = cls(
+            bias=common.to_float(config.fetch_optional_value("SEARCH_BIAS"), c.SEARCH_BIAS),
+            threshold=common.to_float(config.fetch_optional_value("SEARCH_THRESHOLD"), c.SEARCH_THRESHOLD),
+            policy=config.fetch_optional_value("SEARCH_POLICY", c.SEARCH_POLICY),
+        )
+        weights_path = config.fetch_optional_value("SEARCH_WEIGHTS_PATH") or os.path.join(
+            config.secrets_dir, c.SEARCH_WEIGHTS_FILE
+        )
+        if os.path.exists(weights_path):
+            try:
+                classifier.load_weights(weights_path)
+            except Exception as e:
+                logging.warning(f"⚠ Search weights ignored ({weights_path}): {e}")
+        return classifier
+
+    def add_rule(self, name, pattern, weight):
+        self.rules.append(SearchRule(name, pattern, weight))
+
+    # -------------------------------------------------------
+    # Weights
+    # -------------------------------------------------------
+    def weights(self):
+        return {"bias": self.bias, "weights": {rule.name: rule.weight for rule in self.rules}}
+
+    def set_weights(self, weights):
+        """Applies {"bias": b, "weights": {rule_name: w}}; unknown names are ignored."""
+        self.bias = float(weights.get("bias", self.bias))
+        learned = weights.get("weights") or {}
+        for rule in self.rules:
+            if rule.name in learned:
+                rule.weight = float(learned[rule.name])
+
+    def load_weights(self, path):
+        with open(path, encoding="utf-8") as f:
+            self.set_weights(json.load(f))
+        logging.info(f"✅ Search weights loaded: {path}")
+
+    # -------------------------------------------------------
+    # Decision
+    # -------------------------------------------------------
+    def features(self, question):
+        """Names of the rules that match `question`."""
+        text = str(question or "")
+        return [rule.name for rule in self.rules if rule.matches(text)]
+
+    def probability(self, matched):
+        weights = {rule.name: rule.weight for rule in self.rules}
+        logit = self.bias + sum(weights[name] for name in matched)
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, logit))))
+
+    def classify(self, question):
+        if self.policy == c.SEARCH_POLICY_ALWAYS:
+            return SearchDecision(True, reasons=["policy=always"])
+        if self.policy == c.SEARCH_POLICY_NEVER:
+            return SearchDecision(False, reasons=["policy=never"])
+
+        matched = self.features(question)
+        score = self.probability(matched)
+        return SearchDecision(score >= self.threshold, score, matched)
+
+
+# -------------------------------------------------------
+# Offline Fitting
+# -------------------------------------------------------
+def samples_from_log(db_path, limit=c.SEARCH_FIT_MAX_SAMPLES):
+    """
+    (question, label) pairs from the SQLite log. Only answered turns that
+    had search attached are used; the label is whether the answer came
+    back grounded (its logged source count is above zero), i.e. whether
+    the model needed search.
+    """
+    db = sqlite3.connect(db_path)
+    try:
+        rows = db.execute(
+            f"SELECT question, grounded FROM {c.LOG_TABLE} "
+            f"WHERE status = ? AND (search IS NULL OR search = 1) AND grounded IS NOT NULL "
+            f"ORDER BY created_at DESC LIMIT ?",
+            (c.RECEIVED, limit),
+        ).fetchall()
+    finally:
+        db.close()
+
+    return [(question, grounded > 0) for question, grounded in rows]
+
+
+def fit_weights(classifier, samples, epochs=c.SEARCH_FIT_EPOCHS, learning_rate=c.SEARCH_FIT_LEARNING_RATE):
+    """
+    Fits the rule weights and bias of `classifier` by logistic regression
+    (batch gradient descent) on (question, label) samples and returns them.
+    """
+    if not samples:
+        raise ValueError("❌ No logged samples to fit search weights on")
+
+    names = [rule.name for rule in classifier.rules]
+    rows = [(set(classifier.features(question)), 1.0 if label else 0.0) for question, label in samples]
+    weights = dict.fromkeys(names, 0.0)
+    bias = 0.0
+
+    for _ in range(epochs):
+        grad = dict.fromkeys(names, 0.0)
+        grad_bias = 0.0
+        for matched, label in rows:
+            logit = bias + sum(weights[name] for name in matched)
+            error = 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, logit)))) - label
+            grad_bias += error
+            for name in matched:
+                grad[name] += error
+        bias -= learning_rate * grad_bias / len(rows)
+        for name in names:
+            weights[name] -= learning_rate * grad[name] / len(rows)
+
+    fitted = {
+        "bias": round(bias, 4),
+        "weights": {name: round(weight, 4) for name, weight in weights.items()},
+        "samples": len(rows),
+        "positive": int(sum(label for _, label in rows)),
+    }
+    classifier.set_weights(fitted)
+    return fitted
+
+
+# PROCESS-WIDE CLASSIFIER
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_search_classifier():
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = SearchClassifier.from_config()
+        return _classifier
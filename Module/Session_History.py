@@ -0,0 +1,351 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+
+from Common.Common_Functions import CommonFunctions as common
+from Common.Config_Loader import config
+from Common.Logger_Config import logging
+from Common import Constant as c
+
+
+class SessionStore:
+    """
+    Append-only store of conversation turns (SQLite in WAL mode), shared
+    by every session in the process. Turns are keyed by (session_id, seq)
+    where `seq` is the turn's position in its session. `seq` is assigned
+    by the database, so two windows resuming the same session id never
+    overwrite each other's turns.
+    """
+
+    def __init__(self, db_path, retention_days=c.HISTORY_RETENTION_DAYS):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS session_turns ("
+            "session_id TEXT NOT NULL, "
+            "seq INTEGER NOT NULL, "
+            "user_text TEXT, "
+            "assistant_text TEXT, "
+            "sources_json TEXT, "
+            "updated_at REAL NOT NULL, "
+            "PRIMARY KEY (session_id, seq))"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_session_turns_updated ON session_turns(updated_at)"
+        )
+        self._db.commit()
+        if retention_days:
+            self.prune(retention_days)
+        logging.info(f"✅ Session store opened: {db_path}")
+
+    # -------------------------------------------------------
+    # Write
+    # -------------------------------------------------------
+    def append_turn(self, session_id, turn):
+        """Adds `turn` after the newest stored turn of the session and returns its seq."""
+        with self._lock:
+            try:
+                # IMMEDIATE takes the write lock before reading MAX(seq), also across processes
+                self._db.execute("BEGIN IMMEDIATE")
+                row = self._db.execute(
+                    "SELECT MAX(seq) FROM session_turns WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                seq = 0 if row[0] is None else row[0] + 1
+                self._db.execute(
+                    "INSERT INTO session_turns "
+                    "(session_id, seq, user_text, assistant_text, sources_json, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        session_id, seq, turn.get("user"), turn.get("assistant"),
+                        json.dumps(turn.get("sources") or [], ensure_ascii=False), time.time(),
+                    ),
+                )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+        return seq
+
+    def update_turn(self, session_id, seq, turn):
+        """Rewrites the answer and sources of a stored turn."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE session_turns SET assistant_text = ?, sources_json = ?, updated_at = ? "
+                "WHERE session_id = ? AND seq = ?",
+                (
+                    turn.get("assistant"), json.dumps(turn.get("sources") or [], ensure_ascii=False),
+                    time.time(), session_id, seq,
+                ),
+            )
+            self._db.commit()
+
+    def prune(self, retention_days):
+        cutoff = time.time() - retention_days * 86400
+        with self._lock:
+            # whole sessions go at once, so a resumed session is never missing old turns
+            cursor = self._db.execute(
+                "DELETE FROM session_turns WHERE session_id IN ("
+                "SELECT session_id FROM session_turns GROUP BY session_id HAVING MAX(updated_at) < ?)",
+                (cutoff,),
+            )
+            self._db.commit()
+            return cursor.rowcount
+
+    # -------------------------------------------------------
+    # Read
+    # -------------------------------------------------------
+    def count(self, session_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MAX(seq) FROM session_turns WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def load(self, session_id, start, stop):
+        """Turns with start <= seq < stop, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT user_text, assistant_text, sources_json FROM session_turns "
+                "WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (session_id, start, stop),
+            ).fetchall()
+        return [
+            {"user": user, "assistant": assistant or "", "sources": json.loads(sources or "[]")}
+            for user, assistant, sources in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class SessionHistory:
+    """
+    Conversation history of one session with bounded memory.
+
+    Behaves like a list of turns ({"user", "assistant", "sources"}) indexed
+    from the start of the session, but only the newest `ring_size` turns
+    are kept in memory. Every turn is written through to the SessionStore,
+    so older turns are read back from disk on demand (paging, context
+    folding) and a session can be resumed by id after a reconnect. Without
+    a store the whole history stays in memory, as before.
+    """
+
+    def __init__(self, store=None, session_id=None, ring_size=c.HISTORY_RING_SIZE):
+        self.store = store
+        self.session_id = session_id or uuid.uuid4().hex
+        self.ring_size = max(1, int(ring_size)) if store else None
+        self._ring = deque(maxlen=self.ring_size)
+        self._length = 0
+        self._loaded = True
+        self._lock = threading.RLock()
+        self.last_used = time.monotonic()
+
+        if store and session_id:
+            self._length = store.count(session_id)
+            self._loaded = False
+        with _live_histories_lock:
+            _live_histories.add(self)
+
+    # -------------------------------------------------------
+    # Write
+    # -------------------------------------------------------
+    def append(self, turn):
+        with self._lock:
+            self._touch()
+            turn = {"user": turn.get("user"), "assistant": turn.get("assistant") or "",
+                    "sources": turn.get("sources") or []}
+            self._ensure_loaded()
+            seq = self._store_append(turn)
+            if seq > self._length:
+                # another window appended to this session; reload its newest turns
+                self._length = seq + 1
+                self._ring.clear()
+                self._loaded = False
+                self._ensure_loaded()
+                return self._ring[-1]
+            self._ring.append(turn)
+            self._length += 1
+            return turn
+
+    def complete(self, assistant, sources=None):
+        """Sets the answer (and sources) of the newest turn."""
+        with self._lock:
+            self._touch()
+            if not self._length:
+                return
+            self._ensure_loaded()
+            turn = self._ring[-1]
+            turn["assistant"] = assistant
+            if sources is not None:
+                turn["sources"] = sources
+            self._store_update(self._length - 1, turn)
+
+    def clear(self):
+        """Starts a new session; the old one stays on disk."""
+        with self._lock:
+            self.session_id = uuid.uuid4().hex
+            self._ring.clear()
+            self._length = 0
+            self._loaded = True
+
+    def _store_append(self, turn):
+        """Seq of the appended turn: assigned by the store, else the local position."""
+        if not self.store:
+            return self._length
+        try:
+            return self.store.append_turn(self.session_id, turn)
+        except Exception as e:
+            logging.error(f"❌ Failed to save session turn: {e}")
+            return self._length
+
+    def _store_update(self, seq, turn):
+        if not self.store:
+            return
+        try:
+            self.store.update_turn(self.session_id, seq, turn)
+        except Exception as e:
+            logging.error(f"❌ Failed to save session turn: {e}")
+
+    # -------------------------------------------------------
+    # Read
+    # -------------------------------------------------------
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        return self._length > 0
+
+    def __iter__(self):
+        return iter(self[0:self._length])
+
+    def __getitem__(self, index):
+        with self._lock:
+            self._touch()
+            if isinstance(index, slice):
+                start, stop, step = index.indices(self._length)
+                turns = self._range(start, stop) if start < stop else []
+                return turns[::step] if step != 1 else turns
+
+            if index < 0:
+                index += self._length
+            if not 0 <= index < self._length:
+                raise IndexError("session history index out of range")
+            self._ensure_loaded()
+            ring_start = self._length - len(self._ring)
+            if index >= ring_start:
+                return self._ring[index - ring_start]
+            return self.store.load(self.session_id, index, index + 1)[0]
+
+    def page(self, offset, limit):
+        """`limit` turns starting `offset` turns back from the newest (for UI paging)."""
+        stop = max(0, self._length - offset)
+        return self[max(0, stop - limit):stop]
+
+    def _range(self, start, stop):
+        self._ensure_loaded()
+        ring_start = self._length - len(self._ring)
+        turns = []
+        if start < ring_start:
+            turns = self.store.load(self.session_id, start, min(stop, ring_start))
+        if stop > ring_start:
+            turns += list(self._ring)[max(0, start - ring_start):stop - ring_start]
+        return turns
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            start = max(0, self._length - self.ring_size)
+            self._ring.extend(self.store.load(self.session_id, start, self._length))
+            self._loaded = True
+
+    def _touch(self):
+        self.last_used = time.monotonic()
+
+    # -------------------------------------------------------
+    # Memory
+    # -------------------------------------------------------
+    def release(self):
+        """Drops the in-memory turns; they are reloaded from disk on next use."""
+        with self._lock:
+            if self.store and self._loaded:
+                self._ring.clear()
+                self._loaded = False
+
+    @property
+    def resident_turns(self):
+        return len(self._ring)
+
+
+# -------------------------------------------------------
+# Process-wide Store + Idle Eviction
+# -------------------------------------------------------
+_live_histories = weakref.WeakSet()
+_live_histories_lock = threading.Lock()
+_store = None
+_store_loaded = False
+_store_lock = threading.Lock()
+_evictor = None
+
+
+def get_session_store():
+    """Returns the SessionStore shared by all sessions, or None when disabled."""
+    global _store, _store_loaded
+    with _store_lock:
+        if not _store_loaded:
+            _store_loaded = True
+            if common.to_bool(config.fetch_optional_value("HISTORY_STORE_ENABLED"), c.HISTORY_STORE_ENABLED):
+                try:
+                    _store = SessionStore(
+                        config.fetch_optional_value("HISTORY_DB_PATH")
+                        or os.path.join(config.secrets_dir, c.HISTORY_DB_FILE),
+                        retention_days=common.to_int(
+                            config.fetch_optional_value("HISTORY_RETENTION_DAYS"), c.HISTORY_RETENTION_DAYS
+                        ),
+                    )
+                    _start_evictor()
+                except Exception as e:
+                    logging.error(f"❌ Session store unavailable, keeping history in memory: {e}")
+        return _store
+
+
+def evict_idle_sessions(idle_seconds):
+    """Releases the memory of every session unused for `idle_seconds`. Returns how many."""
+    cutoff = time.monotonic() - idle_seconds
+    evicted = 0
+    with _live_histories_lock:
+        histories = list(_live_histories)
+    for history in histories:
+        if history.last_used < cutoff and history.resident_turns:
+            history.release()
+            evicted += 1
+    if evicted:
+        logging.info(f"✅ Released {evicted} idle session(s) from memory")
+    return evicted
+
+
+def _start_evictor():
+    global _evictor
+    idle_seconds = common.to_float(config.fetch_optional_value("HISTORY_IDLE_SECONDS"), c.HISTORY_IDLE_SECONDS)
+    if idle_seconds <= 0 or _evictor is not None:
+        return
+
+    def evict():
+        while True:
+            time.sleep(min(idle_seconds, c.HISTORY_EVICT_INTERVAL))
+            try:
+                evict_idle_sessions(idle_seconds)
+            except Exception as e:
+                logging.error(f"❌ Session eviction error: {e}")
+
+    _evictor = threading.Thread(target=evict, name="SessionEvictor", daemon=True)
+    _evictor.start()
@@ -1,173 +1,888 @@
 
-import streamlit as st
+import asyncio
+import time
 from Common.Logger_Config import logging
 
-from google.genai.types import (
-    GenerateContentConfig,
-    GoogleSearch,
-    Tool,
-    Content,
-    Part,
-)
-
 from Common.Common_Functions import CommonFunctions as common
 from Common import Constant as c
 from Common.Config_Loader import config
+from Common.Metrics import metrics
+from Common.Resilience import CircuitOpenError, resilience
+from Common.Token_Estimator import token_estimator
+from Common.Token_Ledger import TokenBudgetExceeded, get_token_ledger
+from Module.Context_Window import ContextWindow
+from Module.Model_Router import ModelRouter
+from Module.Prompt_Cache import get_system_instruction_cache
+from Module.Response_Cache import ResponseCache, get_default_cache
+from Module.Search_Classifier import get_search_classifier
+from Module.Session_History import SessionHistory, get_session_store
 import json
 
+
+# Prebuilt GenerateContentConfig objects, shared by all sessions
+_GENERATE_CONFIGS = {}
+
+
+class TurnRequest:
+    """Everything prepared for one model call."""
+
+    def __init__(self, question, is_think, contents, generate_config, cache_key=None, raw_prompt_tokens=0):
+        self.question = question
+        self.is_think = is_think
+        self.route = None
+        self.model = None
+        self.thinking_budget = None
+        self.search = None
+        self.budget = None
+        self.contents = contents
+        self.generate_config = generate_config
+        self.cache_key = cache_key
+        self.raw_prompt_tokens = raw_prompt_tokens
+        self.system_instruction = None
+        self.cached_content = None
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.stream_started = None
+
+
+class StreamAccumulator:
+    """Collects answer text, thoughts and usage metadata from streamed chunks."""
+
+    def __init__(self):
+        self.answer_parts = []
+        self.thoughts = []
+        self.last_chunk = None
+        self.usage = None
+        self.grounding = None
+        self.complete = False
+
+    def add(self, chunk):
+        """Records `chunk` and returns its answer text parts."""
+        self.last_chunk = chunk
+        if getattr(chunk, "usage_metadata", None):
+            self.usage = chunk.usage_metadata
+        grounding = common.get_grounding_metadata(chunk)
+        if grounding is not None:
+            self.grounding = grounding
+
+        texts = []
+        for text, is_thought in SyncWithMeChatBot._iter_parts(chunk):
+            if is_thought:
+                self.thoughts.append(text)
+            else:
+                self.answer_parts.append(text)
+                texts.append(text)
+        return texts
+
+
 class SyncWithMeChatBot:
-    def __init__(self, client, model, sheet):
+    def __init__(self, client, model, sheet, cache=None, session_id=None):
         """
         Initializes the chatbot with client, model, and Google Sheet instance.
+        `cache` defaults to the process-wide response cache from config.
         """
         self.client = client
         self.model = model
         self.sheet_data = sheet
-        self.session_history = []
+        self.cache = cache if cache is not None else get_default_cache()
+        self.router = ModelRouter.from_config(model)
+        self.search_classifier = get_search_classifier()
+        self.ledger = get_token_ledger()
+
+        self.prompt_cache = None
+        self.prompt_cache_no_tools = None
+        if common.to_bool(config.fetch_optional_value("PROMPT_CACHE_ENABLED"), c.PROMPT_CACHE_ENABLED):
+            self.prompt_cache = get_system_instruction_cache(client, model)
+            self.prompt_cache_no_tools = get_system_instruction_cache(client, model, c.PROMPT_CACHE_NO_TOOLS)
+        self.session_history = SessionHistory(
+            store=get_session_store(),
+            session_id=session_id,
+            ring_size=common.to_int(config.fetch_optional_value("HISTORY_RING_SIZE"), c.HISTORY_RING_SIZE),
+        )
+        self.last_thoughts = ""
+        self.last_sources = []
+        self.last_cached = False
+        self.last_error = None
+        self.last_total_tokens = 0
+        self.cell_char_limit = common.to_int(
+            config.fetch_sheet_value("CELL_CHAR_LIMIT"), c.SHEET_CELL_CHAR_LIMIT
+        )
+
+        summarizer = None
+        summary_mode = config.fetch_optional_value("CONTEXT_SUMMARY_MODE", c.CONTEXT_SUMMARY_MODE)
+        if str(summary_mode).lower() == c.CONTEXT_SUMMARY_MODE_MODEL:
+            summarizer = self._summarize_with_model
+
+        self.context_window = ContextWindow(
+            token_budget=common.to_int(
+                config.fetch_optional_value("CONTEXT_TOKEN_BUDGET"), c.CONTEXT_TOKEN_BUDGET
+            ),
+            summary_budget=common.to_int(
+                config.fetch_optional_value("CONTEXT_SUMMARY_TOKEN_BUDGET"), c.CONTEXT_SUMMARY_TOKEN_BUDGET
+            ),
+            summarizer=summarizer,
+        )
 
     # =====================================================================
-    # Generate Chatbot Response
+    # Request Preparation
     # =====================================================================
-    def get_gemini_text_response(self, question, thinking_mode=False):
+    def _prepare_request(self, question, thinking_mode=False, use_cache=True):
         """
-        Sends a question to Gemini model and returns the chatbot response.
-        Saves response logs to Google Sheets when available.
+        Builds everything needed for a model call and records the question
+        in the session history. Returns a TurnRequest. Raises
+        TokenBudgetExceeded when the token budget stays exhausted.
         """
+        self.last_error = None
+        self.last_total_tokens = 0
+        self.last_sources = []
+        started = time.perf_counter()
+        timings = {}
 
         # -------------------------------------------------------------
-        # THINKING MODE CONFIG
+        # TOKEN BUDGET (degrade, or queue until the window has room)
         # -------------------------------------------------------------
-        is_think = False
-        thinking_config = None
+        budget = None
+        if self.ledger:
+            with metrics.span("budget", timings):
+                budget = self.ledger.plan(self.session_id)
+                if budget.level == c.BUDGET_LEVEL_EXHAUSTED:
+                    budget = self.ledger.wait_for_budget(
+                        self.session_id,
+                        common.to_float(config.fetch_optional_value("TOKEN_QUEUE_TIMEOUT"), c.TOKEN_QUEUE_TIMEOUT),
+                    )
+            metrics.inc(c.METRIC_BUDGET_LEVELS, labels={"level": budget.level})
 
-        if (c.PRO_MODEL in self.model.lower()) or thinking_mode:
-            is_think = True
-            thinking_config = {
-                "include_thoughts": True,
-                "thinking_budget": c.MODEL_THINKING_BUDGET,
-            }
+        # -------------------------------------------------------------
+        # ROUTING (model and thinking budget for this question)
+        # -------------------------------------------------------------
+        with metrics.span("route", timings):
+            route = self.router.route(question, thinking_mode)
+            if budget and (budget.no_thinking or budget.cheaper_model):
+                route = self.router.constrain(route, budget.no_thinking, budget.cheaper_model)
+        is_think = route.is_think
+
+        # SEARCH GROUNDING (attach the Google Search tool only when needed)
+        with metrics.span("search_select", timings):
+            search = self.search_classifier.classify(question)
+        metrics.inc(c.METRIC_SEARCH_DECISIONS, labels={"search": str(search.enabled).lower()})
 
         # SYSTEM INSTRUCTION
-        try:
-            sys_ins = config.get_system_instruction() or ""
-        except Exception as e:
-            logging.warning(f"Error loading system instruction: {e}")
-            sys_ins = None
+        with metrics.span("config", timings):
+            try:
+                sys_ins = config.get_system_instruction() or ""
+            except Exception as e:
+                logging.warning(f"Error loading system instruction: {e}")
+                sys_ins = None
 
         # -------------------------------------------------------------
         # BUILD CONTEXT HISTORY
         # -------------------------------------------------------------
-        self.session_history.append({"user": question, "assistant": ""})
-        context_text = common.build_context_text(
-            self.session_history[-c.MAX_CONTEXT:]
+        with metrics.span("context", timings):
+            self.session_history.append({"user": question, "assistant": ""})
+            context_budget = None
+            if budget and budget.smaller_context:
+                context_budget = int(self.context_window.token_budget * common.to_float(
+                    config.fetch_optional_value("TOKEN_DEGRADED_CONTEXT_RATIO"), c.TOKEN_DEGRADED_CONTEXT_RATIO
+                ))
+            summary, recent_turns = self.context_window.build(self.session_history, context_budget)
+            contents = self._build_contents(recent_turns, summary)
+            context_text = common.build_context_text(recent_turns, summary)
+            raw_prompt_tokens = (
+                token_estimator.raw_estimate(sys_ins) + token_estimator.raw_estimate(context_text)
+            )
+
+        # -------------------------------------------------------------
+        # GENERATION CONFIG (system instruction inline or cached)
+        # -------------------------------------------------------------
+        with metrics.span("generate_config", timings):
+            cached_content = None
+            # the cached prefixes belong to the default model, one with and one without tools
+            prompt_cache = self.prompt_cache if search.enabled else self.prompt_cache_no_tools
+            if prompt_cache and route.model == self.model:
+                cached_content = prompt_cache.get_name(sys_ins, self._get_tools() if search.enabled else None)
+            generate_config = self._get_generate_config(
+                is_think, sys_ins, cached_content, route.thinking_budget, search.enabled
+            )
+
+        # -------------------------------------------------------------
+        # RESPONSE CACHE KEY
+        # -------------------------------------------------------------
+        cache_key = None
+        if self.cache and use_cache and not ResponseCache.is_time_sensitive(question):
+            prior_context = common.build_context_text(recent_turns[:-1], summary)
+            cache_key = ResponseCache.make_key(
+                question, route.model, is_think, sys_ins, prior_context
+            )
+
+        request = TurnRequest(
+            question, is_think, contents, generate_config,
+            cache_key, raw_prompt_tokens
         )
+        request.route = route
+        request.model = route.model
+        request.thinking_budget = route.thinking_budget
+        request.search = search
+        request.budget = budget
+        request.system_instruction = sys_ins
+        request.cached_content = cached_content
+        request.started = started
+        request.timings = timings
+        return request
 
+    @staticmethod
+    def _build_contents(recent_turns, summary=""):
+        """
+        Converts the context window into structured Content turns. The summary
+        of older turns, if any, is sent as the first user turn.
+        """
+        # google.genai.types takes about a second to import, so it loads on the first turn
+        from google.genai.types import Content, Part
+
+        contents = []
+        if summary:
+            contents.append(Content(
+                role="user",
+                parts=[Part(text=f"Summary of earlier conversation:\n{summary}")],
+            ))
+        for turn in recent_turns:
+            if not isinstance(turn, dict):
+                continue
+            if turn.get("user"):
+                contents.append(Content(role="user", parts=[Part(text=turn["user"])]))
+            if turn.get("assistant"):
+                contents.append(Content(role="model", parts=[Part(text=turn["assistant"])]))
+        return contents
+
+    @staticmethod
+    def _get_tools():
         # -------------------------------------------------------------
         # GOOGLE SEARCH TOOL
         # -------------------------------------------------------------
-        tools = [Tool(google_search=GoogleSearch())]
+        from google.genai.types import GoogleSearch, Tool
 
-        # API CALL
-        try:
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=context_text,
-                config=GenerateContentConfig(
-                    temperature=0.5,
-                    max_output_tokens=c.MAX_OUTPUT_TOKEN_LENGTH,
-                    tools=tools,
-                    thinking_config=thinking_config,
-                    system_instruction=Content(
-                        role="system",
-                        parts=[Part(text=sys_ins)],
-                    ),
+        return [Tool(google_search=GoogleSearch())]
+
+    def _get_generate_config(self, is_think, sys_ins, cached_content=None, thinking_budget=None, use_search=True):
+        """
+        Returns a prebuilt GenerateContentConfig for this combination, building
+        it on first use. With cached_content the system instruction and tools
+        live in the cache and must not be sent again. A thinking_budget of 0
+        turns thinking off; None leaves it to the model.
+        """
+        key = (is_think, sys_ins, cached_content, thinking_budget, use_search)
+        generate_config = _GENERATE_CONFIGS.get(key)
+        if generate_config is not None:
+            return generate_config
+
+        from google.genai.types import Content, GenerateContentConfig, HttpOptions, Part, ThinkingConfig
+
+        thinking_config = None
+        if is_think or thinking_budget is not None:
+            thinking_config = ThinkingConfig(
+                include_thoughts=is_think,
+                thinking_budget=c.MODEL_THINKING_BUDGET if thinking_budget is None else thinking_budget,
+            )
+
+        if cached_content:
+            generate_config = GenerateContentConfig(
+                temperature=0.5,
+                max_output_tokens=c.MAX_OUTPUT_TOKEN_LENGTH,
+                thinking_config=thinking_config,
+                cached_content=cached_content,
+                http_options=HttpOptions(timeout=c.GEMINI_TIMEOUT_MS),
+            )
+        else:
+            generate_config = GenerateContentConfig(
+                temperature=0.5,
+                max_output_tokens=c.MAX_OUTPUT_TOKEN_LENGTH,
+                tools=self._get_tools() if use_search else None,
+                thinking_config=thinking_config,
+                system_instruction=Content(
+                    role="system",
+                    parts=[Part(text=sys_ins)],
                 ),
+                http_options=HttpOptions(timeout=c.GEMINI_TIMEOUT_MS),
             )
-        except Exception as api_error:
-            logging.error(f"Error calling generate_content API: {api_error}", exc_info=True)
 
-            # Log failure to Google Sheet if possible
-            if self.sheet_data:
-                try:
-                    self.sheet_data.save_question_response(
-                        question, is_think, self.model,
-                        str(api_error), c.NO_RESPONSE, c.ERROR, c.NA
-                    )
-                except Exception as sheet_error:
-                    logging.error(f"Error saving API error to Google Sheet: {sheet_error}")
+        if len(_GENERATE_CONFIGS) >= c.GENERATE_CONFIG_CACHE_SIZE:
+            _GENERATE_CONFIGS.clear()
+        _GENERATE_CONFIGS[key] = generate_config
+        return generate_config
+
+    def _drop_prompt_cache(self, request):
+        """Falls back to the inline system instruction after a cached-content error."""
+        logging.warning("⚠ Request with cached content failed, retrying without prompt cache")
+        use_search = request.search is None or request.search.enabled
+        (self.prompt_cache if use_search else self.prompt_cache_no_tools).invalidate()
+        request.cached_content = None
+        request.generate_config = self._get_generate_config(
+            request.is_think, request.system_instruction,
+            thinking_budget=request.thinking_budget, use_search=use_search,
+        )
 
-            return "Sorry, there was an error communicating with the model."
+    def _call_model(self, request):
+        return resilience.call(
+            c.BACKEND_GEMINI, self.client.models.generate_content,
+            model=request.model,
+            contents=request.contents,
+            config=request.generate_config,
+        )
 
-        # EXTRACT TEXT
+    def _open_stream(self, request):
+        """Starts a stream and waits for its first chunk, so failures surface here."""
+        iterator = iter(self.client.models.generate_content_stream(
+            model=request.model,
+            contents=request.contents,
+            config=request.generate_config,
+        ))
+        return next(iterator, None), iterator
+
+    def _generate_content(self, request):
         try:
-            bot_text = ""
+            return self._call_model(request)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            if not request.cached_content:
+                raise
+            self._drop_prompt_cache(request)
+            return self._call_model(request)
 
-            # Primary modern API: response.text
-            if hasattr(response, "text") and response.text:
-                bot_text = response.text.strip()
+    def _generate_content_stream(self, request):
+        """
+        Yields response chunks. Opening the stream (up to the first chunk) is
+        retried; once text has been shown a mid-stream failure is not retried.
+        """
+        try:
+            first, iterator = resilience.call(c.BACKEND_GEMINI, self._open_stream, request)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            if not request.cached_content:
+                raise
+            self._drop_prompt_cache(request)
+            first, iterator = resilience.call(c.BACKEND_GEMINI, self._open_stream, request)
 
-            # Fallback: candidates/parts API
-            elif hasattr(response, "candidates") and response.candidates:
-                for part in response.candidates[0].content.parts:
-                    if hasattr(part, "text"):
-                        bot_text += part.text
-                bot_text = bot_text.strip()
+        if first is not None:
+            yield first
+            yield from iterator
 
-            else:
-                bot_text = "I'm sorry, I couldn't generate a proper response."
+    def _summarize_with_model(self, summary, turns):
+        """Summarizer for CONTEXT_SUMMARY_MODE = model: one short, non-thinking call."""
+        from google.genai.types import GenerateContentConfig, HttpOptions
 
-            self.session_history[-1]["assistant"] = bot_text
+        response = resilience.call(
+            c.BACKEND_GEMINI, self.client.models.generate_content,
+            model=self.model,
+            contents=c.SUMMARY_PROMPT.format(
+                summary=summary or "(none)",
+                turns=common.build_context_text(turns),
+            ),
+            config=GenerateContentConfig(
+                temperature=0.2,
+                max_output_tokens=c.CONTEXT_SUMMARY_TOKEN_BUDGET,
+                http_options=HttpOptions(timeout=c.GEMINI_TIMEOUT_MS),
+            ),
+        )
+        return (response.text or "").strip()
 
-            # Format output
-            formatted_response = common.format_template(
-                c.FORMATTED_RESPONSE_TEMPLATE,
-                {"question": question, "answer": bot_text}
-            )
+    def _get_cached_answer(self, request):
+        """
+        Returns the cached answer for `request` or None. A hit is recorded in
+        the history and logged to Google Sheet with status Cached.
+        """
+        self.last_cached = False
+        if not request.cache_key:
+            return None
 
-            # Usage stats
-            usage = response.usage_metadata
-            formatted_usage = common.format_template(
-                c.FORMATTED_RESPONSE_USAGE_TEMPLATE,
-                {
-                    "prompt_token": usage.prompt_token_count,
-                    "output_token": usage.candidates_token_count,
-                    "thinking_token": getattr(usage, "thoughts_token_count", 0),
-                    "total_token": usage.total_token_count,
-                }
-            )
+        with metrics.span("cache_lookup", request.timings):
+            bot_text = self.cache.get(request.cache_key)
+        if bot_text is None:
+            metrics.inc(c.METRIC_CACHE_MISSES)
+            return None
+
+        metrics.inc(c.METRIC_CACHE_HITS)
+        self.last_cached = True
+        self.last_thoughts = ""
+        self.session_history.complete(bot_text)
+        self._log_response(request, None, bot_text, None, cached=True)
+        self._record_turn(request, "cached")
+        return bot_text
+
+    def _store_cached_answer(self, request, bot_text):
+        if request.cache_key and bot_text:
+            self.cache.put(request.cache_key, bot_text)
+
+    # =====================================================================
+    # Response Helpers
+    # =====================================================================
+    @staticmethod
+    def _iter_parts(response):
+        """Yields (text, is_thought) for every text part of the first candidate."""
+        candidates = getattr(response, "candidates", None)
+        if not candidates or not candidates[0].content:
+            return
+        for part in candidates[0].content.parts or []:
+            text = getattr(part, "text", None)
+            if text:
+                yield text, bool(getattr(part, "thought", False))
+
+    @staticmethod
+    def _calibrate(request, usage):
+        """Feeds the real prompt token count back into the local estimator."""
+        if usage and getattr(usage, "prompt_token_count", None):
+            token_estimator.calibrate(request.raw_prompt_tokens, usage.prompt_token_count)
+
+    def _budget_exceeded(self, budget_error):
+        """Records a turn refused by the token budget and returns the message to show."""
+        logging.warning(f"⚠ {budget_error}")
+        self.last_error = str(budget_error)
+        metrics.inc(c.METRIC_TURNS, labels={"status": "over_budget"})
+        return c.TOKEN_BUDGET_EXHAUSTED
+
+    @staticmethod
+    def _api_error_message(api_error):
+        if isinstance(api_error, CircuitOpenError):
+            return c.MODEL_UNAVAILABLE
+        return "Sorry, there was an error communicating with the model."
 
-            # Save logs to Google Sheet
-            if self.sheet_data:
+    def _log_api_error(self, request, api_error):
+        """Logs a failed model call to Google Sheet if possible."""
+        self.last_error = str(api_error)
+        metrics.inc(c.METRIC_API_ERRORS, labels={"error": type(api_error).__name__})
+        metrics.inc(c.METRIC_TURNS, labels={"status": "failed"})
+        if not isinstance(api_error, CircuitOpenError):
+            self.router.observe(request.route, (time.perf_counter() - request.started) * 1000, ok=False)
+        if self.sheet_data:
+            try:
+                self.sheet_data.save_question_response(
+                    request.question, request.is_think, request.model,
+                    str(api_error), c.NO_RESPONSE, c.ERROR, c.NA
+                )
+            except Exception as sheet_error:
+                logging.error(f"Error saving API error to Google Sheet: {sheet_error}")
+
+    def _log_response(self, request, response, bot_text, usage, cached=False, sources=None):
+        """
+        Formats the answer, its sources, usage stats and stage timings of
+        `request` and saves them to Google Sheet.
+        """
+        question = request.question
+
+        # Format output
+        formatted_response = common.format_template(
+            c.FORMATTED_RESPONSE_TEMPLATE,
+            {"question": question, "answer": bot_text, "sources": sources or []},
+            max_chars=self.cell_char_limit
+        )
+
+        # Usage stats
+        token_usage = {
+            "prompt_token": c.NA,
+            "output_token": c.NA,
+            "thinking_token": c.NA,
+            "total_token": c.NA,
+        }
+        if usage:
+            token_usage = {
+                "prompt_token": usage.prompt_token_count,
+                "output_token": usage.candidates_token_count,
+                "thinking_token": getattr(usage, "thoughts_token_count", 0),
+                "total_token": usage.total_token_count,
+            }
+        formatted_usage = common.format_template(
+            c.FORMATTED_RESPONSE_USAGE_TEMPLATE,
+            {
+                **token_usage,
+                "latency_ms": round((time.perf_counter() - request.started) * 1000, 1),
+                "route": request.route.to_dict() if request.route else {},
+                "search": request.search.to_dict() if request.search else {},
+                "sources": c.NA if cached else len(sources or []),
+                "budget": request.budget.to_dict() if request.budget else {},
+                "stage_timings_ms": dict(request.timings),
+            },
+            max_chars=self.cell_char_limit
+        )
+
+        # Save logs to Google Sheet
+        if self.sheet_data:
+            with metrics.span("sheet_log"):
                 try:
                     self.sheet_data.save_question_response(
-                        question, is_think, self.model,
+                        question, request.is_think, request.model,
                         response, bot_text,
-                        formatted_response, formatted_usage
+                        formatted_response, formatted_usage,
+                        cached=cached
                     )
                 except Exception as sheet_error:
                     logging.error(f"Error saving to Google Sheet: {sheet_error}")
 
+    def _record_usage(self, request, usage):
+        """Adds the token counts of one response to the token counters and the ledger."""
+        if not usage:
+            return
+        counts = {
+            "prompt": getattr(usage, "prompt_token_count", None),
+            "output": getattr(usage, "candidates_token_count", None),
+            "thinking": getattr(usage, "thoughts_token_count", None),
+            "total": getattr(usage, "total_token_count", None),
+        }
+        for kind, count in counts.items():
+            if count:
+                metrics.inc(c.METRIC_TOKENS, count, {"type": kind})
+        if self.ledger:
+            self.ledger.record(self.session_id, request.model, counts)
+
+    def _record_turn(self, request, status):
+        elapsed_ms = (time.perf_counter() - request.started) * 1000
+        metrics.inc(c.METRIC_TURNS, labels={"status": status})
+        metrics.observe(c.METRIC_TURN_DURATION, elapsed_ms, {"status": status})
+        if status != "cached":
+            self.router.observe(request.route, elapsed_ms, self.last_total_tokens)
+
+    @staticmethod
+    def _extract_answer(response):
+        """Returns (answer_text, thoughts_text) from a complete response."""
+        bot_text = ""
+        thoughts = []
+
+        # Primary modern API: response.text
+        if hasattr(response, "text") and response.text:
+            bot_text = response.text.strip()
+
+        # Fallback: candidates/parts API
+        elif hasattr(response, "candidates") and response.candidates:
+            for text, is_thought in SyncWithMeChatBot._iter_parts(response):
+                if not is_thought:
+                    bot_text += text
+            bot_text = bot_text.strip()
+
+        else:
+            bot_text = "I'm sorry, I couldn't generate a proper response."
+
+        for text, is_thought in SyncWithMeChatBot._iter_parts(response):
+            if is_thought:
+                thoughts.append(text)
+
+        return bot_text, "".join(thoughts).strip()
+
+    def _finish_turn(self, request, response, bot_text, usage, store_cache=True, grounding=None):
+        """
+        Records the answer in history, extracts its sources, calibrates
+        tokens, logs, and caches it. `grounding` overrides the response's
+        grounding metadata (streams carry it on a single chunk).
+        """
+        self.last_total_tokens = getattr(usage, "total_token_count", None) or 0
+        with metrics.span("sources", request.timings):
+            self.last_sources = common.extract_sources(grounding if grounding is not None else response)
+        self.session_history.complete(bot_text, self.last_sources)
+        self._calibrate(request, usage)
+        self._record_usage(request, usage)
+        self._log_response(request, response, bot_text, usage, sources=self.last_sources)
+        if store_cache:
+            self._store_cached_answer(request, bot_text)
+        self._record_turn(request, "received")
+
+    @staticmethod
+    def _mark_chunk(request, stream):
+        """Records the time from the start of the turn to the first streamed chunk."""
+        if stream.last_chunk is None:
+            elapsed_ms = (time.perf_counter() - request.started) * 1000
+            request.timings["first_chunk"] = round(elapsed_ms, 1)
+            metrics.observe(c.METRIC_FIRST_CHUNK, elapsed_ms)
+            request.stream_started = time.perf_counter()
+
+    @staticmethod
+    def _mark_stream_end(request):
+        """Records the time from the first chunk to the end of the stream."""
+        if request.stream_started is not None:
+            elapsed_ms = (time.perf_counter() - request.stream_started) * 1000
+            request.timings["model_stream"] = round(elapsed_ms, 1)
+            metrics.observe(c.METRIC_STAGE_DURATION, elapsed_ms, {"stage": "model_stream"})
+
+    def _finish_stream(self, request, stream):
+        """
+        Completes a streamed turn. Returns a fallback text to yield when the
+        stream produced no answer, otherwise None.
+        """
+        self.last_thoughts = "".join(stream.thoughts).strip()
+        bot_text = "".join(stream.answer_parts).strip()
+
+        fallback = None
+        if not bot_text:
+            stream.complete = False
+            bot_text = fallback = "I'm sorry, I couldn't generate a proper response."
+
+        try:
+            self._finish_turn(
+                request, stream.last_chunk, bot_text, stream.usage,
+                stream.complete, stream.grounding
+            )
+        except Exception as e:
+            logging.error(f"Error processing streamed response: {e}", exc_info=True)
+
+        return fallback
+
+    # =====================================================================
+    # Generate Chatbot Response
+    # =====================================================================
+    def get_gemini_text_response(self, question, thinking_mode=False, use_cache=True):
+        """
+        Sends a question to Gemini model and returns the chatbot response.
+        Saves response logs to Google Sheets when available.
+        Pass use_cache=False to skip the response cache for this question.
+        """
+        try:
+            request = self._prepare_request(question, thinking_mode, use_cache)
+        except TokenBudgetExceeded as budget_error:
+            return self._budget_exceeded(budget_error)
+
+        cached_text = self._get_cached_answer(request)
+        if cached_text is not None:
+            return cached_text
+
+        # API CALL
+        try:
+            with metrics.span("model_call", request.timings):
+                response = self._generate_content(request)
+        except Exception as api_error:
+            logging.error(f"Error calling generate_content API: {api_error}", exc_info=True)
+            self._log_api_error(request, api_error)
+            return self._api_error_message(api_error)
+
+        # EXTRACT TEXT
+        try:
+            with metrics.span("extract", request.timings):
+                bot_text, self.last_thoughts = self._extract_answer(response)
+            self._finish_turn(request, response, bot_text, response.usage_metadata)
             return bot_text or "I'm sorry, I couldn't generate a response."
 
         except Exception as e:
             logging.error(f"Error processing model response: {e}", exc_info=True)
             return "Sorry, something went wrong while processing the response."
 
+    # =====================================================================
+    # Stream Chatbot Response
+    # =====================================================================
+    def stream_gemini_text_response(self, question, thinking_mode=False, use_cache=True):
+        """
+        Streams the chatbot response as text chunks using generate_content_stream.
+        Thought parts are not yielded; they are collected in `self.last_thoughts`,
+        and grounding sources end up in `self.last_sources` once the stream ends.
+        Usage metadata comes from the final chunk and the log row is saved
+        once the stream is complete. A cache hit is yielded as a single chunk.
+        """
+        try:
+            request = self._prepare_request(question, thinking_mode, use_cache)
+        except TokenBudgetExceeded as budget_error:
+            yield self._budget_exceeded(budget_error)
+            return
+
+        cached_text = self._get_cached_answer(request)
+        if cached_text is not None:
+            yield cached_text
+            return
+
+        self.last_thoughts = ""
+        stream = StreamAccumulator()
+
+        try:
+            for chunk in self._generate_content_stream(request):
+                self._mark_chunk(request, stream)
+                yield from stream.add(chunk)
+            stream.complete = True
+            self._mark_stream_end(request)
+
+        except Exception as api_error:
+            logging.error(f"Error calling generate_content_stream API: {api_error}", exc_info=True)
+            self._log_api_error(request, api_error)
+            if not stream.answer_parts:
+                yield self._api_error_message(api_error)
+                return
+
+        fallback = self._finish_stream(request, stream)
+        if fallback:
+            yield fallback
+
+    # =====================================================================
+    # Async API (client.aio)
+    # =====================================================================
+    def _acall_model(self, request):
+        return resilience.acall(
+            c.BACKEND_GEMINI, self.client.aio.models.generate_content,
+            model=request.model,
+            contents=request.contents,
+            config=request.generate_config,
+        )
+
+    async def _aopen_stream(self, request):
+        stream = await self.client.aio.models.generate_content_stream(
+            model=request.model,
+            contents=request.contents,
+            config=request.generate_config,
+        )
+        iterator = stream.__aiter__()
+        try:
+            first = await iterator.__anext__()
+        except StopAsyncIteration:
+            first = None
+        return first, iterator
+
+    async def _agenerate_content(self, request):
+        try:
+            return await self._acall_model(request)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            if not request.cached_content:
+                raise
+            await asyncio.to_thread(self._drop_prompt_cache, request)
+            return await self._acall_model(request)
+
+    async def _agenerate_content_stream(self, request):
+        try:
+            first, iterator = await resilience.acall(c.BACKEND_GEMINI, self._aopen_stream, request)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            if not request.cached_content:
+                raise
+            await asyncio.to_thread(self._drop_prompt_cache, request)
+            first, iterator = await resilience.acall(c.BACKEND_GEMINI, self._aopen_stream, request)
+
+        if first is not None:
+            yield first
+            async for chunk in iterator:
+                yield chunk
+
+    async def aget_gemini_text_response(self, question, thinking_mode=False, use_cache=True, before_model_call=None):
+        """
+        Async counterpart of get_gemini_text_response built on client.aio.
+        Blocking work (prompt cache, response cache, sheet logging) runs in a
+        worker thread so the event loop keeps serving other conversations.
+        Turns of one conversation must be awaited one after another.
+        `before_model_call` is awaited on a cache miss, right before the API
+        call (e.g. to wait for rate limiter capacity).
+        """
+        try:
+            request = await asyncio.to_thread(self._prepare_request, question, thinking_mode, use_cache)
+        except TokenBudgetExceeded as budget_error:
+            return self._budget_exceeded(budget_error)
+
+        cached_text = await asyncio.to_thread(self._get_cached_answer, request)
+        if cached_text is not None:
+            return cached_text
+
+        if before_model_call:
+            await before_model_call()
+
+        # API CALL
+        try:
+            with metrics.span("model_call", request.timings):
+                response = await self._agenerate_content(request)
+        except Exception as api_error:
+            logging.error(f"Error calling async generate_content API: {api_error}", exc_info=True)
+            await asyncio.to_thread(self._log_api_error, request, api_error)
+            return self._api_error_message(api_error)
+
+        # EXTRACT TEXT
+        try:
+            with metrics.span("extract", request.timings):
+                bot_text, self.last_thoughts = self._extract_answer(response)
+            await asyncio.to_thread(
+                self._finish_turn, request, response, bot_text, response.usage_metadata
+            )
+            return bot_text or "I'm sorry, I couldn't generate a response."
+
+        except Exception as e:
+            logging.error(f"Error processing model response: {e}", exc_info=True)
+            return "Sorry, something went wrong while processing the response."
+
+    async def astream_gemini_text_response(self, question, thinking_mode=False, use_cache=True):
+        """Async counterpart of stream_gemini_text_response; yields answer text chunks."""
+        try:
+            request = await asyncio.to_thread(self._prepare_request, question, thinking_mode, use_cache)
+        except TokenBudgetExceeded as budget_error:
+            yield self._budget_exceeded(budget_error)
+            return
+
+        cached_text = await asyncio.to_thread(self._get_cached_answer, request)
+        if cached_text is not None:
+            yield cached_text
+            return
+
+        self.last_thoughts = ""
+        stream = StreamAccumulator()
+
+        try:
+            async for chunk in self._agenerate_content_stream(request):
+                self._mark_chunk(request, stream)
+                for text in stream.add(chunk):
+                    yield text
+            stream.complete = True
+            self._mark_stream_end(request)
+
+        except Exception as api_error:
+            logging.error(f"Error calling async generate_content_stream API: {api_error}", exc_info=True)
+            await asyncio.to_thread(self._log_api_error, request, api_error)
+            if not stream.answer_parts:
+                yield self._api_error_message(api_error)
+                return
+
+        fallback = await asyncio.to_thread(self._finish_stream, request, stream)
+        if fallback:
+            yield fallback
+
     # =====================================================================
     # UTILITY FUNCTIONS
     # =====================================================================
     def run_chatbot(self):
         print(f"Welcome to SyncWithMe ChatBot! Using model: {self.model}")
+        print(f"Type {c.METRICS_COMMAND} to show latency and usage metrics, "
+              f"{c.ROUTER_COMMAND} to show the last routing decision, "
+              f"{c.USAGE_COMMAND} to show token usage and budgets.")
         while True:
             user_input = input("You: ")
             if user_input.lower() in ["exit", "quit", "q", "x"]:
                 break
-            print("Bot:", self.get_gemini_text_response(user_input))
+            if user_input.strip().lower() == c.METRICS_COMMAND:
+                print(metrics.to_json())
+                continue
+            if user_input.strip().lower() == c.ROUTER_COMMAND:
+                print(self.route_report())
+                continue
+            if user_input.strip().lower() == c.USAGE_COMMAND:
+                print(json.dumps(self.usage_summary(), indent=2, ensure_ascii=False))
+                continue
+            print("Bot: ", end="", flush=True)
+            for chunk in self.stream_gemini_text_response(user_input):
+                print(chunk, end="", flush=True)
+            print()
 
     def get_history(self):
         """Returns conversation history."""
         return self.session_history
 
     def clear_history(self):
-        """Clears conversation history."""
-        self.session_history = []
+        """Clears conversation history (starts a new session id)."""
+        self.session_history.clear()
+        self.context_window.reset()
+
+    @property
+    def session_id(self):
+        return self.session_history.session_id
+
+    def route_report(self):
+        """Last routing decision and the observed per-model stats, as JSON."""
+        decision = self.router.last_decision
+        return json.dumps({
+            "policy": self.router.policy,
+            "last_route": decision.to_dict() if decision else None,
+            "models": self.router.stats.snapshot(),
+        }, indent=2, ensure_ascii=False)
+
+    def usage_summary(self):
+        """Token usage of this session and the whole process against the budgets."""
+        if not self.ledger:
+            return {"enabled": False}
+        return self.ledger.summary(self.session_id)
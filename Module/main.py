@@ -1,11 +1,109 @@
-from google import genai
+import argparse
+import asyncio
+import json
+
+from Common.Common_Functions import CommonFunctions as common
 from Common.Config_Loader import config
-from Common.Sheet_Functions import SheetClass as sc
-from .SyncWithMeChatBot import SyncWithMeChatBot
+from Common.Metrics import metrics
+from Common.Shared_Resources import shared
+from Common import Constant as c
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SyncWithMe ChatBot")
+    parser.add_argument("--batch", metavar="INPUT", help="run questions from a JSONL/CSV file instead of chatting")
+    parser.add_argument("--output", help="JSONL file results are appended to (default: INPUT.results.jsonl)")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument("--concurrency", type=int, help="questions in flight at once")
+    parser.add_argument("--rpm", type=int, help="max requests per minute (0 = unlimited)")
+    parser.add_argument("--tpm", type=int, help="max tokens per minute (0 = unlimited)")
+    parser.add_argument("--no-cache", action="store_true", help="always call the model")
+    parser.add_argument("--metrics-out", metavar="PATH", help="write metrics on exit (.prom/.txt = Prometheus text, else JSON)")
+    parser.add_argument("--log-report", action="store_true", help="print top questions, latency/token percentiles, error rates and grounding rate from the SQLite log")
+    parser.add_argument("--usage-report", action="store_true", help="print token usage per model and top sessions from the token ledger")
+    parser.add_argument("--window", type=float, help="only report the last WINDOW hours (with --log-report / --usage-report)")
+    parser.add_argument("--fit-search-weights", metavar="PATH", help="fit the search classifier on the SQLite log and write its weights as JSON")
+    return parser.parse_args()
+
+
+def print_log_report(args):
+    from Common.Log_Query import LogQuery
+
+    query = LogQuery(shared.log_db_path())
+    try:
+        window = args.window * 3600 if args.window else None
+        print(json.dumps(query.report(window=window), indent=2, ensure_ascii=False))
+    finally:
+        query.close()
+
+
+def print_usage_report(args):
+    from Common.Token_Ledger import get_token_ledger
+
+    ledger = get_token_ledger()
+    if ledger is None:
+        print("❌ Token ledger is disabled (TOKEN_LEDGER_ENABLED = false)")
+        return
+    window = args.window * 3600 if args.window else None
+    print(json.dumps(ledger.report(window=window), indent=2, ensure_ascii=False))
+
+
+def write_search_weights(args):
+    from .Search_Classifier import SearchClassifier, fit_weights, samples_from_log
+
+    samples = samples_from_log(shared.log_db_path())
+    weights = fit_weights(SearchClassifier(), samples)
+    with open(args.fit_search_weights, "w", encoding="utf-8") as f:
+        json.dump(weights, f, indent=2)
+    print(json.dumps(weights, indent=2))
+    print(f"✅ Search weights fitted on {weights['samples']} turn(s) written to {args.fit_search_weights}")
+
+
+def run_batch(args, client, gemini_model, sheet):
+    from .Batch_Runner import BatchRunner
+    from .SyncWithMeChatBot import SyncWithMeChatBot
+
+    runner = BatchRunner(
+        lambda: SyncWithMeChatBot(client, gemini_model, sheet),
+        concurrency=args.concurrency or common.to_int(
+            config.fetch_optional_value("BATCH_CONCURRENCY"), c.BATCH_CONCURRENCY
+        ),
+        requests_per_minute=args.rpm if args.rpm is not None else common.to_int(
+            config.fetch_optional_value("BATCH_REQUESTS_PER_MINUTE"), c.BATCH_REQUESTS_PER_MINUTE
+        ),
+        tokens_per_minute=args.tpm if args.tpm is not None else common.to_int(
+            config.fetch_optional_value("BATCH_TOKENS_PER_MINUTE"), c.BATCH_TOKENS_PER_MINUTE
+        ),
+        use_cache=not args.no_cache,
+    )
+    output = args.output or args.batch.rsplit(".", 1)[0] + ".results.jsonl"
+    asyncio.run(runner.run(args.batch, output, args.checkpoint))
+
 
 if __name__ == "__main__":
-    sheet = sc()
-    client = config.get_client()
+    args = parse_args()
+    if args.log_report:
+        print_log_report(args)
+        raise SystemExit(0)
+    if args.usage_report:
+        print_usage_report(args)
+        raise SystemExit(0)
+    if args.fit_search_weights:
+        write_search_weights(args)
+        raise SystemExit(0)
+
+    sheet = shared.get_log_sink()
+    client = shared.get_gemini_client()
     gemini_model = config.get_model("GEMINI_2_5_FLASH")
-    chatbot = SyncWithMeChatBot(client, gemini_model, sheet)
-    chatbot.run_chatbot()
\ No newline at end of file
+    try:
+        if args.batch:
+            run_batch(args, client, gemini_model, sheet)
+        else:
+            from .SyncWithMeChatBot import SyncWithMeChatBot
+
+            chatbot = SyncWithMeChatBot(client, gemini_model, sheet)
+            chatbot.run_chatbot()
+    finally:
+        shared.close()
+        if args.metrics_out:
+            metrics.write(args.metrics_out)
@@ -2,6 +2,8 @@ import streamlit as st
 import sys
 import os
 import html
+import io
+from urllib.parse import quote
 
 # Path setup for page_icon to use
 CURRENT_FILE = os.path.abspath(__file__)
@@ -26,43 +28,66 @@ st.set_page_config(
 # import project modules
 from Common.Config_Loader import config
 from Module.SyncWithMeChatBot import SyncWithMeChatBot
-from Common.Sheet_Functions import SheetClass as sc
+from Common.Shared_Resources import shared
+from Common.Common_Functions import CommonFunctions as common
+from Common.Metrics import metrics
 from Common import Constant as c
 from PIL import Image
 
-# Load external CSS
-def load_css(file_path):
-    if os.path.exists(file_path):
-        with open(file_path) as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-    else:
-        st.warning(f"CSS file not found at {file_path}")
+# Static assets — read once per process, not on every rerun
+@st.cache_data(show_spinner=False)
+def load_css_text(file_path):
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path) as f:
+        return f"<style>{f.read()}</style>"
 
-load_css(css_path)
+@st.cache_data(show_spinner=False)
+def load_logo_bytes(file_path, size=(120, 120)):
+    if not os.path.exists(file_path):
+        return None
+    buffer = io.BytesIO()
+    Image.open(file_path).resize(size).save(buffer, format="PNG")
+    return buffer.getvalue()
 
-# About button
-header_left, header_right = st.columns([9, 4])
-with header_right:
-    blog_url = config.fetch_key_value("BLOG_LINK")
-    st.markdown(
-        f'''
+@st.cache_data(show_spinner=False)
+def load_avatars():
+    return {
+        "assistant": assistant_path if os.path.exists(assistant_path) else None,
+        "user": user_path if os.path.exists(user_path) else None,
+    }
+
+@st.cache_data(show_spinner=False)
+def about_button_html(blog_url):
+    return f'''
         <div class="sync-btn">
-            <a class="sync-link" href="{blog_url}" target="_blank" rel="noreferrer">
+            <a class="sync-link" href="{html.escape(blog_url or "")}" target="_blank" rel="noreferrer">
                 <span class="icon">ℹ️</span> About SyncWithMe
             </a>
         </div>
-        ''',
-        unsafe_allow_html=True
-    )
+        '''
+
+# Load external CSS
+css_text = load_css_text(css_path)
+if css_text:
+    st.markdown(css_text, unsafe_allow_html=True)
+else:
+    st.warning(f"CSS file not found at {css_path}")
+
+avatars = load_avatars()
+
+# About button
+header_left, header_right = st.columns([9, 4])
+with header_right:
+    st.markdown(about_button_html(config.fetch_optional_value("BLOG_LINK")), unsafe_allow_html=True)
 
 # Header details (logo + title)
 col1, col2 = st.columns([1, 4])
 
 with col1:
-    if os.path.exists(img_path):
-        img = Image.open(img_path)
-        img = img.resize((120, 120))
-        st.image(img)
+    logo = load_logo_bytes(img_path)
+    if logo:
+        st.image(logo)
     else:
         st.warning(f"Image not found at {img_path}")
 
@@ -71,30 +96,67 @@ with col2:
     st.caption("Your personal assistant to sync with the world 🌏 — powered by Gemini 💠")
 
 
-# Initialize chatbot and sheet handler
+# Initialize chatbot — client and sheet are shared by every session in this process.
+# The session id lives in the URL, so a reconnect resumes the same conversation.
 if "chatbot" not in st.session_state:
-    try:
-        sheet = sc()
-    except Exception as e:
-        st.error(f"Google Sheet error: {e}")
-        sheet = None
+    sheet = shared.get_log_sink()
+    if sheet is None:
+        st.error("Logging is unavailable, see server logs.")
 
-    client = config.get_client()
+    client = shared.get_gemini_client()
     model_name = config.get_model("GEMINI_2_5_FLASH")
 
     st.session_state["chatbot"] = SyncWithMeChatBot(
         client=client,
         model=model_name,
-        sheet=sheet
+        sheet=sheet,
+        session_id=st.query_params.get("session")
     )
 
 chatbot = st.session_state["chatbot"]
+history = chatbot.session_history
+if st.query_params.get("session") != chatbot.session_id:
+    st.query_params["session"] = chatbot.session_id
 
-# Initialize chat messages
-if "messages" not in st.session_state:
-    st.session_state["messages"] = [
-        {"role": "assistant", "content": "How can I help you?"}
-    ]
+GREETING = "How can I help you?"
+
+# Only the newest messages are rendered; older ones are paged in from the session store
+message_window_size = common.to_int(config.fetch_optional_value("UI_MESSAGE_WINDOW"), c.UI_MESSAGE_WINDOW)
+history_window_size = common.to_int(config.fetch_optional_value("UI_HISTORY_WINDOW"), c.UI_HISTORY_WINDOW)
+if "message_window" not in st.session_state:
+    st.session_state["message_window"] = message_window_size
+
+def show_older_messages():
+    st.session_state["message_window"] += message_window_size
+
+# Rendered pieces are built once per turn and kept on the in-memory turn
+def history_item_html(index, turn):
+    if "history_html" not in turn:
+        full_message_clean = turn["user"].replace("\n", " ").replace("\r", " ")
+        limit = c.UI_HISTORY_PREVIEW_CHARS
+        preview = full_message_clean[:limit] + ("..." if len(full_message_clean) > limit else "")
+        turn["history_html"] = f"""
+            <div class="history-btn"
+                title='{html.escape(full_message_clean)}'
+                style="cursor:pointer;"
+                onclick="window.parent.postMessage({{'history_click': {index}}}, '*');">
+                {html.escape(preview)}
+            </div>
+            """
+    return turn["history_html"]
+
+def sources_markdown(turn):
+    if "sources_md" not in turn:
+        links = []
+        for source in turn.get("sources") or []:
+            # brackets in the title would end the link text early
+            title = html.escape(source["title"]).replace("[", "\\[").replace("]", "\\]")
+            hint = f" — {html.escape(source['domain'])}" if source.get("domain") else ""
+            # spaces, parentheses and brackets in the URL would end the link target early
+            url = quote(source["url"], safe=":/?&=%#+;,@!$*~")
+            links.append(f"[{source['index']}] [{title}]({url}){hint}")
+        turn["sources_md"] = "Sources:  \n" + "  \n".join(links) if links else ""
+    return turn["sources_md"]
 
 # Sidebar
 with st.sidebar:
@@ -106,66 +168,135 @@ with st.sidebar:
     )
     thinking_mode = options[thinking_mode_label]
 
+    # Optional latency / usage panel
+    if common.to_bool(config.fetch_optional_value("METRICS_PANEL"), c.METRICS_PANEL_ENABLED):
+        with st.expander("Metrics 📊"):
+            snapshot = metrics.snapshot()
+            stage_prefix = c.METRIC_STAGE_DURATION + "{"
+            stages = {
+                name[len(stage_prefix):-1].split("=", 1)[1].strip('"'): hist
+                for name, hist in snapshot["histograms"].items()
+                if name.startswith(stage_prefix)
+            }
+            if stages:
+                st.table({
+                    "stage": list(stages),
+                    "count": [hist["count"] for hist in stages.values()],
+                    "avg ms": [hist["avg"] for hist in stages.values()],
+                    "p95 ms": [hist["p95"] for hist in stages.values()],
+                })
+            st.json(snapshot["counters"], expanded=False)
+            st.json(snapshot["circuit_breakers"], expanded=False)
+            st.json(chatbot.route_report(), expanded=False)
+            st.download_button("Download JSON", metrics.to_json(), "metrics.json", "application/json")
+            st.download_button("Download Prometheus", metrics.to_prometheus(), "metrics.prom", "text/plain")
+
+    # Token usage of this session and the whole app against the budgets
+    if chatbot.ledger:
+        with st.expander("Token usage 🪙"):
+            usage = chatbot.usage_summary()
+            for scope in ("session", "global"):
+                scope_usage = usage.get(scope)
+                if scope_usage and scope_usage["budget"]:
+                    used = scope_usage["used"]["total"]
+                    st.progress(
+                        min(1.0, used / scope_usage["budget"]),
+                        text=f"{scope.title()}: {used:,} / {scope_usage['budget']:,} tokens",
+                    )
+            st.caption(f"Budget level: {usage['level']}")
+            st.json(usage, expanded=False)
+
     st.markdown("---")
     st.header("Chat History 🕒")
 
-    for i, msg in enumerate(st.session_state["messages"]):
-        if msg["role"] == "user":
-            full_message = msg["content"]
-            full_message_clean = full_message.replace("\n", " ").replace("\r", " ")
-            safe_full = html.escape(full_message_clean)
-            preview = full_message_clean[:30] + ("..." if len(full_message_clean) > 30 else "")
+    # Newest questions only, so the cost does not grow with the session
+    first_listed = max(0, len(history) - history_window_size)
+    items = [
+        history_item_html(first_listed + offset, turn)
+        for offset, turn in enumerate(history[first_listed:])
+    ]
+    if items:
+        st.markdown("".join(items), unsafe_allow_html=True)
 
-            html_code = f"""
-            <div class="history-btn"
-                title='{safe_full}'
-                style="cursor:pointer;"
-                onclick="window.parent.postMessage({{'history_click': {i}}}, '*');">
-                {preview}
-            </div>
-            """
-            st.markdown(html_code, unsafe_allow_html=True)
+# Citations for a grounded answer, already extracted by the chatbot
+def render_sources(turn):
+    text = sources_markdown(turn)
+    if text:
+        st.caption(text)
 
-# Display chat messages
-for msg in st.session_state["messages"]:
-    avatar = assistant_path if msg["role"] == "assistant" else user_path
-    avatar = avatar if os.path.exists(avatar) else None
+# Display chat messages (two per turn after the greeting)
+turns_shown = max(1, st.session_state["message_window"] // 2)
+first_shown = max(0, len(history) - turns_shown)
+if first_shown:
+    st.button(
+        f"Show older messages ({first_shown * 2} hidden)",
+        on_click=show_older_messages,
+    )
+else:
+    with st.chat_message("assistant", avatar=avatars["assistant"]):
+        st.write(GREETING)
 
-    st.chat_message(msg["role"], avatar=avatar).write(msg["content"])
+for turn in history[first_shown:]:
+    with st.chat_message("user", avatar=avatars["user"]):
+        st.write(turn["user"])
+    with st.chat_message("assistant", avatar=avatars["assistant"]):
+        st.write(turn["assistant"])
+        render_sources(turn)
 
-# Chat Input
+# Chat Input — the callback runs before the rerun it triggers, so the new
+# question is already in the history and the input is disabled in that same run
 if "is_processing" not in st.session_state:
     st.session_state["is_processing"] = False
 
-prompt = st.chat_input(
+def queue_prompt():
+    prompt = st.session_state.get("chat_prompt")
+    if prompt and not st.session_state["is_processing"]:
+        st.session_state["pending_prompt"] = prompt
+        st.session_state["is_processing"] = True
+        st.session_state["message_window"] = message_window_size
+
+st.chat_input(
     "Ask anything…",
+    key="chat_prompt",
+    on_submit=queue_prompt,
     disabled=st.session_state["is_processing"]
 )
 
-# Handle user prompt
-if prompt and not st.session_state["is_processing"]:
-    st.session_state["messages"].append({"role": "user", "content": prompt})
-    st.session_state["is_processing"] = True
-    st.rerun()
-
 # Generate assistant response
+def stream_with_spinner(stream, spinner_text):
+    """Shows the spinner only until the first chunk arrives, then streams the rest."""
+    with st.spinner(spinner_text):
+        first_chunk = next(stream, "")
+    yield first_chunk
+    yield from stream
+
 if st.session_state["is_processing"]:
-    user_message = st.session_state["messages"][-1]["content"]
+    user_message = st.session_state["pending_prompt"]
     spinner_text = c.THINKING if thinking_mode else c.GENERATING
-
-    with st.spinner(spinner_text):
+    with st.chat_message("user", avatar=avatars["user"]):
+        st.write(user_message)
+    with st.chat_message("assistant", avatar=avatars["assistant"]):
+        sources = []
         try:
-            response_text = chatbot.get_gemini_text_response(
-                user_message,
-                thinking_mode
+            response_text = st.write_stream(
+                stream_with_spinner(
+                    chatbot.stream_gemini_text_response(user_message, thinking_mode),
+                    spinner_text
+                )
             )
+            sources = chatbot.last_sources
+            render_sources({"sources": sources})
         except Exception as e:
             response_text = f"Error: {str(e)}"
+            st.write(response_text)
 
-    st.session_state["messages"].append({
-        "role": "assistant",
-        "content": response_text
-    })
+    # The chatbot records the turn; make sure a failed one still shows its error
+    last_turn = history[-1] if history else None
+    if last_turn is None or last_turn["user"] != user_message:
+        history.append({"user": user_message, "assistant": response_text, "sources": sources})
+    elif not last_turn["assistant"]:
+        history.complete(response_text, sources)
 
+    # One rerun per turn, only to re-enable the input
     st.session_state["is_processing"] = False
     st.rerun()
@@ -0,0 +1,98 @@
+import unittest
+
+from Module.Context_Window import ContextWindow
+
+
+class WordEstimator:
+    """One token per word, so budgets in the tests are easy to count."""
+
+    def estimate(self, text):
+        return len(str(text or "").split())
+
+
+def make_history(turns):
+    history = [
+        {"user": f"question {index} words here", "assistant": f"Answer {index} first. More detail follows."}
+        for index in range(turns)
+    ]
+    history.append({"user": "current question", "assistant": ""})
+    return history
+
+
+class ContextWindowTest(unittest.TestCase):
+    """Newest turns stay verbatim; older ones are folded into the rolling summary once."""
+
+    def setUp(self):
+        # each finished turn costs 4 + 6 = 10 tokens, the current one 2
+        self.window = ContextWindow(token_budget=50, summary_budget=20, estimator=WordEstimator())
+
+    def test_short_history_is_sent_verbatim(self):
+        history = make_history(2)
+
+        summary, recent = self.window.build(history)
+
+        self.assertEqual(summary, "")
+        self.assertEqual(recent, history)
+
+    def test_overflow_folds_oldest_turns_into_summary(self):
+        history = make_history(6)
+
+        summary, recent = self.window.build(history)
+
+        # 30 tokens for recent turns: the current turn plus the two newest
+        self.assertEqual(recent, history[4:])
+        self.assertEqual(self.window.summarized_count, 4)
+        self.assertIn("- User asked: question 3 words here | Assistant: Answer 3 first.", summary)
+        self.assertNotIn("More detail", summary)
+
+    def test_summary_is_trimmed_to_its_budget(self):
+        summary, _ = self.window.build(make_history(6))
+
+        self.assertLessEqual(WordEstimator().estimate(summary), 20)
+        self.assertNotIn("question 0", summary)
+
+    def test_each_turn_is_folded_once(self):
+        folded = []
+
+        def summarizer(summary, turns):
+            folded.extend(turn["user"] for turn in turns)
+            return f"{summary} +{len(turns)}".strip()
+
+        self.window.summarizer = summarizer
+        history = make_history(6)
+        self.window.build(history)
+
+        history[-1]["assistant"] = "a ten word answer that pushes one more turn out"
+        history.append({"user": "next question", "assistant": ""})
+        summary, recent = self.window.build(history)
+
+        self.assertEqual(len(folded), len(set(folded)))
+        self.assertEqual(folded, [turn["user"] for turn in history[:self.window.summarized_count]])
+        self.assertEqual(summary, "+4 +1")
+        self.assertEqual(recent[-1]["user"], "next question")
+
+    def test_failing_summarizer_falls_back_to_extractive_summary(self):
+        def summarizer(summary, turns):
+            raise RuntimeError("model unavailable")
+
+        self.window.summarizer = summarizer
+        summary, _ = self.window.build(make_history(6))
+
+        self.assertIn("- User asked:", summary)
+
+    def test_budget_override_narrows_the_window(self):
+        history = make_history(6)
+
+        _, recent = self.window.build(history, token_budget=32)
+
+        self.assertEqual(recent, history[5:])
+
+    def test_reset_starts_a_new_summary(self):
+        self.window.build(make_history(6))
+        self.window.reset()
+
+        self.assertEqual((self.window.summary, self.window.summarized_count), ("", 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
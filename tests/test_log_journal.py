@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+
+from Common.Log_Journal import JournalReplayer, LogJournal
+
+
+def make_row(text, record_id):
+    return [None, text] + [None] * 7 + [record_id]
+
+
+class FakeSheet:
+    """Appends rows like the sheet does; `land_then_fail` makes the next write land but raise."""
+
+    def __init__(self):
+        self.rows = []
+        self.land_then_fail = 0
+        self.find_calls = []
+
+    def write(self, rows):
+        if any(row[1] == "bad" for row in rows):
+            raise ValueError("invalid value")
+        first = len(self.rows) + 1
+        self.rows.extend(rows)
+        if self.land_then_fail:
+            self.land_then_fail -= 1
+            raise ConnectionError("connection reset after write")
+        return first, len(self.rows)
+
+    def find(self, record_ids, after_row=None):
+        self.find_calls.append(after_row)
+        below = self.rows[after_row:] if after_row else self.rows
+        return {row[9] for row in below} & set(record_ids)
+
+    def texts(self):
+        return [row[1] for row in self.rows]
+
+
+class JournalReplayerTest(unittest.TestCase):
+    """Replays are idempotent by record id and a rejected row does not hold back the rest."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "journal.db")
+        self.journal = LogJournal(self.db_path)
+        self.sheet = FakeSheet()
+        self.replayers = []
+
+    def tearDown(self):
+        for replayer in self.replayers:
+            replayer.close(1)
+        self.journal.close()
+        self.tmp.cleanup()
+
+    def start(self, journal=None):
+        replayer = JournalReplayer(
+            journal or self.journal, self.sheet.write, self.sheet.find,
+            batch_size=10, flush_interval=60, retry_delay=0.01,
+        )
+        self.replayers.append(replayer)
+        return replayer
+
+    def test_duplicate_append_is_ignored(self):
+        self.journal.append("id0", make_row("a", "id0"))
+        self.journal.append("id0", make_row("a again", "id0"))
+
+        self.assertEqual(self.journal.pending_count(), 1)
+        self.assertEqual(self.journal.pending(10)[0][1][1], "a")
+
+    def test_write_that_landed_before_failing_is_not_resent(self):
+        replayer = self.start()
+        replayer.enqueue(make_row("a", "id0"))
+        self.assertTrue(replayer.flush(2))
+
+        self.sheet.land_then_fail = 1
+        replayer.enqueue(make_row("b", "id1"))
+        replayer.enqueue(make_row("c", "id2"))
+
+        self.assertTrue(replayer.flush(2))
+        self.assertEqual(self.sheet.texts(), ["a", "b", "c"])
+        self.assertEqual(self.sheet.find_calls, [1])
+        self.assertEqual(self.journal.stats(), {"pending": 0, "sent": 3, "failed": 0})
+
+    def test_restart_reconciles_rows_written_before_the_crash(self):
+        for index, text in enumerate(["a", "b"]):
+            self.journal.append(f"id{index}", make_row(text, f"id{index}"))
+        # the previous process wrote "a" but died before marking it sent
+        self.sheet.rows.append(make_row("a", "id0"))
+
+        replayer = self.start()
+
+        self.assertTrue(replayer.flush(2))
+        self.assertEqual(self.sheet.texts(), ["a", "b"])
+        self.assertEqual(self.sheet.find_calls, [None])
+
+    def test_rejected_row_is_parked_and_others_are_sent(self):
+        replayer = self.start()
+        for index, text in enumerate(["a", "bad", "b"]):
+            replayer.enqueue(make_row(text, f"id{index}"))
+
+        self.assertTrue(replayer.flush(2))
+        self.assertEqual(self.sheet.texts(), ["a", "b"])
+        self.assertEqual(self.journal.stats(), {"pending": 0, "sent": 2, "failed": 1})
+
+        self.assertEqual(self.journal.requeue_failed(), 1)
+        self.assertEqual(self.journal.pending(10)[0][0], "id1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+
+from Common import Constant as c
+from Module.Model_Router import ModelRouter, ModelStats
+
+FAST = "gemini-2.5-flash-lite"
+DEFAULT = "gemini-2.5-flash"
+DEEP = "gemini-2.5-pro"
+
+HARD_QUESTION = (
+    "Explain step by step why quicksort is O(n log n) on average and compare it with mergesort? "
+    "Also how does it behave on sorted input?"
+)
+PLAIN_QUESTION = "why is the sky blue during the day"
+
+
+class ModelRouterTest(unittest.TestCase):
+    """Cheap questions go to the fast tier, hard ones get the deep model and a scaled budget."""
+
+    def make_router(self, **kwargs):
+        kwargs.setdefault("fast_model", FAST)
+        kwargs.setdefault("deep_model", DEEP)
+        return ModelRouter(DEFAULT, stats=ModelStats(), **kwargs)
+
+    def test_greeting_goes_to_fast_tier_with_model_default_thinking(self):
+        decision = self.make_router().route("hi")
+
+        self.assertEqual((decision.tier, decision.model), (c.ROUTER_TIER_FAST, FAST))
+        self.assertIsNone(decision.thinking_budget)
+        self.assertFalse(decision.is_think)
+
+    def test_plain_question_keeps_model_default_thinking(self):
+        decision = self.make_router().route(PLAIN_QUESTION)
+
+        self.assertEqual(decision.tier, c.ROUTER_TIER_DEFAULT)
+        self.assertIsNone(decision.thinking_budget)
+
+    def test_configured_tier_budget_applies_below_think_threshold(self):
+        router = self.make_router(tier_budgets={c.ROUTER_TIER_DEFAULT: 0})
+
+        self.assertEqual(router.route(PLAIN_QUESTION).thinking_budget, 0)
+
+    def test_hard_question_goes_deep_with_scaled_budget(self):
+        decision = self.make_router().route(HARD_QUESTION)
+
+        self.assertEqual((decision.tier, decision.model), (c.ROUTER_TIER_DEEP, DEEP))
+        self.assertGreaterEqual(decision.score, c.ROUTER_DEEP_THRESHOLD)
+        self.assertGreater(decision.thinking_budget, c.MODEL_THINKING_BUDGET)
+        self.assertLessEqual(decision.thinking_budget, c.ROUTER_THINKING_BUDGET_MAX)
+        self.assertEqual(decision.thinking_budget % 64, 0)
+
+    def test_thinking_mode_never_gets_less_than_the_fixed_budget(self):
+        decision = self.make_router().route("hi", thinking_mode=True)
+
+        self.assertNotEqual(decision.tier, c.ROUTER_TIER_FAST)
+        self.assertGreaterEqual(decision.thinking_budget, c.MODEL_THINKING_BUDGET)
+
+    def test_missing_tier_models_fall_back_to_default(self):
+        router = ModelRouter(DEFAULT, stats=ModelStats())
+
+        self.assertEqual(router.route("hi").model, DEFAULT)
+        self.assertEqual(router.route(HARD_QUESTION).model, DEFAULT)
+
+    def test_fixed_policy_keeps_previous_behavior(self):
+        router = self.make_router(policy=c.ROUTER_POLICY_FIXED)
+
+        self.assertEqual(router.route(HARD_QUESTION).model, DEFAULT)
+        self.assertIsNone(router.route(HARD_QUESTION).thinking_budget)
+        self.assertEqual(router.route("hi", thinking_mode=True).thinking_budget, c.MODEL_THINKING_BUDGET)
+
+    def test_override_pins_model_and_budget(self):
+        router = self.make_router()
+        router.set_override(model=FAST, thinking_budget=256)
+
+        decision = router.route(HARD_QUESTION)
+
+        self.assertEqual((decision.model, decision.thinking_budget), (FAST, 256))
+        self.assertIn("override", decision.reason)
+
+    def test_pro_model_cannot_turn_thinking_off(self):
+        router = self.make_router()
+        router.set_override(model=DEEP, thinking_budget=0)
+
+        self.assertEqual(router.route("hi").thinking_budget, c.ROUTER_PRO_MIN_THINKING_BUDGET)
+
+    def test_slow_model_steps_down_a_tier(self):
+        router = self.make_router()
+        for _ in range(c.ROUTER_MIN_OBSERVATIONS):
+            router.stats.observe(DEEP, latency_ms=c.ROUTER_LATENCY_TARGET_MS * 2)
+
+        decision = router.route(HARD_QUESTION)
+
+        self.assertEqual((decision.tier, decision.model), (c.ROUTER_TIER_DEFAULT, DEFAULT))
+        self.assertIn("deep degraded", decision.reason)
+
+    def test_token_hungry_model_gets_half_the_budget(self):
+        router = self.make_router()
+        full = router.route(HARD_QUESTION).thinking_budget
+        router.observe(router.last_decision, latency_ms=1000, total_tokens=c.ROUTER_TOKEN_TARGET * 2)
+
+        self.assertEqual(router.route(HARD_QUESTION).thinking_budget, full // 2)
+
+    def test_constrain_turns_thinking_off_and_picks_cheaper_model(self):
+        router = self.make_router()
+        decision = router.route(PLAIN_QUESTION)
+
+        constrained = router.constrain(decision, no_thinking=True, cheaper=True)
+
+        self.assertEqual((constrained.model, constrained.tier), (FAST, c.ROUTER_TIER_FAST))
+        self.assertEqual(constrained.thinking_budget, 0)
+        self.assertIs(router.last_decision, constrained)
+        self.assertIs(router.constrain(constrained, no_thinking=True, cheaper=True), constrained)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import time
+import unittest
+from unittest import mock
+
+from google.genai.types import GoogleSearch, Tool
+
+from Benchmark.Fakes import FakeGenaiClient
+from Module.Prompt_Cache import SystemInstructionCache
+
+
+SYSTEM_INSTRUCTION = "You are SyncWithMe."
+TOOLS = [Tool(google_search=GoogleSearch())]
+
+
+class SystemInstructionCacheTest(unittest.TestCase):
+    """Create / reuse / refresh / recreate / disable lifecycle against the fake client."""
+
+    def setUp(self):
+        self.client = FakeGenaiClient()
+        self.calls = self.client.calls
+        self.cache = SystemInstructionCache(
+            self.client, "gemini-2.5-flash", ttl_seconds=600, refresh_margin=60, retry_after=120
+        )
+
+    def at(self, offset):
+        """Runs the cache as if `offset` seconds had passed."""
+        return mock.patch("Module.Prompt_Cache.time.time", return_value=time.time() + offset)
+
+    def test_first_lookup_creates_once(self):
+        name = self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS)
+
+        self.assertEqual(name, "cachedContents/fake-1")
+        self.assertEqual(self.calls["caches.create"], 1)
+
+    def test_same_prefix_is_reused(self):
+        first = self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS)
+        second = self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls["caches.create"], 1)
+        self.assertEqual(self.calls["caches.update"], 0)
+
+    def test_refreshes_near_ttl(self):
+        name = self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS)
+
+        with self.at(600 - 30):
+            refreshed = self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS)
+
+        self.assertEqual(refreshed, name)
+        self.assertEqual(self.calls["caches.update"], 1)
+        self.assertEqual(self.calls["caches.create"], 1)
+
+    def test_recreates_after_expiry(self):
+        self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS)
+
+        with self.at(600 + 1):
+            name = self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS)
+
+        self.assertEqual(name, "cachedContents/fake-2")
+        self.assertEqual(self.calls["caches.create"], 2)
+        self.assertEqual(self.calls["caches.update"], 0)
+
+    def test_recreates_after_invalidate(self):
+        self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS)
+        self.cache.invalidate()
+        name = self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS)
+
+        self.assertEqual(name, "cachedContents/fake-2")
+        self.assertEqual(self.calls["caches.delete"], 1)
+        self.assertEqual(self.calls["caches.create"], 2)
+
+    def test_changed_instruction_replaces_entry(self):
+        self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS)
+        name = self.cache.get_name(SYSTEM_INSTRUCTION + " Be brief.", TOOLS)
+
+        self.assertEqual(name, "cachedContents/fake-2")
+        self.assertEqual(self.calls["caches.delete"], 1)
+
+    def test_failed_create_disables_until_retry_after(self):
+        with mock.patch.object(self.client.caches, "create", side_effect=RuntimeError("too small")) as create:
+            self.assertIsNone(self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS))
+            self.assertIsNone(self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS))
+            self.assertEqual(create.call_count, 1)
+
+        with self.at(60):
+            self.assertIsNone(self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS))
+        self.assertEqual(self.calls["caches.create"], 0)
+
+        with self.at(120 + 1):
+            self.assertEqual(self.cache.get_name(SYSTEM_INSTRUCTION, TOOLS), "cachedContents/fake-1")
+        self.assertEqual(self.calls["caches.create"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import unittest
+from unittest import mock
+
+from Common.Resilience import (
+    CircuitBreaker, CircuitOpenError, Resilience, RetryPolicy, get_retry_after, is_retryable,
+)
+
+
+class ApiError(Exception):
+    def __init__(self, code, headers=None):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+        self.response = mock.Mock(headers=headers or {})
+
+
+class Clock:
+    """Stands in for time.monotonic; advance() moves it forward."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    """closed -> open after the threshold -> one half-open trial -> closed or open again."""
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch("Common.Resilience.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+
+    def open_breaker(self):
+        for _ in range(2):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_failure()
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        self.open_breaker()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.stats()["short_circuited"], 1)
+
+    def test_non_transient_failures_do_not_open(self):
+        for _ in range(5):
+            self.breaker.allow()
+            self.breaker.record_failure(transient=False)
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_lets_one_trial_through(self):
+        self.open_breaker()
+        self.clock.advance(31)
+
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        self.open_breaker()
+        self.clock.advance(31)
+        self.breaker.allow()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_release_trial_frees_the_slot_without_counting(self):
+        self.open_breaker()
+        self.clock.advance(31)
+        self.breaker.allow()
+        failures = self.breaker.failures
+
+        self.breaker.release_trial()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(self.breaker.failures, failures)
+        self.assertTrue(self.breaker.allow())
+
+
+class ResilienceCallTest(unittest.TestCase):
+    def setUp(self):
+        self.resilience = Resilience()
+        self.resilience.configure(
+            "backend",
+            policy=RetryPolicy(max_attempts=3, base_delay=1, max_delay=4, deadline=0),
+            breaker=CircuitBreaker("backend", failure_threshold=5, reset_timeout=30),
+        )
+        patcher = mock.patch("Common.Resilience.time.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries_transient_errors_then_succeeds(self):
+        fn = mock.Mock(side_effect=[ConnectionError("reset"), "ok"])
+
+        self.assertEqual(self.resilience.call("backend", fn), "ok")
+        self.assertEqual(fn.call_count, 2)
+        self.assertEqual(self.resilience.stats()["backend"]["retries"], 1)
+
+    def test_permanent_errors_are_not_retried(self):
+        fn = mock.Mock(side_effect=ValueError("bad request"))
+
+        with self.assertRaises(ValueError):
+            self.resilience.call("backend", fn)
+        self.assertEqual(fn.call_count, 1)
+
+    def test_gives_up_after_max_attempts(self):
+        fn = mock.Mock(side_effect=ConnectionError("down"))
+
+        with self.assertRaises(ConnectionError):
+            self.resilience.call("backend", fn)
+        self.assertEqual(fn.call_count, 3)
+
+    def test_interrupted_trial_is_released(self):
+        breaker = self.resilience.breaker("backend")
+        breaker.state = CircuitBreaker.HALF_OPEN
+
+        with self.assertRaises(KeyboardInterrupt):
+            self.resilience.call("backend", mock.Mock(side_effect=KeyboardInterrupt))
+
+        self.assertEqual(self.resilience.call("backend", mock.Mock(return_value="ok")), "ok")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_open_circuit_raises_without_calling(self):
+        self.resilience.breaker("backend").state = CircuitBreaker.OPEN
+        self.resilience.breaker("backend").opened_at = float("inf")
+        fn = mock.Mock()
+
+        with self.assertRaises(CircuitOpenError):
+            self.resilience.call("backend", fn)
+        fn.assert_not_called()
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_backoff_is_jittered_and_capped(self):
+        policy = RetryPolicy(max_attempts=10, base_delay=1, max_delay=4, deadline=0)
+        error = ConnectionError("down")
+
+        with mock.patch("Common.Resilience.random.uniform", side_effect=lambda low, high: high):
+            delays = [policy.next_delay(attempt, error, started=0) for attempt in range(1, 6)]
+
+        self.assertEqual(delays, [1, 2, 4, 4, 4])
+
+    def test_server_retry_after_wins(self):
+        policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=4, deadline=0)
+        error = ApiError(429, {"Retry-After": "7"})
+
+        self.assertEqual(get_retry_after(error), 7.0)
+        self.assertEqual(policy.next_delay(1, error, started=0), 7.0)
+
+    def test_stops_at_attempts_deadline_and_permanent_errors(self):
+        policy = RetryPolicy(max_attempts=2, base_delay=1, max_delay=4, deadline=5)
+
+        with mock.patch("Common.Resilience.time.monotonic", return_value=100.0):
+            self.assertIsNone(policy.next_delay(2, ConnectionError(), started=100.0))
+            self.assertIsNone(policy.next_delay(1, ApiError(503, {"Retry-After": "10"}), started=100.0))
+            self.assertIsNone(policy.next_delay(1, ApiError(400), started=100.0))
+
+    def test_retryable_classification(self):
+        self.assertTrue(is_retryable(ApiError(429)))
+        self.assertTrue(is_retryable(ApiError(503)))
+        self.assertFalse(is_retryable(ApiError(400)))
+        self.assertTrue(is_retryable(TimeoutError()))
+        self.assertFalse(is_retryable(CircuitOpenError()))
+
+
+if __name__ == "__main__":
+    unittest.main()
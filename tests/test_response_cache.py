@@ -0,0 +1,36 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from Module.Response_Cache import ResponseCache
+
+
+class ResponseCacheExpiryTest(unittest.TestCase):
+    """Entries promoted from the SQLite tier keep their stored expiry."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "cache.db")
+        self.started = time.time()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def at(self, offset):
+        return mock.patch("Module.Response_Cache.time.time", return_value=self.started + offset)
+
+    def test_promoted_entry_expires_on_time(self):
+        with self.at(0):
+            ResponseCache(ttl_seconds=100, db_path=self.db_path).put("key", "answer")
+
+        cache = ResponseCache(ttl_seconds=100, db_path=self.db_path)
+        with self.at(90):
+            self.assertEqual(cache.get("key"), "answer")
+        with self.at(101):
+            self.assertIsNone(cache.get("key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from Benchmark.Fakes import FakeWorksheet
+from Common.Sheet_Functions import RowAllocator
+
+
+def make_rows(count):
+    return [[None, f"question {index}"] for index in range(count)]
+
+
+class RowAllocatorTest(unittest.TestCase):
+    """Serial numbers follow the row they land in, also when another writer appended first."""
+
+    def setUp(self):
+        self.worksheet = FakeWorksheet(rows=3, column_count=2)
+        self.allocator = RowAllocator(self.worksheet)
+
+    def serials(self):
+        return [row[0] for row in self.worksheet.values[1:]]
+
+    def append(self, rows, report_range=True):
+        expected_first_row = self.allocator.reserve(rows)
+        result = self.worksheet.append_rows(rows)
+        return self.allocator.commit(rows, expected_first_row, result if report_range else None)
+
+    def other_writer_appends(self, serial):
+        self.worksheet.values.append([serial, "other writer"])
+
+    def test_predicted_serials_need_no_fix(self):
+        written = self.append(make_rows(2))
+
+        self.assertEqual(written, (5, 6))
+        self.assertEqual(self.serials(), [1, 2, 3, 4, 5])
+        self.assertEqual(self.worksheet.calls["update"], 0)
+        self.assertEqual(self.allocator.next_sr_no(), 6)
+
+    def test_conflict_rewrites_serials_of_moved_rows(self):
+        rows = make_rows(2)
+        expected_first_row = self.allocator.reserve(rows)
+        self.other_writer_appends(4)
+        result = self.worksheet.append_rows(rows)
+
+        written = self.allocator.commit(rows, expected_first_row, result)
+
+        self.assertEqual(written, (6, 7))
+        self.assertEqual(self.serials(), [1, 2, 3, 4, 5, 6])
+        self.assertEqual([row[0] for row in rows], [5, 6])
+        self.assertEqual(self.worksheet.calls["update"], 1)
+
+    def test_missing_range_keeps_correct_serials(self):
+        written = self.append(make_rows(2), report_range=False)
+
+        self.assertEqual(written, (5, 6))
+        self.assertEqual(self.serials(), [1, 2, 3, 4, 5])
+        self.assertEqual(self.worksheet.calls["update"], 0)
+
+    def test_missing_range_fixes_serials_after_conflict(self):
+        rows = make_rows(2)
+        expected_first_row = self.allocator.reserve(rows)
+        self.other_writer_appends(4)
+        self.worksheet.append_rows(rows)
+
+        written = self.allocator.commit(rows, expected_first_row, None)
+
+        self.assertEqual(written, (6, 7))
+        self.assertEqual(self.serials(), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(self.allocator.offset, 1)
+        self.assertEqual(self.allocator.next_sr_no(), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+
+from Common import Constant as c
+from Common.Token_Ledger import TokenBudgetExceeded, TokenLedger
+
+NOW = 1_000_000.0
+
+
+class TokenLedgerPlanTest(unittest.TestCase):
+    """Usage walks the plan through smaller context, no thinking, a cheaper model, then exhausted."""
+
+    def setUp(self):
+        self.ledger = TokenLedger(
+            window_seconds=3600, global_budget=1000, session_budget=100,
+            bucket_seconds=60, degrade_at=(0.5, 0.7, 0.9),
+        )
+
+    def use(self, session_id, total, now=NOW):
+        self.ledger.record(session_id, "gemini-2.5-flash", {"prompt": total, "total": total}, now=now)
+
+    def test_session_levels_follow_the_degrade_thresholds(self):
+        expected = [
+            (40, c.BUDGET_LEVEL_NORMAL),
+            (10, c.BUDGET_LEVEL_CONTEXT),
+            (20, c.BUDGET_LEVEL_NO_THINKING),
+            (20, c.BUDGET_LEVEL_CHEAP_MODEL),
+            (10, c.BUDGET_LEVEL_EXHAUSTED),
+        ]
+        for total, level in expected:
+            self.use("a", total)
+            plan = self.ledger.plan("a", now=NOW)
+            self.assertEqual(plan.level, level)
+            self.assertEqual(plan.scope, c.BUDGET_SCOPE_SESSION)
+
+    def test_plan_flags(self):
+        self.use("a", 70)
+        plan = self.ledger.plan("a", now=NOW)
+        self.assertEqual((plan.smaller_context, plan.no_thinking, plan.cheaper_model), (True, True, False))
+
+        self.use("a", 20)
+        plan = self.ledger.plan("a", now=NOW)
+        self.assertEqual((plan.smaller_context, plan.no_thinking, plan.cheaper_model), (True, True, True))
+
+    def test_sessions_are_budgeted_separately(self):
+        self.use("a", 100)
+
+        self.assertEqual(self.ledger.plan("a", now=NOW).level, c.BUDGET_LEVEL_EXHAUSTED)
+        self.assertEqual(self.ledger.plan("b", now=NOW).level, c.BUDGET_LEVEL_NORMAL)
+
+    def test_global_budget_degrades_every_session(self):
+        for index in range(10):
+            self.use(f"s{index}", 90 if index < 9 else 0)
+
+        plan = self.ledger.plan("fresh", now=NOW)
+
+        self.assertEqual((plan.level, plan.scope), (c.BUDGET_LEVEL_NO_THINKING, c.BUDGET_SCOPE_GLOBAL))
+
+    def test_usage_leaves_the_window(self):
+        self.use("a", 100)
+
+        self.assertEqual(self.ledger.plan("a", now=NOW + 3600 + 60).level, c.BUDGET_LEVEL_NORMAL)
+        self.assertEqual(self.ledger.window_usage("a", now=NOW + 3600 + 60)["total"], 0)
+
+    def test_unlimited_budgets_never_degrade(self):
+        ledger = TokenLedger(global_budget=0, session_budget=0)
+        ledger.record("a", "gemini-2.5-flash", {"total": 10 ** 9})
+
+        self.assertEqual(ledger.plan("a").level, c.BUDGET_LEVEL_NORMAL)
+
+    def test_wait_for_budget_gives_up_after_timeout(self):
+        self.use("a", 150, now=None)
+
+        with self.assertRaises(TokenBudgetExceeded) as raised:
+            self.ledger.wait_for_budget("a", timeout=0)
+
+        self.assertEqual(raised.exception.scope, c.BUDGET_SCOPE_SESSION)
+        self.assertEqual((raised.exception.used, raised.exception.budget), (150, 100))
+
+
+class TokenLedgerPersistenceTest(unittest.TestCase):
+    def test_restart_keeps_the_current_window(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db_path = os.path.join(folder, "tokens.db")
+            ledger = TokenLedger(db_path, session_budget=100, flush_interval=0, retention_days=0)
+            ledger.record("a", "gemini-2.5-flash", {"prompt": 60, "output": 20, "total": 80})
+            ledger.close()
+
+            reopened = TokenLedger(db_path, session_budget=100, flush_interval=0, retention_days=0)
+            try:
+                self.assertEqual(reopened.window_usage("a")["total"], 80)
+                self.assertEqual(reopened.plan("a").level, c.BUDGET_LEVEL_CONTEXT)
+                self.assertEqual(reopened.totals(session_id="a")["prompt"], 60)
+            finally:
+                reopened.close()
+
+
+if __name__ == "__main__":
+    unittest.main()